@@ -0,0 +1,5 @@
+import sys
+
+from core.agent import main
+
+sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Headless SEPRO agent.
+
+Runs ProcessScanner + PowerModel + AnomalyDetector in a loop and writes
+one NDJSON record per snapshot and per anomaly. Never imports PyQt6 or
+pyqtgraph, so it can run as a service:
+
+    python -m core --interval 2 --output /var/log/sepro.ndjson
+
+With --group-by unit|cgroup the rows are systemd units / cgroups (see
+core.cgroups) instead of apps, with their own baselines and energy.
+"""
+import argparse, json, os, signal, sys
+
+from core import paths
+
+
+def snapshot_record(snapshot):
+    return {
+        "type": "snapshot",
+        "ts": snapshot.timestamp,
+        "seq": snapshot.seq,
+        "scan_ms": round(snapshot.scan_time * 1000, 2),
+        "learning": snapshot.learning,
+        "skipped_ticks": snapshot.skipped_ticks,
+        "sampled": snapshot.sampled,
+        "stale": snapshot.stale,
+        "processes": [
+            {
+                "name": p.name, "cpu": p.cpu, "mem": p.mem, "disk": p.disk,
+                "score": round(p.score, 4), "pids": list(p.pids), "stale": p.stale,
+            }
+            for p in sorted(snapshot.rows, key=lambda r: r.score, reverse=True)
+        ],
+    }
+
+
+def anomaly_records(snapshot):
+    for p in snapshot.rows:
+        if p.suspicious:
+            yield {
+                "type": "anomaly", "ts": snapshot.timestamp, "name": p.name,
+                "rules": p.rules, "score": round(p.score, 4),
+            }
+
+
+def pids_record(snapshot, group, processes):
+    return {
+        "type": "pids",
+        "ts": snapshot.timestamp,
+        "group": group,
+        "processes": [
+            {"pid": pid, "name": name, "cpu": cpu, "mem": mem, "disk": disk}
+            for pid, name, cpu, mem, disk in processes
+        ],
+    }
+
+
+def top_record(snapshot, index, k):
+    return {
+        "type": "top",
+        "ts": snapshot.timestamp,
+        "rankings": {
+            ranking: [[name, round(value, 4)] for name, value in entries]
+            for ranking, entries in index.snapshot(k).items()
+        },
+    }
+
+
+class NdjsonWriter:
+    def __init__(self, out, snapshots=True, top_k=None, drill_down=()):
+        self.out = out
+        self.snapshots = snapshots
+        self.top_k = top_k
+        self.index = None # ConsumerIndex, set once the collector exists
+        self.drill_down = tuple(drill_down)
+        self.scanner = None # CgroupScanner, set when --drill-down is used
+
+    def __call__(self, snapshot):
+        lines = []
+        if self.snapshots:
+            lines.append(json.dumps(snapshot_record(snapshot)))
+        lines.extend(json.dumps(r) for r in anomaly_records(snapshot))
+        if self.top_k and self.index is not None:
+            lines.append(json.dumps(top_record(snapshot, self.index, self.top_k)))
+        if self.scanner is not None:
+            for group in self.drill_down:
+                lines.append(json.dumps(pids_record(snapshot, group, self.scanner.drill_down(group))))
+        if lines:
+            self.out.write("\n".join(lines) + "\n")
+            self.out.flush()
+
+
+CGROUP_GROUPINGS = ("unit", "cgroup")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m core", description="Headless SEPRO agent")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between ticks (default 2)")
+    parser.add_argument("--data-dir", help="baseline/log directory (default: SEPRO_DATA_DIR or the platform app dir)")
+    parser.add_argument("--output", default="-", help="NDJSON output file, '-' for stdout (default)")
+    parser.add_argument("--anomalies-only", action="store_true", help="only write anomaly records")
+    parser.add_argument("--ticks", type=int, default=None, help="stop after this many ticks")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="tiered sampling: busy processes sub-second, idle ones every 15 s (--interval is ignored)")
+    parser.add_argument("--cpu-budget", type=float, default=None,
+                        help="collector CPU seconds per second allowed in --adaptive mode (default 0.05)")
+    parser.add_argument("--source", choices=("auto", "procfs", "psutil"), default="auto",
+                        help="process data backend; auto uses /proc on Linux, psutil elsewhere")
+    parser.add_argument("--top", type=int, default=None, metavar="K",
+                        help="also write the top K apps per ranking (score, mean, energy, anomalies) every tick")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on 127.0.0.1:PORT (/metrics, /profile?ticks=N)")
+    parser.add_argument("--profile-ticks", type=int, default=None, metavar="N",
+                        help="cProfile the first N ticks and save the stats under the logs dir")
+    parser.add_argument("--max-profiles", type=int, default=None,
+                        help="baseline profiles kept in memory; least recently seen are evicted (default 20000)")
+    parser.add_argument("--cold-tier", action="store_true",
+                        help="keep evicted profiles on disk and restore them when the process returns")
+    parser.add_argument("--record", metavar="TRACE",
+                        help="record every sampled row to a trace for `python -m core.replay`")
+    parser.add_argument("--group-by", choices=("app",) + CGROUP_GROUPINGS, default="app",
+                        help="aggregate by app name (default), systemd unit or leaf cgroup (Linux, cgroup v2)")
+    parser.add_argument("--drill-down", action="append", default=[], metavar="GROUP",
+                        help="also write the per-PID breakdown of GROUP every tick (with --group-by; repeatable)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.drill_down and args.group_by == "app":
+        parser.error("--drill-down needs --group-by unit or cgroup")
+    if args.data_dir:
+        paths.set_data_dir(args.data_dir)
+
+    # Imported after the data dir is set
+    from core.collector import Collector
+    from core.process_scanner import ProcessScanner
+    from core.sources import default_source
+    from core.sources import SourceError
+    import core.power_model as pm
+
+    # Groups get their own baseline, energy ledger and anomaly log, so
+    # switching --group-by never mixes unit names into the per-app files
+    state = {}
+    if args.group_by == "app":
+        scanner = ProcessScanner(default_source(args.source))
+        baseline_file, cold_file = None, args.cold_tier or None
+    else:
+        from core.cgroups import CgroupScanner, data_dir
+        from core.energy import EnergyLedger
+        from core.anomaly_log import AnomalyLogWriter
+        try:
+            scanner = CgroupScanner(group_by=args.group_by)
+        except SourceError as e:
+            print(f"--group-by {args.group_by}: {e}", file=sys.stderr)
+            return 2
+        directory = data_dir(args.group_by)
+        state = {
+            "energy": EnergyLedger(os.path.join(directory, "energy.json"), defer_load=True),
+            "anomaly_log": AnomalyLogWriter(os.path.join(directory, "logs")),
+        }
+        baseline_file = os.path.join(directory, "baseline_store.json")
+        cold_file = os.path.join(directory, "baseline_cold") if args.cold_tier else None
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a")
+    detector = pm.AnomalyDetector(baseline_file=baseline_file, max_profiles=args.max_profiles, cold_file=cold_file)
+    scheduler = None
+    interval = args.interval
+    if args.adaptive:
+        from core.scheduler import SamplingScheduler
+        scheduler = SamplingScheduler(detector, cpu_budget=args.cpu_budget)
+        interval = scheduler.BASE_INTERVAL
+    recorder = None
+    if args.record:
+        from core.replay import TraceWriter
+        recorder = TraceWriter(args.record, {
+            "source": args.source, "interval": interval, "adaptive": args.adaptive, "group_by": args.group_by,
+        })
+    writer = NdjsonWriter(out, snapshots=not args.anomalies_only, top_k=args.top, drill_down=args.drill_down)
+    if args.drill_down:
+        writer.scanner = scanner
+    collector = Collector(
+        writer,
+        interval=interval, scanner=scanner,
+        detector=detector, scheduler=scheduler, recorder=recorder, **state,
+    )
+    writer.index = collector.top
+    server = None
+    if args.metrics_port is not None:
+        from core.metrics import MetricsServer
+        server = MetricsServer(collector.metrics, args.metrics_port)
+    if args.profile_ticks:
+        collector.metrics.capture_profile(args.profile_ticks)
+
+    signal.signal(signal.SIGINT, lambda signum, frame: collector.request_stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: collector.request_stop())
+
+    try:
+        collector.run(max_ticks=args.ticks)
+    finally:
+        collector.detector.save(force=True)
+        collector.anomaly_log.close()
+        collector.energy.save(force=True)
+        collector.scanner.close()
+        if recorder is not None:
+            recorder.close()
+        if server is not None:
+            server.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
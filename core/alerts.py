@@ -0,0 +1,82 @@
+import threading, time
+from typing import NamedTuple
+
+
+class Alert(NamedTuple):
+    """One or more detections of the same process, coalesced."""
+    name: str
+    first_ts: float
+    last_ts: float
+    hits: int          # detections folded into this alert
+    max_rules: int
+    max_score: float
+    suppressed: int    # detections dropped while the name was snoozed
+
+
+class AlertQueue:
+    """
+    Non-blocking hand-off of anomaly alerts from the scan loop to the UI.
+
+    submit() never waits: repeated detections of a process are merged into
+    one pending Alert until the consumer drain()s it. Once an alert has been
+    delivered, its process is snoozed for COOLDOWN_PERIOD and further
+    detections only bump a suppressed counter reported with the next alert.
+    """
+    COOLDOWN_PERIOD = 3 * 60  # 3-min alert snooze
+
+    def __init__(self, cooldown=None, clock=time.time):
+        if cooldown is not None:
+            self.COOLDOWN_PERIOD = cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._pending = {}      # name -> Alert
+        self._snoozed = {}      # name -> time the last alert was delivered
+        self._suppressed = {}   # name -> detections dropped while snoozed
+
+    def submit(self, name, rules, score, ts=None):
+        ts = self.clock() if ts is None else ts
+        with self._lock:
+            delivered = self._snoozed.get(name)
+            if delivered is not None and (ts - delivered) <= self.COOLDOWN_PERIOD:
+                self._suppressed[name] = self._suppressed.get(name, 0) + 1
+                return
+
+            a = self._pending.get(name)
+            if a is None:
+                self._pending[name] = Alert(name, ts, ts, 1, rules, score, 0)
+            else:
+                self._pending[name] = a._replace(
+                    last_ts=ts, hits=a.hits + 1,
+                    max_rules=max(a.max_rules, rules), max_score=max(a.max_score, score),
+                )
+
+    def drain(self, now=None):
+        """Take every pending alert (oldest first) and start each one's snooze."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            alerts = sorted(self._pending.values(), key=lambda a: a.first_ts)
+            self._pending = {}
+            for i, a in enumerate(alerts):
+                alerts[i] = a._replace(suppressed=self._suppressed.pop(a.name, 0))
+                self._snoozed[a.name] = now
+        return alerts
+
+    def snooze(self, name, now=None):
+        with self._lock:
+            self._snoozed[name] = self.clock() if now is None else now
+            self._pending.pop(name, None)
+
+    def retain(self, names):
+        """
+        Forget pending alerts and snoozes for processes that are no longer
+        running, so a queue nobody drains (the headless agent) stays
+        bounded by the live process count.
+        """
+        with self._lock:
+            self._pending = {n: a for n, a in self._pending.items() if n in names}
+            self._snoozed = {n: t for n, t in self._snoozed.items() if n in names}
+            self._suppressed = {n: c for n, c in self._suppressed.items() if n in names}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
@@ -0,0 +1,218 @@
+"""
+Buffered anomaly log.
+
+Records are queued by the scan loop and written in batches by a
+background thread as NDJSON, rotated by size and age. A small index
+(per file: time span and per-name counts) lets queries such as "all
+anomalies for X in the last day" open only the files that can match:
+
+    python -m core.anomaly_log --name chrome.exe --since 86400
+"""
+import argparse, json, os, queue, sys, threading, time
+
+from core import paths
+from core.baseline_store import atomic_write_json
+
+
+class AnomalyLogWriter:
+    MAX_BYTES = 5 * 1024 * 1024   # rotate after 5 MB ...
+    MAX_AGE = 24 * 3600           # ... or one day, whichever comes first
+    KEEP_FILES = 30
+    FLUSH_INTERVAL = 1.0          # seconds to gather a batch
+    QUEUE_SIZE = 10000
+
+    def __init__(self, directory=None, max_bytes=None, max_age=None, keep_files=None):
+        self._directory = directory
+        if max_bytes is not None:
+            self.MAX_BYTES = max_bytes
+        if max_age is not None:
+            self.MAX_AGE = max_age
+        if keep_files is not None:
+            self.KEEP_FILES = keep_files
+
+        self.dropped = 0
+        self._queue = queue.Queue(self.QUEUE_SIZE)
+        self._lock = threading.Lock()   # guards the index
+        self._index = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    # --- Paths / index ---
+    @property
+    def directory(self):
+        return self._directory or paths.logs_dir()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, "anomalies.index.json")
+
+    def _load_index(self):
+        if self._index is not None:
+            return self._index
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self.index_path) as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {"files": []}
+        return self._index
+
+    def _save_index(self):
+        atomic_write_json(self.index_path, self._index)
+
+    # --- Producer side (never blocks) ---
+    def write(self, name, rules, score, ts=None):
+        record = {"ts": time.time() if ts is None else ts, "name": name, "rules": rules, "score": score}
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            self.start()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sepro-anomaly-log", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # --- Writer thread ---
+    def _run(self):
+        with self._lock:
+            self._load_index()
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.FLUSH_INTERVAL)]
+            except queue.Empty:
+                continue
+            # Let a storm accumulate a little, then write it in one go
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while not self._stop.is_set():
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except OSError as e:
+                print(f"Anomaly log write failed: {e}", file=sys.stderr)
+
+    def _active(self, ts):
+        """Index entry of the file to append to, rotating if it is full or old."""
+        files = self._index["files"]
+        if files:
+            entry = files[-1]
+            path = os.path.join(self.directory, entry["file"])
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size < self.MAX_BYTES and (ts - entry["created"]) < self.MAX_AGE:
+                return entry
+
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(ts))
+        entry = {"file": f"anomalies-{stamp}.ndjson", "created": ts, "start": None, "end": None, "count": 0, "names": {}}
+        files.append(entry)
+
+        for old in files[:-self.KEEP_FILES]:
+            try:
+                os.remove(os.path.join(self.directory, old["file"]))
+            except OSError:
+                pass
+        del files[:-self.KEEP_FILES]
+        return entry
+
+    def _write_batch(self, batch):
+        with self._lock:
+            entry = self._active(batch[0]["ts"])
+            with open(os.path.join(self.directory, entry["file"]), "a") as f:
+                f.write("".join(json.dumps(r) + "\n" for r in batch))
+
+            names = entry["names"]
+            for r in batch:
+                ts, name = r["ts"], r["name"]
+                entry["start"] = ts if entry["start"] is None else min(entry["start"], ts)
+                entry["end"] = ts if entry["end"] is None else max(entry["end"], ts)
+                stats = names.get(name)
+                names[name] = [1, ts, ts] if stats is None else [stats[0] + 1, min(stats[1], ts), max(stats[2], ts)]
+            entry["count"] += len(batch)
+            self._save_index()
+
+    # --- Queries ---
+    def query(self, name=None, since=None, until=None, files=None):
+        """Records matching name/time, oldest first, reading only files the index allows."""
+        if files is None:
+            with self._lock:
+                files = [dict(e, names=dict(e["names"])) for e in self._load_index()["files"]]
+
+        results = []
+        for e in files:
+            if e["start"] is None:
+                continue
+            span = e["names"].get(name) if name is not None else [e["count"], e["start"], e["end"]]
+            if span is None:
+                continue
+            if since is not None and span[2] < since:
+                continue
+            if until is not None and span[1] > until:
+                continue
+            try:
+                with open(os.path.join(self.directory, e["file"])) as f:
+                    for line in f:
+                        try:
+                            r = json.loads(line)
+                        except ValueError:
+                            continue
+                        if name is not None and r["name"] != name:
+                            continue
+                        if (since is not None and r["ts"] < since) or (until is not None and r["ts"] > until):
+                            continue
+                        results.append(r)
+            except OSError:
+                continue
+        return results
+
+    def counts(self, since=None):
+        """
+        Anomaly count per name from `since` on. Files wholly inside the span
+        are counted from the index; a file that starts before `since` (they
+        rotate by age, not at midnight) is read record by record.
+        """
+        with self._lock:
+            files = [dict(e, names=dict(e["names"])) for e in self._load_index()["files"]]
+
+        totals = {}
+        for e in files:
+            if e["end"] is None or (since is not None and e["end"] < since):
+                continue
+            if since is None or e["start"] >= since:
+                for name, stats in e["names"].items():
+                    totals[name] = totals.get(name, 0) + stats[0]
+                continue
+            for r in self.query(since=since, files=[e]):
+                totals[r["name"]] = totals.get(r["name"], 0) + 1
+        return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.anomaly_log", description="Query the anomaly log")
+    parser.add_argument("--name", help="process name")
+    parser.add_argument("--since", type=float, help="seconds back from now")
+    parser.add_argument("--data-dir")
+    args = parser.parse_args(argv)
+    if args.data_dir:
+        paths.set_data_dir(args.data_dir)
+
+    since = time.time() - args.since if args.since else None
+    for r in AnomalyLogWriter().query(args.name, since):
+        print(json.dumps(r))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,181 @@
+import dbm, sys, json, os
+
+
+def atomic_write_json(path, data, indent=None):
+    """Write JSON to `path` via a temp file + rename, so readers never see a torn file."""
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class BaselineStore:
+    """
+    Baseline persistence as a snapshot plus an append-only journal.
+
+    Each flush appends one NDJSON line per changed profile to the journal;
+    compact() folds everything into a fresh snapshot (written atomically)
+    and truncates the journal. load() replays the journal over the
+    snapshot and ignores a torn last line left by a crash.
+
+    The snapshot carries a generation number, bumped by every compact(),
+    and each journal record the generation it was written on top of.
+    load() skips records older than the snapshot, so a crash between the
+    snapshot rename and the journal truncation cannot replay stale
+    records over newer data. Files from before generations were added
+    count as generation 0.
+    """
+
+    def __init__(self, snapshot_path, journal_path=None):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or os.path.splitext(snapshot_path)[0] + ".journal"
+        self.journal_records = 0
+        self.generation = None # unknown until load() or compact()
+        self._snapshot_id = None # (inode, mtime) of the snapshot `generation` was read from
+
+    def _snapshot_stat(self):
+        try:
+            st = os.stat(self.snapshot_path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _sync_generation(self):
+        """Re-read the generation if the snapshot was replaced since we last saw it (another store compacted)."""
+        snapshot_id = self._snapshot_stat()
+        if self.generation is not None and snapshot_id == self._snapshot_id:
+            return
+        generation = 0
+        try:
+            with open(self.snapshot_path, "r") as f:
+                data = json.load(f)
+            if isinstance(data.get("generation"), int):
+                generation = data["generation"]
+        except (OSError, ValueError):
+            pass
+        self.generation, self._snapshot_id = generation, snapshot_id
+
+    def load(self):
+        data = {}
+        self.generation = 0
+        self._snapshot_id = self._snapshot_stat()
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "r") as f:
+                    data = json.load(f)
+                if isinstance(data.get("generation"), int): # a profile is never an int
+                    self.generation, data = data["generation"], data["profiles"]
+            except (OSError, ValueError) as e:
+                # Keep the damaged file for inspection instead of overwriting it later
+                aside = self.snapshot_path + ".corrupt"
+                print(f"Baseline snapshot unreadable ({e}); moved to {aside}", file=sys.stderr)
+                try:
+                    os.replace(self.snapshot_path, aside)
+                except OSError:
+                    pass
+                data = {}
+
+        self.journal_records = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                        name = rec.pop("name")
+                    except (ValueError, KeyError):
+                        continue # torn write at the tail
+                    if rec.pop("gen", 0) < self.generation:
+                        continue # already folded into the snapshot by a compact() that crashed before truncating
+                    if rec.get("deleted"):
+                        data.pop(name, None)
+                    else:
+                        data[name] = rec
+                    self.journal_records += 1
+        return data
+
+    def append(self, records):
+        """Append {name: fields} to the journal."""
+        if not records:
+            return
+        self._sync_generation()
+        lines = "".join(
+            json.dumps(dict(name=name, gen=self.generation, **fields)) + "\n"
+            for name, fields in records.items()
+        )
+        with open(self.journal_path, "a") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_records += len(records)
+
+    def compact(self, data):
+        """Replace the snapshot with `data` and start an empty journal."""
+        self._sync_generation()
+        generation = self.generation + 1
+        atomic_write_json(self.snapshot_path, {"generation": generation, "profiles": data}, indent=2)
+        self.generation, self._snapshot_id = generation, self._snapshot_stat()
+        with open(self.journal_path, "w"):
+            pass
+        self.journal_records = 0
+
+
+class ColdStore:
+    """
+    On-disk tier for profiles evicted from memory, keyed by name in a dbm
+    file so a lookup doesn't load the whole thing. Profiles go in when
+    they are evicted and come back out if the process shows up again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+
+    def _open(self):
+        if self._db is None:
+            self._db = dbm.open(self.path, "c")
+        return self._db
+
+    def put(self, records):
+        """Store {name: fields}."""
+        if not records:
+            return
+        db = self._open()
+        for name, fields in records.items():
+            db[name.encode()] = json.dumps(fields)
+        if hasattr(db, "sync"):
+            db.sync()
+
+    def pop(self, name):
+        """Fields stored for `name`, removing them; None if absent."""
+        db = self._open()
+        key = name.encode()
+        try:
+            raw = db[key]
+        except KeyError:
+            return None
+        del db[key]
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def prune(self, before):
+        """Drop cold profiles last seen before `before` (epoch seconds)."""
+        db = self._open()
+        for key in list(db.keys()):
+            try:
+                last_seen = json.loads(db[key]).get("last_seen", 0)
+            except ValueError:
+                last_seen = 0
+            if last_seen < before:
+                del db[key]
+
+    def __len__(self):
+        return len(self._open())
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
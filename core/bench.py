@@ -0,0 +1,142 @@
+"""
+Benchmark suite for the per-tick hot paths, driven by SyntheticSource.
+
+    python -m core.bench --processes 100,1000,10000 --ticks 30
+
+Reports latency and throughput for each stage (scan, aggregate, score,
+detect, persist, render) and saves the results as JSON under
+bench_results/, comparing against the previous run when one exists.
+"""
+import argparse, glob, json, os, platform, tempfile, time
+import numpy as np
+
+import core.power_model as pm
+from core.process_scanner import ProcessScanner
+from core.sources import SyntheticSource
+
+
+STAGES = ["scan", "aggregate", "score", "detect", "persist", "render"]
+
+
+def _table_model():
+    """A ProcessTableModel when PyQt6 is installed, else None (render is skipped)."""
+    try:
+        from PyQt6.QtCore import QCoreApplication
+        from ui.process_table_model import ProcessTableModel
+    except ImportError:
+        return None
+    if QCoreApplication.instance() is None:
+        _table_model.app = QCoreApplication([])
+    return ProcessTableModel()
+
+
+def run_case(processes, ticks, churn, anomaly_rate, seed, workdir):
+    from core.collector import ProcessRow
+
+    source = SyntheticSource(processes=processes, churn=churn, anomaly_rate=anomaly_rate, seed=seed)
+    scanner = ProcessScanner(source)
+    detector = pm.AnomalyDetector(os.path.join(workdir, f"baseline-{processes}.json"), flush_interval=0)
+    detector.NEW_PROCESS_GRACE_PERIOD = 0
+    model = _table_model()
+
+    timings = {stage: [] for stage in STAGES}
+    rows_seen = []
+    clock = time.perf_counter
+
+    for _ in range(ticks):
+        t0 = clock()
+        samples = scanner.sample()
+        t1 = clock()
+        processes_ = scanner.aggregate(samples)
+        t2 = clock()
+        names = [p["name"] for p in processes_]
+        scores = pm.PowerModel.compute_score_batch(
+            [p["cpu"] for p in processes_], [p["mem"] for p in processes_], [p["disk"] for p in processes_]
+        )
+        t3 = clock()
+        suspicious, rules = detector.check_batch(names, scores)
+        t4 = clock()
+        detector.save()
+        t5 = clock()
+        if model is not None:
+            model.set_rows([
+                ProcessRow(p["name"], p["cpu"], p["mem"], p["disk"], s, tuple(p["pids"]), f, r)
+                for p, s, f, r in zip(processes_, scores.tolist(), suspicious.tolist(), rules.tolist())
+            ])
+        t6 = clock()
+
+        for stage, dt in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t6 - t5)):
+            timings[stage].append(dt)
+        rows_seen.append(len(processes_))
+
+    result = {"processes": processes, "rows": int(np.mean(rows_seen)), "stages": {}, "rules": detector.rule_stats()}
+    for stage, values in timings.items():
+        if stage == "render" and model is None:
+            continue
+        ms = np.array(values[1:] or values) * 1000 # first tick includes warm-up
+        result["stages"][stage] = {
+            "mean_ms": round(float(ms.mean()), 4),
+            "p95_ms": round(float(np.percentile(ms, 95)), 4),
+            "per_sec": round(processes / (ms.mean() / 1000), 1) if ms.mean() > 0 else None,
+        }
+    return result
+
+
+def _previous(out_dir):
+    runs = sorted(glob.glob(os.path.join(out_dir, "bench-*.json")))
+    if not runs:
+        return None
+    with open(runs[-1]) as f:
+        return json.load(f)
+
+
+def _report(results, previous):
+    before = {}
+    if previous:
+        before = {(c["processes"], s): v["mean_ms"] for c in previous["cases"] for s, v in c["stages"].items()}
+
+    print(f"{'procs':>7} {'stage':<10} {'mean ms':>10} {'p95 ms':>10} {'procs/s':>12} {'vs prev':>9}")
+    for case in results:
+        for stage, v in case["stages"].items():
+            prev = before.get((case["processes"], stage))
+            delta = f"{(v['mean_ms'] / prev - 1) * 100:+.1f}%" if prev else ""
+            per_sec = f"{v['per_sec']:,.0f}" if v["per_sec"] else "-"
+            print(f"{case['processes']:>7} {stage:<10} {v['mean_ms']:>10.3f} {v['p95_ms']:>10.3f} {per_sec:>12} {delta:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.bench", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", default="100,1000,10000", help="comma-separated process counts")
+    parser.add_argument("--ticks", type=int, default=30)
+    parser.add_argument("--churn", type=float, default=0.01, help="fraction of processes replaced per tick")
+    parser.add_argument("--anomaly-rate", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results", help="directory for result JSON files")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    counts = [int(c) for c in args.processes.split(",") if c]
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run_case(n, args.ticks, args.churn, args.anomaly_rate, args.seed, workdir) for n in counts]
+
+    previous = _previous(args.out)
+    _report(results, previous)
+
+    if not args.no_save:
+        os.makedirs(args.out, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(args.out, f"bench-{stamp}.json")
+        with open(path, "w") as f:
+            json.dump({
+                "timestamp": time.time(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "args": vars(args),
+                "cases": results,
+            }, f, indent=2)
+        print(f"Saved {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
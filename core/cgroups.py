@@ -0,0 +1,283 @@
+"""
+Per-service aggregation from cgroup v2 (Linux).
+
+Instead of reading every process and summing by executable name,
+CgroupScanner reads three files per group:
+
+    cpu.stat         usage_usec
+    memory.current   bytes
+    io.stat          rbytes= / wbytes= per device
+
+so a tick costs one pass per service rather than one per process, and
+two `python` processes in different services stay apart. Groups are
+systemd units (the deepest *.service / *.scope above each leaf cgroup)
+or, with group_by="cgroup", every leaf cgroup by path. Rows have the
+same shape as ProcessScanner's, so the Collector, PowerModel and
+AnomalyDetector take them unchanged; the detector and energy ledger get
+their own files under <data dir>/groups/<group_by>/ (see data_dir()).
+
+PIDs are only read when asked for: lookup() (kill) and drill_down().
+
+    python -m core --group-by unit
+    python -m core --group-by unit --drill-down nginx.service
+"""
+import os, time
+
+from core import paths
+from core.delta import DeltaTracker
+from core.sources import SourceError, ProcessGone, AccessDenied
+
+UNIT_SUFFIXES = (".service", ".scope")
+
+
+def data_dir(group_by):
+    """Baseline / energy directory for one grouping, apart from the per-app one."""
+    return paths.data_dir("groups", group_by)
+
+
+class _Group:
+    """Counters of one cgroup at its last read."""
+    __slots__ = ("path", "inode", "usage", "io", "time", "last")
+
+    def __init__(self, path, inode):
+        self.path = path
+        self.inode = inode      # a recreated cgroup (unit restart) gets a new one
+        self.usage = None       # cpu.stat usage_usec
+        self.io = None          # rbytes + wbytes over all devices
+        self.time = None
+        self.last = None        # (cpu, mem, disk)
+
+
+class CgroupScanner:
+    GROUP_BY = ("unit", "cgroup")
+    DELTA_EPSILON = {"cpu": 0.5, "mem": 1.0, "disk": 0.05}
+
+    def __init__(self, root="/sys/fs/cgroup", group_by="unit", epsilon=None, keyframe_every=None):
+        if group_by not in self.GROUP_BY:
+            raise ValueError(f"Unknown grouping {group_by!r}")
+        if not os.path.exists(os.path.join(root, "cgroup.controllers")):
+            raise SourceError(f"No cgroup v2 hierarchy at {root}")
+        self.root = root
+        self.group_by = group_by
+        self._groups = {}  # name -> _Group
+        self.errors = {"no_such_process": 0, "access_denied": 0, "timeout": 0, "other": 0}
+        self.deltas = DeltaTracker(
+            self.DELTA_EPSILON if epsilon is None else epsilon, ignore=("fresh",), keyframe_every=keyframe_every
+        )
+        self.rows = []
+        self.promoted = set() # ProcessScanner interface; every due group is read in full anyway
+        self._procfs = None  # ProcfsSource, only for lookup() / drill_down()
+        self._drill = {}     # name -> {pid: [handle, process name, last cpu seconds, last io, last time]}
+
+    # --- Discovery ---
+    def _walk(self):
+        """{name: cgroup dir} of the groups to read this tick."""
+        groups = []
+        stack = [(self.root, None)]
+        while stack:
+            path, unit = stack.pop()
+            if os.path.basename(path).endswith(UNIT_SUFFIXES):
+                unit = path
+            try:
+                subdirs = [e for e in os.scandir(path) if e.is_dir(follow_symlinks=False)]
+            except OSError:
+                continue # removed while walking
+            if subdirs:
+                stack.extend((e.path, unit) for e in subdirs)
+            elif path != self.root:
+                groups.append(path if self.group_by == "cgroup" or unit is None else unit)
+
+        rel = {path: os.path.relpath(path, self.root) for path in set(groups)}
+        if self.group_by == "cgroup":
+            return {r: path for path, r in rel.items()}
+        # Unit names, except where one is used twice (init.scope of each user manager)
+        counts = {}
+        for path in rel:
+            base = os.path.basename(path)
+            counts[base] = counts.get(base, 0) + 1
+        return {(os.path.basename(p) if counts[os.path.basename(p)] == 1 else r): p for p, r in rel.items()}
+
+    # --- Reading ---
+    @staticmethod
+    def _read(path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _read_group(self, path):
+        """(usage_usec, memory bytes, io bytes or None) for one cgroup dir."""
+        try:
+            stat = self._read(os.path.join(path, "cpu.stat"))
+        except FileNotFoundError as e:
+            raise ProcessGone(path) from e
+        except PermissionError as e:
+            raise AccessDenied(path) from e
+        except OSError as e:
+            raise SourceError(path) from e
+        usage = int(stat.split(b"\n", 1)[0].split()[1]) # usage_usec is always the first line
+
+        try:
+            mem = int(self._read(os.path.join(path, "memory.current")))
+        except (OSError, ValueError):
+            mem = 0 # memory controller not enabled for this subtree
+        try:
+            io = 0
+            for line in self._read(os.path.join(path, "io.stat")).splitlines():
+                for field in line.split()[1:]:
+                    if field.startswith((b"rbytes=", b"wbytes=")):
+                        io += int(field[7:])
+        except (OSError, ValueError):
+            io = None
+        return usage, mem, io
+
+    def warm_up(self):
+        """Read every group once, so the first real tick has CPU and disk rates."""
+        self.sample()
+
+    def close(self):
+        pass
+
+    def take_read_cpu(self):
+        """Groups are read on the calling thread; see ProcessScanner.take_read_cpu."""
+        return 0.0
+
+    def sample(self, due=None, timeout=None):
+        """
+        Read every group. Returns a list of (name, cpu %, mem MB, disk MB/s,
+        fresh, stale), with `due` and `timeout` as in ProcessScanner.sample.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else float("inf")
+        found = self._walk()
+        groups = self._groups
+        for name in [n for n in groups if n not in found]:
+            del groups[name]
+            self._drill.pop(name, None)
+
+        samples = []
+        for name, path in found.items():
+            try:
+                inode = os.stat(path).st_ino
+            except OSError:
+                self.errors["no_such_process"] += 1
+                continue
+            g = groups.get(name)
+            if g is None or g.inode != inode or g.path != path:
+                g = groups[name] = _Group(path, inode)
+            if due is not None and g.last is not None and not due(name):
+                samples.append((name,) + g.last + (False, False))
+                continue
+            now = time.monotonic()
+            if now >= deadline:
+                self.errors["timeout"] += 1
+                if g.last is not None:
+                    samples.append((name,) + g.last + (False, True))
+                continue
+            try:
+                usage, mem, io = self._read_group(path)
+            except ProcessGone:
+                self.errors["no_such_process"] += 1
+                del groups[name]
+                continue
+            except AccessDenied:
+                self.errors["access_denied"] += 1
+                continue
+            except SourceError:
+                self.errors["other"] += 1
+                continue
+
+            cpu = disk = 0.0
+            if g.time is not None and now > g.time:
+                dt = now - g.time
+                cpu = max(usage - g.usage, 0) / 1e6 / dt * 100
+                if io is not None and g.io is not None:
+                    disk = max(io - g.io, 0) / (1024 * 1024) / dt
+            g.usage, g.io, g.time = usage, io, now
+            g.last = (cpu, mem / (1024 * 1024), disk)
+            samples.append((name,) + g.last + (True, False))
+        return samples
+
+    def get_app_processes(self, due=None, timeout=None):
+        """One row per group, shaped like ProcessScanner.get_app_processes (pids are left empty)."""
+        return [
+            {
+                "name": name, "cpu": round(cpu, 2), "mem": round(mem, 2), "disk": round(disk, 2),
+                "pids": [], "fresh": fresh, "stale": stale,
+            }
+            for name, cpu, mem, disk, fresh, stale in self.sample(due, timeout)
+        ]
+
+    def get_app_delta(self, due=None, timeout=None):
+        """See ProcessScanner.get_app_delta."""
+        self.rows = self.get_app_processes(due, timeout)
+        return self.deltas.update({p["name"]: p for p in self.rows})
+
+    # --- Drill-down ---
+    def _source(self):
+        if self._procfs is None:
+            from core.sources import ProcfsSource
+            self._procfs = ProcfsSource()
+        return self._procfs
+
+    def pids(self, name):
+        """PIDs in group `name` and every cgroup below it (as of the last scan)."""
+        g = self._groups.get(name)
+        if g is None:
+            return []
+        pids = []
+        for path, _, _ in os.walk(g.path):
+            try:
+                pids.extend(int(p) for p in self._read(os.path.join(path, "cgroup.procs")).split())
+            except OSError:
+                continue
+        return pids
+
+    def lookup(self, name):
+        """(pid, create_time) of every process in group `name`, read now."""
+        source = self._source()
+        keys = []
+        for pid in self.pids(name):
+            try:
+                _, info = source.open(pid)
+            except SourceError:
+                continue
+            keys.append((pid, info.create_time))
+        return tuple(keys)
+
+    def descendants(self, keys):
+        """Children share their parent's cgroup, so lookup() already has them."""
+        return []
+
+    def drill_down(self, name):
+        """
+        [(pid, process name, cpu %, mem MB, disk MB/s)] for group `name`.
+        Rates are over the time since the previous drill_down() of the same
+        group, so the first call has zeros; keep calling it every tick for
+        as long as the breakdown is wanted.
+        """
+        source = self._source()
+        cache = self._drill.setdefault(name, {})
+        pids = self.pids(name)
+        out = []
+        for pid in pids:
+            entry = cache.get(pid)
+            try:
+                if entry is None:
+                    handle, info = source.open(pid)
+                    entry = cache[pid] = [handle, info.name, info.cpu_time, None, source.now()]
+                s = source.sample(entry[0])
+            except ProcessGone:
+                cache.pop(pid, None)
+                continue
+            except SourceError:
+                continue
+            now = source.now()
+            cpu = disk = 0.0
+            if now > entry[4]:
+                cpu = max(s.cpu_time - entry[2], 0) / (now - entry[4]) * 100
+                if s.io_bytes is not None and entry[3] is not None:
+                    disk = max(s.io_bytes - entry[3], 0) / (1024 * 1024) / (now - entry[4])
+            entry[2], entry[3], entry[4] = s.cpu_time, s.io_bytes, now
+            out.append((pid, entry[1], round(cpu, 2), round(s.rss / (1024 * 1024), 2), round(disk, 2)))
+        live = set(pids)
+        for pid in [p for p in cache if p not in live]:
+            del cache[pid]
+        return out
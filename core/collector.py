@@ -0,0 +1,393 @@
+import json, sys, threading, time
+from typing import NamedTuple
+import numpy as np
+
+import core.power_model as pm
+from core.process_scanner import ProcessScanner
+from core.alerts import AlertQueue
+from core.baseline_store import atomic_write_json
+from core.delta import Delta
+from core.anomaly_log import AnomalyLogWriter
+from core.energy import EnergyLedger
+from core.topk import ConsumerIndex
+from core.metrics import Metrics
+
+
+class ProcessRow(NamedTuple):
+    """One aggregated app row, as rendered by the UI."""
+    name: str
+    cpu: float
+    mem: float
+    disk: float
+    score: float
+    pids: tuple
+    suspicious: bool
+    rules: int
+    stale: bool = False    # no answer this tick; cpu/mem/disk are the last known values
+
+
+class Snapshot(NamedTuple):
+    """Immutable result of one collector tick."""
+    seq: int
+    timestamp: float
+    rows: tuple            # ProcessRow, in no particular order
+    alerts: tuple          # names flagged this tick (merged when ticks coalesce)
+    learning: bool         # still inside the startup grace period
+    grace_remaining: float
+    scan_time: float       # seconds spent collecting this tick
+    skipped_ticks: int     # total ticks dropped because a scan overran
+    sampled: int = 0       # rows whose counters were actually read this tick
+    stale: int = 0         # rows showing last-known values because a read missed the deadline
+    delta: Delta = None    # ProcessRows changed since the previous snapshot (see core.delta)
+    fresh: frozenset = frozenset() # names whose counters were read this tick (merged when ticks coalesce)
+
+
+def load_snapshot_cache(path):
+    """
+    (timestamp, rows) saved by Collector.save_snapshot_cache, or None.
+    Rows come back stale and without pids: they are only good for
+    painting the table until the first live snapshot replaces them.
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        rows = tuple(
+            ProcessRow(name, cpu, mem, disk, score, (), False, 0, True)
+            for name, cpu, mem, disk, score in data["rows"]
+        )
+        return data["ts"], rows
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Snapshot cache unreadable ({e}); starting empty", file=sys.stderr)
+        return None
+
+
+class Collector:
+    """
+    Runs scan -> score -> detect -> save on a worker thread and hands
+    each finished Snapshot to `on_snapshot` (called from the worker).
+
+    Overruns are handled by skipping: if a tick takes longer than the
+    interval, the missed ticks are dropped (and counted) instead of
+    being run back-to-back to catch up.
+
+    With a SamplingScheduler, only the processes it marks as due are
+    read each tick (tick at scheduler.BASE_INTERVAL); the rest keep
+    their last values and are not fed to the detector again. The same
+    goes for processes that do not answer within SCAN_DEADLINE of the
+    interval, which are also marked stale.
+
+    Every fresh row is checked by the detector each tick, but only the rows
+    in the scanner's delta (appeared, or changed beyond
+    ProcessScanner.DELTA_EPSILON, or all of them on a keyframe) and rows
+    whose flag changed are rebuilt and published; the rest carry over.
+
+    Slow startup work (baseline and energy ledger loads if they were
+    created with defer_load, scanner warm-up) runs at the top of the tick loop, on the
+    worker thread when started with start(), so a UI can paint first.
+    """
+
+    APP_START_GRACE_PERIOD = 30 # startup grace period in seconds
+    SCAN_DEADLINE = 0.5 # fraction of the interval a scan may take before it publishes what it has
+    WARM_UP = 0.25 # seconds between priming CPU counters and the first tick
+    SNAPSHOT_CACHE_INTERVAL = 30 # seconds between writes of the startup snapshot cache
+
+    def __init__(self, on_snapshot, interval=2.0, scanner=None, detector=None, history=None, alerts=None, anomaly_log=None,
+                 scheduler=None, energy=None, top_k=None, metrics=None, recorder=None, snapshot_cache=None):
+        self.on_snapshot = on_snapshot
+        self.interval = interval
+        self.scanner = scanner or ProcessScanner()
+        self.detector = detector or pm.AnomalyDetector()
+        self.history = history # optional HistoryStore, written every tick
+        self.alerts = alerts if alerts is not None else AlertQueue()
+        self.anomaly_log = anomaly_log if anomaly_log is not None else AnomalyLogWriter()
+        self.scheduler = scheduler
+        self.energy = energy if energy is not None else EnergyLedger(defer_load=True)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.recorder = recorder # optional replay.TraceWriter, fed the fresh rows every tick
+        self.snapshot_cache = snapshot_cache # path the latest snapshot is saved to, see load_snapshot_cache
+        self.top = ConsumerIndex(top_k, filters={"mean": lambda name: name in self.detector.baseline})
+        self._ready = False
+        self.last_snapshot = None
+        self._rows = {}         # name -> ProcessRow, kept across ticks
+        self._flagged = set()   # names flagged last tick
+        self._cache_saved = time.monotonic()
+
+        self.start_time = time.time()
+        self._last_tick = None
+        self._sampled = 0
+        self.skipped_ticks = 0
+        self._seq = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._exit_lock = threading.Lock()
+        self._exited = False         # the worker thread has left its loop
+        self._close_on_exit = False  # stop() timed out: the worker closes everything when it gets out
+
+    def _prepare(self):
+        """Deferred startup: baseline, rankings, CPU counter priming. Runs once, before the first tick."""
+        if self._ready:
+            return
+        started = time.perf_counter()
+        if not self.detector.loaded:
+            self.detector.load()
+        if not self.energy.loaded:
+            self.energy.load()
+        self._seed_top()
+        self.metrics.set_gauge("startup_load_seconds", round(time.perf_counter() - started, 4))
+        self.scanner.warm_up()
+        self._stop.wait(self.WARM_UP)
+        self._ready = True
+
+    def _seed_top(self):
+        """Fill the rankings that outlive a restart from what is already persisted."""
+        a = self.detector.profiles
+        live = a.live()
+        self.top.update("mean", [a.names[s] for s in live.tolist()], a.mean[live].tolist())
+        today = self.energy.totals("day")
+        self.top.update("energy", list(today), list(today.values()))
+        self._day = self.energy.day_start(time.time())
+        counts = self.anomaly_log.counts(since=self._day)
+        self.top.update("anomalies", list(counts), list(counts.values()))
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._exited = self._close_on_exit = False
+        self._thread = threading.Thread(target=self._run, name="sepro-collector", daemon=True)
+        self._thread.start()
+
+    def request_stop(self):
+        """Ask the tick loop to exit after the current tick (safe from signal handlers)."""
+        self._stop.set()
+
+    def stop(self, timeout=5):
+        """
+        Stop the worker and save everything. If the worker is still busy
+        after `timeout` (deferred load, warm-up, a slow tick), saving is
+        left to the worker on its way out instead of racing it from here.
+        """
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread:
+            thread.join(timeout)
+            with self._exit_lock:
+                if not self._exited:
+                    self._close_on_exit = True
+                    return
+        self._close()
+
+    def _close(self):
+        self.detector.save(force=True)
+        self.anomaly_log.close()
+        self.energy.save(force=True)
+        self.save_snapshot_cache()
+        if self.history is not None:
+            self.history.flush()
+        self.scanner.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def _run(self):
+        try:
+            self.run()
+        finally:
+            with self._exit_lock:
+                self._exited = True
+                close = self._close_on_exit
+            if close:
+                self._close()
+
+    def run(self, max_ticks=None):
+        """Blocking tick loop; returns after stop() or `max_ticks` ticks."""
+        self._prepare()
+        ticks = 0
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.on_snapshot(self.collect_once())
+            except Exception as e:
+                print(f"Collector tick failed: {e}", file=sys.stderr)
+
+            ticks += 1
+            if max_ticks is not None and ticks >= max_ticks:
+                break
+
+            next_tick += self.interval
+            now = time.monotonic()
+            if now > next_tick:
+                # Scan overran the interval: skip the ticks we missed
+                missed = int((now - next_tick) // self.interval) + 1
+                self.skipped_ticks += missed
+                next_tick += missed * self.interval
+
+            self._stop.wait(max(0.0, next_tick - now))
+
+    def collect_once(self):
+        """Run one full tick synchronously and return its Snapshot."""
+        self._prepare()
+        with self.metrics.timed_tick(lambda: self._sampled):
+            self.last_snapshot = self._collect()
+        return self.last_snapshot
+
+    def save_snapshot_cache(self, force=True):
+        snapshot = self.last_snapshot
+        if self.snapshot_cache is None or snapshot is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._cache_saved < self.SNAPSHOT_CACHE_INTERVAL:
+            return
+        self._cache_saved = now
+        data = {"ts": snapshot.timestamp, "rows": [[p.name, p.cpu, p.mem, p.disk, round(p.score, 4)] for p in snapshot.rows]}
+        try:
+            atomic_write_json(self.snapshot_cache, data)
+        except OSError as e:
+            print(f"Snapshot cache save failed: {e}", file=sys.stderr)
+
+    def _collect(self):
+        started = time.perf_counter()
+        started_cpu = time.thread_time()
+        current_time = time.time()
+        grace_remaining = (self.start_time + self.APP_START_GRACE_PERIOD) - current_time
+        learning = grace_remaining > 0
+        metrics = self.metrics
+
+        scheduler = self.scheduler
+        delta = self.scanner.get_app_delta(
+            scheduler.due_check(current_time) if scheduler else None, self.interval * self.SCAN_DEADLINE
+        )
+        processes = self.scanner.rows
+        t_scan = time.perf_counter()
+        metrics.observe("scan", t_scan - started)
+        for kind, count in self.scanner.errors.items():
+            metrics.set_counter("scan_errors_total", kind, count)
+
+        names = [p["name"] for p in processes]
+        n = len(processes)
+        cpu = np.fromiter((p["cpu"] for p in processes), dtype=np.float64, count=n)
+        mem = np.fromiter((p["mem"] for p in processes), dtype=np.float64, count=n)
+        disk = np.fromiter((p["disk"] for p in processes), dtype=np.float64, count=n)
+        scores = pm.PowerModel.compute_score_batch(cpu, mem, disk)
+
+        # Only freshly read rows are recorded and learned from
+        fresh_mask = np.fromiter((p["fresh"] for p in processes), dtype=bool, count=n)
+        if fresh_mask.all():
+            fresh, fresh_names = slice(None), names
+        else:
+            fresh = np.flatnonzero(fresh_mask)
+            fresh_names = [names[i] for i in fresh.tolist()]
+        if scheduler is None:
+            dt = None
+            elapsed = self.interval if self._last_tick is None else current_time - self._last_tick
+        else:
+            dt = elapsed = scheduler.elapsed(fresh_names, current_time)
+        self._last_tick = current_time
+        t_score = time.perf_counter()
+        metrics.observe("score", t_score - t_scan)
+
+        day, energy_today = self.energy.add(fresh_names, scores[fresh].tolist(), elapsed, current_time)
+        if day != self._day:
+            self._day = day
+            self.top.reset("energy")
+            self.top.reset("anomalies")
+        self.top.update("energy", fresh_names, energy_today)
+        self.top.update("instant", fresh_names, scores[fresh].tolist())
+        t_energy = time.perf_counter()
+        metrics.observe("energy", t_energy - t_score)
+
+        if self.history is not None:
+            self.history.write(fresh_names, current_time, cpu[fresh], mem[fresh], disk[fresh], scores[fresh])
+        if self.recorder is not None:
+            self.recorder.write(current_time, fresh_names, cpu[fresh], mem[fresh], disk[fresh])
+        t_history = time.perf_counter()
+        metrics.observe("history", t_history - t_energy)
+
+        suspicious = np.zeros(n, dtype=bool)
+        rules = np.zeros(n, dtype=np.int64)
+        suspicious[fresh], rules[fresh] = self.detector.check_batch(fresh_names, scores[fresh], dt)
+        a = self.detector.profiles
+        slots = np.fromiter((a.slots[name] for name in fresh_names), dtype=np.int64, count=len(fresh_names))
+        self.top.update("mean", fresh_names, a.mean[slots].tolist())
+        if learning:
+            suspicious[:] = False # Learn, but don't flag
+            rules[:] = 0
+        t_detect = time.perf_counter()
+        metrics.observe("detect", t_detect - t_history)
+
+        rows = self._rows
+        built = {} # name -> ProcessRow rebuilt this tick
+        if delta.key:
+            rows.clear()
+        for name in delta.disappeared:
+            rows.pop(name, None)
+        # A flag lasts one tick unless the row is flagged again
+        for name in self._flagged:
+            r = rows.get(name)
+            if r is not None and r.suspicious:
+                built[name] = rows[name] = r._replace(suspicious=False, rules=0)
+
+        alerts = []
+        flagged = np.flatnonzero(suspicious).tolist()
+        for i in flagged:
+            name, score, n_rules = names[i], float(scores[i]), int(rules[i])
+            self.anomaly_log.write(name, n_rules, score, current_time)
+            self.alerts.submit(name, n_rules, score, current_time)
+            alerts.append(name)
+        self._flagged = set(alerts)
+
+        # Rebuild the rows in the scanner's delta and every flagged row; the rest carry over
+        index = dict(zip(names, range(n)))
+        for i in sorted(set(index[name] for name in delta.upserts()).union(flagged)):
+            p = processes[i]
+            built[p["name"]] = rows[p["name"]] = ProcessRow(
+                p["name"], p["cpu"], p["mem"], p["disk"], float(scores[i]), tuple(p["pids"]),
+                bool(suspicious[i]), int(rules[i]), p["stale"]
+            )
+        stale = sum(p["stale"] for p in processes)
+
+        live = set(names)
+        self.top.increment("anomalies", alerts)
+        self.top.retain("instant", live)
+        self.alerts.retain(live)
+        t_alerts = time.perf_counter()
+        metrics.observe("alerts", t_alerts - t_detect)
+
+        self.detector.save()
+        self.energy.save()
+        self.save_snapshot_cache(force=False)
+        t_persist = time.perf_counter()
+        metrics.observe("persist", t_persist - t_alerts)
+
+        if scheduler is not None:
+            scheduler.observe(fresh_names, current_time, self.scanner.promoted)
+            scheduler.retain(live)
+            # Reads on the scanner's worker threads count against the budget too
+            scheduler.account(time.thread_time() - started_cpu + self.scanner.take_read_cpu(), self.interval)
+            metrics.observe("schedule", time.perf_counter() - t_persist)
+
+        self._sampled = len(fresh_names)
+        metrics.set_gauge("processes", n)
+        metrics.set_gauge("sampled_processes", len(fresh_names))
+        metrics.set_gauge("stale_processes", stale)
+        metrics.set_gauge("baseline_profiles", len(self.detector.profiles))
+        metrics.set_gauge("skipped_ticks_total", self.skipped_ticks)
+
+        self._seq += 1
+        appeared = {name: built[name] for name in delta.appeared}
+        changed = {name: r for name, r in built.items() if name not in delta.appeared}
+        return Snapshot(
+            seq=self._seq,
+            timestamp=current_time,
+            rows=tuple(rows.values()),
+            alerts=tuple(alerts),
+            learning=learning,
+            grace_remaining=max(grace_remaining, 0.0),
+            scan_time=time.perf_counter() - started,
+            skipped_ticks=self.skipped_ticks,
+            sampled=len(fresh_names),
+            stale=stale,
+            delta=Delta(self._seq, self._seq - 1, delta.key, appeared, changed, delta.disappeared),
+            fresh=frozenset(fresh_names),
+        )
@@ -0,0 +1,117 @@
+"""
+Delta-encoded row streams.
+
+DeltaTracker turns successive full row sets ({name: row}) into Deltas:
+the names that appeared, the rows that changed by more than a per-field
+epsilon, and the names that disappeared, plus a keyframe (every row)
+every KEYFRAME_EVERY updates or after reset(). Consumers that keep
+their own copy of the rows apply() deltas and only touch what changed;
+a consumer that falls behind merge()s the deltas it skipped.
+
+Rows are dicts or tuples; `epsilon` and `ignore` name fields by key or
+index. Fields without an epsilon must match exactly.
+"""
+from typing import NamedTuple
+
+
+class Delta(NamedTuple):
+    seq: int
+    since: int          # seq of the state this delta applies on top of
+    key: bool           # keyframe: appeared + changed hold every row, drop anything else
+    appeared: dict      # name -> row, new since `since`
+    changed: dict       # name -> row, present before and changed beyond epsilon
+    disappeared: tuple  # names gone since `since`
+
+    def upserts(self):
+        """appeared and changed together, name -> row."""
+        return {**self.appeared, **self.changed}
+
+
+def apply(rows, delta, seq=None):
+    """
+    Apply `delta` to `rows` ({name: row}, updated in place). `seq` is the
+    seq `rows` is at; returns False (rows untouched) if a non-keyframe
+    delta does not follow on from it, and the caller waits for a keyframe.
+    """
+    if delta.key:
+        rows.clear()
+    elif seq is not None and delta.since != seq:
+        return False
+    for name in delta.disappeared:
+        rows.pop(name, None)
+    rows.update(delta.appeared)
+    rows.update(delta.changed)
+    return True
+
+
+def merge(older, newer):
+    """One delta equivalent to `older` followed by `newer`."""
+    if newer.key:
+        return newer
+    gone = set(newer.disappeared)
+    appeared = {n: r for n, r in older.appeared.items() if n not in gone}
+    changed = {n: r for n, r in older.changed.items() if n not in gone}
+    for name, row in newer.appeared.items():
+        # Gone in `older` and back in `newer`: a change as far as the base state knows
+        if name in older.disappeared:
+            changed[name] = row
+        else:
+            appeared[name] = row
+    for name, row in newer.changed.items():
+        (appeared if name in appeared else changed)[name] = row
+    returned = set(newer.appeared)
+    disappeared = tuple(n for n in older.disappeared if n not in returned)
+    # Names that appeared in `older` and left in `newer` never existed for the base state
+    disappeared += tuple(n for n in newer.disappeared if n not in older.appeared)
+    return Delta(newer.seq, older.since, older.key, appeared, changed, disappeared)
+
+
+class DeltaTracker:
+    KEYFRAME_EVERY = 30
+
+    def __init__(self, epsilon=None, ignore=(), keyframe_every=None):
+        if keyframe_every is not None:
+            self.KEYFRAME_EVERY = keyframe_every
+        self.epsilon = dict(epsilon or {})
+        self.ignore = frozenset(ignore)
+        self.rows = {}  # name -> row as last emitted
+        self.seq = 0
+        self._force_key = True
+        self._exact = None  # fields compared exactly, worked out from the first row
+
+    def reset(self):
+        """Make the next delta a keyframe (after a consumer lost track)."""
+        self._force_key = True
+
+    def changed(self, old, new):
+        exact = self._exact
+        if exact is None:
+            fields = range(len(new)) if isinstance(new, tuple) else list(new)
+            exact = self._exact = [f for f in fields if f not in self.ignore and f not in self.epsilon]
+        for field, eps in self.epsilon.items():
+            if abs(new[field] - old[field]) > eps:
+                return True
+        for field in exact:
+            if new[field] != old[field]:
+                return True
+        return False
+
+    def update(self, rows):
+        """Delta from the previous update to `rows` ({name: row})."""
+        self.seq += 1
+        prev = self.rows
+        key = self._force_key or self.seq % self.KEYFRAME_EVERY == 0
+        appeared, changed, emitted = {}, {}, {}
+        for name, row in rows.items():
+            old = prev.get(name)
+            if old is None:
+                appeared[name] = emitted[name] = row
+            elif key or self.changed(old, row):
+                changed[name] = emitted[name] = row
+            else:
+                # Compare later rows against what consumers hold, so slow drift still shows up
+                emitted[name] = old
+        disappeared = tuple(n for n in prev if n not in rows)
+        self.rows = emitted
+        self._force_key = False
+        return Delta(self.seq, self.seq - 1, key, appeared, changed, disappeared)
@@ -0,0 +1,282 @@
+"""
+Per-application energy accounting.
+
+Every tick, each freshly sampled app's Power Score is multiplied by the
+seconds it covers and added to the current bucket at three resolutions
+(minute, hour, local day). Each resolution keeps a fixed number of
+buckets, and the oldest is dropped as a new one opens, so storage stays
+bounded while today / this week stay a handful of dict lookups:
+
+    python -m core.energy --days 7
+
+Energy is in score-seconds: one app pinned at a Power Score of 1.0 for
+an hour uses 3600.
+
+On disk the ledger is a snapshot (energy.json) plus a journal of the
+per-minute increments since it was written (energy.journal). save()
+only hands the increments gathered since the last save to a writer
+thread, which appends them to the journal and folds everything into a
+new snapshot every COMPACT_EVERY saves, so the tick never waits on a
+rewrite of the whole ledger.
+"""
+import argparse, json, os, queue, sys, threading, time
+
+from core import paths
+from core.baseline_store import atomic_write_json
+
+
+class EnergyLedger:
+    # resolution -> buckets kept
+    KEEP = {"minute": 120, "hour": 8 * 24, "day": 400}
+    WIDTH = {"minute": 60, "hour": 3600}  # day buckets follow local midnight instead
+    SAVE_INTERVAL = 60 # seconds between saves
+    COMPACT_EVERY = 60 # journal lines (saves) before the snapshot is rewritten
+    MAX_DT = 60 # longest gap credited to one sample (suspend, clock jumps)
+
+    def __init__(self, path=None, keep=None, save_interval=None, compact_every=None, defer_load=False):
+        """
+        With `defer_load=True` the ledger is not read until load() is called
+        (e.g. from the collector thread); `loaded` tells whether it was.
+        """
+        self._path = path
+        if keep is not None:
+            self.KEEP = dict(self.KEEP, **keep)
+        if save_interval is not None:
+            self.SAVE_INTERVAL = save_interval
+        if compact_every is not None:
+            self.COMPACT_EVERY = compact_every
+        self._lock = threading.Lock()
+        self._buckets = {res: {} for res in self.KEEP}  # res -> {bucket start: {name: energy}}
+        self._pending = {}  # minute start -> {name: energy} added since the last save
+        self._day = (0.0, 0.0)  # (start, end) of the current local day
+        self._seq = 0 # number of the last journal line handed to the writer
+        self._journal_lines = 0
+        self._queue = queue.Queue()
+        self._writer = None
+        self.last_save = time.monotonic()
+        self.loaded = False
+        if not defer_load:
+            self.load()
+
+    @property
+    def path(self):
+        return self._path or os.path.join(paths.data_dir(), "energy.json")
+
+    @property
+    def journal_path(self):
+        return os.path.splitext(self.path)[0] + ".journal"
+
+    # --- Buckets ---
+    def day_start(self, ts):
+        """Local midnight starting the day that contains `ts`."""
+        start, end = self._day
+        if start <= ts < end:
+            return start
+        lt = time.localtime(ts)
+        start = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday, 0, 0, 0, 0, 0, -1))
+        end = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+        self._day = (start, end)
+        return start
+
+    def _bucket_start(self, res, ts):
+        if res == "day":
+            return self.day_start(ts)
+        width = self.WIDTH[res]
+        return ts - ts % width
+
+    def _bucket(self, res, start):
+        buckets = self._buckets[res]
+        b = buckets.get(start)
+        if b is None:
+            b = buckets[start] = {}
+            while len(buckets) > self.KEEP[res]:
+                del buckets[min(buckets)]
+        return b
+
+    def add(self, names, scores, dt, now=None):
+        """
+        Credit score * dt to each name at `now`. `dt` is a scalar or a
+        per-name sequence of seconds covered by each score. Returns
+        (start of today, today's total for each name).
+        """
+        now = time.time() if now is None else now
+        if not hasattr(dt, "__len__"):
+            dt = [dt] * len(names)
+        energy = [(n, float(s) * min(float(d), self.MAX_DT)) for n, s, d in zip(names, scores, dt)]
+        with self._lock:
+            day = self._credit(now, energy)
+            pending = self._pending.setdefault(self._bucket_start("minute", now), {})
+            for name, e in energy:
+                pending[name] = pending.get(name, 0.0) + e
+            return self._day[0], [day[name] for name, _ in energy]
+
+    def _credit(self, ts, energy):
+        """Add (name, energy) pairs to the bucket containing `ts` at every resolution; returns the day bucket."""
+        for res in self.KEEP:
+            b = self._bucket(res, self._bucket_start(res, ts))
+            for name, e in energy:
+                b[name] = b.get(name, 0.0) + e
+        return b # "day" comes last
+
+    # --- Queries ---
+    def bucket(self, res, ts=None):
+        """{name: energy} for the `res` bucket containing `ts` (default: now)."""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            return dict(self._buckets[res].get(self._bucket_start(res, ts), {}))
+
+    def today(self, name):
+        with self._lock:
+            return self._buckets["day"].get(self.day_start(time.time()), {}).get(name, 0.0)
+
+    def days(self, name, n=7, now=None):
+        """Daily totals for `name`, oldest first, ending with today."""
+        t = time.time() if now is None else now
+        starts = []
+        with self._lock:
+            for _ in range(n):
+                start = self.day_start(t)
+                starts.append(start)
+                t = start - 1
+            day = self._buckets["day"]
+            return [day.get(s, {}).get(name, 0.0) for s in reversed(starts)]
+
+    def week(self, name, now=None):
+        """Total over the last 7 local days, today included."""
+        return sum(self.days(name, 7, now))
+
+    def totals(self, res="day", n=1, now=None):
+        """{name: energy} summed over the last `n` `res` buckets."""
+        t = time.time() if now is None else now
+        out = {}
+        with self._lock:
+            buckets = self._buckets[res]
+            for _ in range(n):
+                start = self._bucket_start(res, t)
+                for name, e in buckets.get(start, {}).items():
+                    out[name] = out.get(name, 0.0) + e
+                t = start - 1
+        return out
+
+    # --- Persistence ---
+    def load(self):
+        """
+        Read the snapshot, then replay the journal lines written after it.
+        Each line carries a sequence number and the snapshot the last one it
+        includes, so a crash between the snapshot rename and the journal
+        truncation does not count those increments twice. Snapshots from
+        before the journal count as sequence 0.
+        """
+        data, seq = {}, 0
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            seq = data.get("seq", 0)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Energy ledger unreadable ({e}); starting empty", file=sys.stderr)
+            data = {}
+        with self._lock:
+            for res in self.KEEP:
+                stored = data.get(res, {})
+                starts = sorted(stored, key=float)[-self.KEEP[res]:]
+                self._buckets[res] = {float(s): stored[s] for s in starts}
+
+            lines = 0
+            try:
+                with open(self.journal_path) as f:
+                    for line in f:
+                        try:
+                            rec = json.loads(line)
+                            line_seq, added = rec["seq"], rec["add"]
+                        except (ValueError, KeyError, TypeError):
+                            continue # torn write at the tail
+                        lines += 1
+                        if line_seq <= seq:
+                            continue
+                        for minute, energy in sorted(added.items(), key=lambda kv: float(kv[0])):
+                            self._credit(float(minute), energy.items())
+                        seq = line_seq
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Energy journal unreadable ({e}); using the snapshot only", file=sys.stderr)
+            self._seq, self._journal_lines = seq, lines
+            self.loaded = True
+
+    def save(self, force=False):
+        """
+        Hand the increments since the last save to the writer thread.
+        Debounced to one save per SAVE_INTERVAL unless `force` is set, which
+        also waits until everything handed over is on disk. Does nothing
+        before the ledger is loaded (defer_load).
+        """
+        if not self.loaded:
+            return
+        now = time.monotonic()
+        if not force and (now - self.last_save) < self.SAVE_INTERVAL:
+            return
+        self.last_save = now
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            snapshot = None
+            if pending:
+                self._seq += 1
+                self._journal_lines += 1
+                if self._journal_lines >= self.COMPACT_EVERY:
+                    # Copied here, in step with the journal, so it holds exactly lines 1..seq
+                    snapshot = {res: {start: dict(b) for start, b in buckets.items()} for res, buckets in self._buckets.items()}
+                    self._journal_lines = 0
+            seq = self._seq
+        if pending:
+            self._queue.put((seq, pending, snapshot))
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="sepro-energy", daemon=True)
+                self._writer.start()
+        if force:
+            self._queue.join()
+
+    def _write_loop(self):
+        while True:
+            seq, pending, snapshot = self._queue.get()
+            try:
+                self._write(seq, pending, snapshot)
+            except OSError as e:
+                print(f"Energy ledger save failed: {e}", file=sys.stderr)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, seq, pending, snapshot):
+        added = {repr(minute): {n: round(e, 3) for n, e in b.items()} for minute, b in pending.items()}
+        with open(self.journal_path, "a") as f:
+            f.write(json.dumps({"seq": seq, "add": added}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if snapshot is None:
+            return
+        data = {res: {repr(start): {n: round(e, 3) for n, e in b.items()} for start, b in buckets.items()}
+                for res, buckets in snapshot.items()}
+        data["seq"] = seq
+        atomic_write_json(self.path, data)
+        with open(self.journal_path, "w"):
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.energy", description="Per-app energy totals")
+    parser.add_argument("--days", type=int, default=1, help="days to total, today included (default 1)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--data-dir")
+    args = parser.parse_args(argv)
+    if args.data_dir:
+        paths.set_data_dir(args.data_dir)
+
+    totals = EnergyLedger().totals("day", args.days)
+    for name, e in sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"{e:>12.1f}  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,465 @@
+"""
+Fleet mode: many lightweight agents, one aggregator.
+
+Agents scan their machine every interval and stream the aggregated app
+rows (name, cpu, mem, disk) to the aggregator as NDJSON over TCP. After
+a keyframe only the rows that changed and the names that disappeared
+are sent. The aggregator scores the rows and runs one AnomalyDetector
+per host, each with its own baseline under <data dir>/fleet/<host>/.
+
+    python -m core.fleet aggregate --listen 0.0.0.0:7321
+    python -m core.fleet agent --connect aggregator:7321
+    python -m core.fleet loadtest --hosts 200 --processes 100   # loopback, synthetic agents
+
+Backpressure: the aggregator stops reading sockets when its detection
+queue is full, so TCP flow control pushes back on the agents. An agent
+whose send buffer fills up drops the backlog and sends a keyframe next,
+so a slow link never costs more than one resync.
+"""
+import argparse, asyncio, json, multiprocessing, os, queue, re, socket, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from core import paths
+from core.delta import DeltaTracker
+import core.power_model as pm
+
+PORT = 7321
+PROTOCOL = 1
+
+
+def _dumps(msg):
+    return (json.dumps(msg, separators=(",", ":")) + "\n").encode()
+
+
+class DeltaEncoder:
+    """
+    Turns successive row sets into messages (core.delta on the wire): a
+    keyframe (every row) every KEYFRAME_EVERY ticks or after reset(),
+    otherwise only changed rows ("up") and removed names ("rm").
+    """
+    KEYFRAME_EVERY = 30
+
+    def __init__(self, keyframe_every=None):
+        self.tracker = DeltaTracker(keyframe_every=keyframe_every or self.KEYFRAME_EVERY)
+
+    @property
+    def seq(self):
+        return self.tracker.seq
+
+    def reset(self):
+        """Make the next message a keyframe (after dropped messages or a reconnect)."""
+        self.tracker.reset()
+
+    def encode(self, rows, ts):
+        """`rows`: iterable of (name, cpu, mem, disk)."""
+        delta = self.tracker.update({r[0]: (r[1], r[2], r[3]) for r in rows})
+        msg = {"seq": delta.seq, "ts": ts}
+        if delta.key:
+            msg["key"] = 1
+        elif delta.disappeared:
+            msg["rm"] = list(delta.disappeared)
+        up = [[n, *v] for n, v in delta.upserts().items()]
+        if up:
+            msg["up"] = up
+        return msg
+
+
+class DeltaDecoder:
+    """Rebuilds the row set from DeltaEncoder messages; ignores deltas after a gap until the next keyframe."""
+
+    def __init__(self):
+        self.rows = {}    # name -> (cpu, mem, disk)
+        self.seq = None
+        self.synced = False
+
+    def apply(self, msg):
+        """Returns True if `rows` is now current."""
+        seq = msg["seq"]
+        if msg.get("key"):
+            self.rows = {r[0]: (r[1], r[2], r[3]) for r in msg.get("up", ())}
+            self.synced = True
+        elif self.synced and self.seq is not None and seq == self.seq + 1:
+            rows = self.rows
+            for name in msg.get("rm", ()):
+                rows.pop(name, None)
+            for r in msg.get("up", ()):
+                rows[r[0]] = (r[1], r[2], r[3])
+        else:
+            self.synced = False
+        self.seq = seq
+        return self.synced
+
+
+# --- Agent ---
+class FleetAgent:
+    """
+    Scans locally and streams deltas to an aggregator. Scanning runs on
+    the caller's thread, sending on a background thread with a small
+    queue, so a slow or absent aggregator never delays a scan.
+    """
+    QUEUE_SIZE = 5
+    RECONNECT_MAX = 30 # seconds between reconnect attempts, at most
+
+    def __init__(self, address, host=None, interval=2.0, scanner=None):
+        self.address = address
+        self.host = host or socket.gethostname()
+        self.interval = interval
+        if scanner is None:
+            from core.process_scanner import ProcessScanner
+            scanner = ProcessScanner()
+        self.scanner = scanner
+        self.encoder = DeltaEncoder()
+        self.dropped = 0
+        self._queue = queue.Queue(self.QUEUE_SIZE)
+        self._need_key = threading.Event()
+        self._stop = threading.Event()
+        self._sender = threading.Thread(target=self._send_loop, name="sepro-fleet-send", daemon=True)
+
+    def request_stop(self):
+        self._stop.set()
+
+    def submit(self, rows, ts):
+        if self._need_key.is_set():
+            self._need_key.clear()
+            self.encoder.reset()
+        msg = self.encoder.encode(rows, ts)
+        try:
+            self._queue.put_nowait(msg)
+        except queue.Full:
+            # Backed up: throw the backlog away and resync with a keyframe
+            while True:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    break
+            self.encoder.reset()
+            self._queue.put_nowait(self.encoder.encode(rows, ts))
+
+    def run(self, max_ticks=None):
+        self._sender.start()
+        self.scanner.warm_up()
+        ticks = 0
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            rows = [(p["name"], p["cpu"], p["mem"], p["disk"]) for p in self.scanner.get_app_processes()]
+            self.submit(rows, time.time())
+            ticks += 1
+            if max_ticks is not None and ticks >= max_ticks:
+                break
+            next_tick += self.interval
+            self._stop.wait(max(0.0, next_tick - time.monotonic()))
+        # Give the sender a moment to flush what is queued
+        deadline = time.monotonic() + 2
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stop.set()
+
+    def _connect(self):
+        delay = 1.0
+        while not self._stop.is_set():
+            try:
+                sock = socket.create_connection(self.address, timeout=10)
+                sock.sendall(_dumps({"hello": self.host, "interval": self.interval, "v": PROTOCOL}))
+                return sock
+            except OSError as e:
+                print(f"Fleet: cannot reach {self.address[0]}:{self.address[1]} ({e}); retrying in {delay:.0f}s", file=sys.stderr)
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.RECONNECT_MAX)
+        return None
+
+    def _send_loop(self):
+        sock = None
+        while not self._stop.is_set():
+            if sock is None:
+                sock = self._connect()
+                if sock is None:
+                    return
+                # Whatever is queued was encoded against the old connection
+                self._need_key.set()
+                while True:
+                    try:
+                        self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+            try:
+                msg = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                sock.sendall(_dumps(msg))
+            except OSError:
+                sock.close()
+                sock = None
+        if sock is not None:
+            sock.close()
+
+
+# --- Aggregator ---
+class HostState:
+    __slots__ = ("host", "detector", "decoder", "first_seen", "last_seen", "ticks", "anomalies", "connected", "last_rows")
+
+    def __init__(self, host):
+        self.host = host
+        self.detector = None # built by the detection thread on the first message
+        self.decoder = DeltaDecoder()
+        self.first_seen = time.time()
+        self.last_seen = None
+        self.ticks = 0
+        self.anomalies = 0
+        self.connected = True
+        self.last_rows = 0
+
+
+class Aggregator:
+    """
+    Accepts any number of agents with asyncio. Readers decode lines and
+    hand them to a single detection worker through a bounded queue;
+    when it is full the readers stop reading, which pushes back on the
+    agents through TCP. The worker runs process() on one dedicated
+    thread, so baseline loads, journal appends and compactions never
+    hold up the event loop, and each detector is only touched by that
+    thread (on_anomaly is called from it too).
+    """
+    QUEUE_SIZE = 1000
+    HOST_GRACE_PERIOD = 30 # seconds after a host first connects with no anomalies reported
+    LINE_LIMIT = 4 * 1024 * 1024
+
+    def __init__(self, data_dir=None, on_anomaly=None, queue_size=None, flush_interval=None):
+        self._data_dir = data_dir
+        self.on_anomaly = on_anomaly or (lambda *record: None)
+        if queue_size is not None:
+            self.QUEUE_SIZE = queue_size
+        self.flush_interval = flush_interval
+        self.hosts = {}   # host -> HostState
+        self.processed = 0
+        self.stalls = 0   # times a reader had to wait for queue space
+        self._queue = None
+        self._worker = None
+        self._executor = None
+
+    def _baseline_file(self, host):
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", host) or "_"
+        base = os.path.join(self._data_dir, "fleet", safe) if self._data_dir else paths.data_dir("fleet", safe)
+        os.makedirs(base, exist_ok=True)
+        return os.path.join(base, "baseline_store.json")
+
+    def _state(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState(host)
+        state.connected = True
+        return state
+
+    async def start(self, host="0.0.0.0", port=PORT):
+        self._queue = asyncio.Queue(self.QUEUE_SIZE)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sepro-fleet-detect")
+        self._worker = asyncio.create_task(self._work())
+        return await asyncio.start_server(self._handle, host, port, limit=self.LINE_LIMIT)
+
+    async def _handle(self, reader, writer):
+        state = None
+        try:
+            hello = json.loads(await reader.readline())
+            state = self._state(str(hello["hello"]))
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue
+                if self._queue.full():
+                    self.stalls += 1
+                await self._queue.put((state, msg))
+        except (ValueError, KeyError, TypeError, ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+            if state is not None:
+                try:
+                    self._queue.put_nowait((state, None))
+                except asyncio.QueueFull:
+                    state.connected = False # baseline is saved by the next flush or close()
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            state, msg = await self._queue.get()
+            try:
+                await loop.run_in_executor(self._executor, self.process, state, msg)
+            except Exception as e:
+                print(f"Fleet: tick from {state.host} failed: {e}", file=sys.stderr)
+
+    def process(self, state, msg):
+        """
+        Apply one message (None = disconnected) and run detection on the
+        host's rows. Runs on the detection thread.
+        """
+        if state.detector is None:
+            state.detector = pm.AnomalyDetector(self._baseline_file(state.host), flush_interval=self.flush_interval)
+        if msg is None:
+            state.connected = False
+            state.detector.save(force=True)
+            return
+        if not state.decoder.apply(msg):
+            return
+
+        rows = state.decoder.rows
+        names = list(rows)
+        values = np.array(list(rows.values()), dtype=np.float64).reshape(-1, 3)
+        scores = pm.PowerModel.compute_score_batch(values[:, 0], values[:, 1], values[:, 2])
+        suspicious, rules = state.detector.check_batch(names, scores)
+
+        now = time.time()
+        state.ticks += 1
+        state.last_seen = now
+        state.last_rows = len(names)
+        self.processed += 1
+        if suspicious.any() and now - state.first_seen >= self.HOST_GRACE_PERIOD:
+            for i in np.flatnonzero(suspicious).tolist():
+                state.anomalies += 1
+                self.on_anomaly(state.host, names[i], int(rules[i]), float(scores[i]), msg["ts"])
+        state.detector.save()
+
+    def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True) # let a running process() finish first
+        for state in self.hosts.values():
+            if state.detector is not None:
+                state.detector.save(force=True)
+
+    def summary(self):
+        return {
+            "hosts": len(self.hosts),
+            "connected": sum(s.connected for s in self.hosts.values()),
+            "ticks": self.processed,
+            "anomalies": sum(s.anomalies for s in self.hosts.values()),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "stalls": self.stalls,
+        }
+
+
+# --- CLI ---
+def _address(text, default_host):
+    host, _, port = text.rpartition(":")
+    return (host or default_host, int(port or PORT))
+
+
+def _print_anomaly(host, name, rules, score, ts):
+    print(json.dumps({"type": "anomaly", "host": host, "ts": ts, "name": name, "rules": rules, "score": round(score, 4)}), flush=True)
+
+
+async def _aggregate(args):
+    agg = Aggregator(args.data_dir, on_anomaly=_print_anomaly)
+    host, port = _address(args.listen, "0.0.0.0")
+    server = await agg.start(host, port)
+    print(f"Fleet aggregator listening on {host}:{port}", file=sys.stderr)
+    try:
+        async with server:
+            while True:
+                await asyncio.sleep(args.summary_every)
+                print(json.dumps(dict(type="summary", ts=time.time(), **agg.summary())), file=sys.stderr)
+    finally:
+        agg.close()
+
+
+async def _synthetic_hosts(port, hosts, processes, interval, ticks, seed):
+    """Many synthetic agents on one event loop (for loadtest)."""
+    from core.process_scanner import ProcessScanner
+    from core.sources import SyntheticSource
+
+    async def one(i):
+        scanner = ProcessScanner(SyntheticSource(processes=processes, seed=seed + i, interval=interval))
+        encoder = DeltaEncoder()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(_dumps({"hello": f"host{i:04d}", "interval": interval, "v": PROTOCOL}))
+        await asyncio.sleep(interval * i / hosts) # spread hosts over the interval
+        next_tick = time.monotonic()
+        for _ in range(ticks):
+            rows = [(p["name"], p["cpu"], p["mem"], p["disk"]) for p in scanner.get_app_processes()]
+            writer.write(_dumps(encoder.encode(rows, time.time())))
+            await writer.drain()
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+        writer.close()
+
+    await asyncio.gather(*(one(i) for i in range(hosts)))
+
+
+def _run_synthetic(*args):
+    asyncio.run(_synthetic_hosts(*args))
+
+
+async def _loadtest(args):
+    workdir = tempfile.mkdtemp(prefix="sepro-fleet-")
+    agg = Aggregator(workdir)
+    server = await agg.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    # Agents in a separate process, so only the aggregator is measured here
+    agents = multiprocessing.Process(
+        target=_run_synthetic,
+        args=(port, args.hosts, args.processes, args.interval, args.ticks, args.seed), daemon=True,
+    )
+    agents.start()
+    cpu0, wall0 = time.process_time(), time.monotonic()
+    expected = args.hosts * args.ticks
+    while agents.is_alive() or not agg._queue.empty():
+        await asyncio.sleep(0.5)
+        if agg.processed >= expected and agg._queue.empty():
+            break
+    cpu, wall = time.process_time() - cpu0, time.monotonic() - wall0
+    agents.join(5)
+    await asyncio.sleep(0.2) # let the handlers see the agents hang up
+    server.close()
+    agg.close()
+
+    s = agg.summary()
+    print(f"hosts {args.hosts} x {args.processes} processes, {args.ticks} ticks at {args.interval}s")
+    print(f"processed {s['ticks']}/{expected} ticks in {wall:.1f}s wall, aggregator CPU {cpu:.2f}s ({cpu / wall:.0%} of one core)")
+    print(f"per host tick: {cpu / max(s['ticks'], 1) * 1000:.3f} ms CPU, backpressure stalls {s['stalls']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.fleet", description="SEPRO fleet agent / aggregator")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    p = sub.add_parser("agent", help="stream this machine's process rows to an aggregator")
+    p.add_argument("--connect", required=True, help="aggregator HOST[:PORT]")
+    p.add_argument("--interval", type=float, default=2.0)
+    p.add_argument("--host", help="name to report (default: hostname)")
+    p.add_argument("--ticks", type=int, default=None)
+
+    p = sub.add_parser("aggregate", help="receive agents and run per-host anomaly detection")
+    p.add_argument("--listen", default=f"0.0.0.0:{PORT}", help="HOST:PORT (default 0.0.0.0:%(default)s)")
+    p.add_argument("--data-dir", help="per-host baselines go under DATA_DIR/fleet/<host>")
+    p.add_argument("--summary-every", type=float, default=10.0)
+
+    p = sub.add_parser("loadtest", help="aggregator throughput with synthetic agents on loopback")
+    p.add_argument("--hosts", type=int, default=100)
+    p.add_argument("--processes", type=int, default=100)
+    p.add_argument("--ticks", type=int, default=10)
+    p.add_argument("--interval", type=float, default=2.0)
+    p.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(argv)
+    try:
+        if args.mode == "agent":
+            agent = FleetAgent(_address(args.connect, "127.0.0.1"), args.host, args.interval)
+            agent.run(args.ticks)
+        elif args.mode == "aggregate":
+            asyncio.run(_aggregate(args))
+        else:
+            asyncio.run(_loadtest(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
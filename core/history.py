@@ -0,0 +1,230 @@
+import os, time, json, threading
+import numpy as np
+
+from core import paths
+from core.baseline_store import atomic_write_json
+
+
+RECORD = np.dtype([
+    ("ts", "<f8"),
+    ("cpu", "<f4"),
+    ("mem", "<f4"),
+    ("disk", "<f4"),
+    ("score", "<f4"),
+])
+
+
+class HistoryStore:
+    """
+    Per-process time series in a memory-mapped ring buffer file.
+
+    The file holds a fixed header, per-slot head/count arrays and a
+    (slots x capacity) block of fixed-size records. Every process name owns
+    one slot. When all are taken, slots not written for RECYCLE_AFTER
+    seconds are recycled, oldest first; if that is not enough the file is
+    rewritten with twice the slots (up to MAX_SLOTS), so a running
+    process never loses its series to a newcomer. Writes are vectorized
+    over a whole tick. write() runs on the collector thread and may remap
+    the file, so every access takes the store's lock and read() hands out
+    a copy, never a view into the mapping.
+    """
+    MAGIC = b"SEPROHS1"
+    HEADER_SIZE = 64
+
+    SLOTS = 256
+    MAX_SLOTS = 8192
+    RECYCLE_AFTER = 300.0 # seconds without a write before a slot may go to another name
+    # Records per process: 2 h at the default 2 s interval, 30 min for a
+    # process the adaptive sampler keeps in its 0.5 s hot tier
+    CAPACITY = 3600
+
+    def __init__(self, path=None, slots=None, capacity=None):
+        self.path = path or os.path.join(paths.data_dir("history"), "history.dat")
+        self.names_path = os.path.splitext(self.path)[0] + ".names.json"
+        self.slots_count = slots or self.SLOTS
+        self.capacity = capacity or self.CAPACITY
+        self._lock = threading.Lock()
+        self._open()
+
+    # --- File layout ---
+    def _layout(self):
+        n = self.slots_count
+        head_off = self.HEADER_SIZE
+        count_off = head_off + n * 8
+        rec_off = count_off + n * 8
+        size = rec_off + n * self.capacity * RECORD.itemsize
+        return head_off, count_off, rec_off, size
+
+    def _header(self):
+        header = np.zeros(self.HEADER_SIZE, dtype=np.uint8)
+        header[:8] = np.frombuffer(self.MAGIC, dtype=np.uint8)
+        header[8:24] = np.frombuffer(np.array([self.slots_count, self.capacity], dtype="<i8").tobytes(), dtype=np.uint8)
+        return header
+
+    def _open(self):
+        self._adopt_size()
+        head_off, count_off, rec_off, size = self._layout()
+        fresh = True
+        if os.path.exists(self.path) and os.path.getsize(self.path) == size:
+            with open(self.path, "rb") as f:
+                fresh = f.read(24) != self._header()[:24].tobytes()
+
+        self._map_file("w+" if fresh else "r+")
+        if fresh:
+            self._map[:self.HEADER_SIZE] = self._header()
+
+        self.names = [None] * self.slots_count
+        if not fresh and os.path.exists(self.names_path):
+            try:
+                with open(self.names_path) as f:
+                    stored = json.load(f)
+                self.names[:len(stored)] = stored[:self.slots_count]
+            except (OSError, ValueError):
+                self.count[:] = 0 # slot owners unknown: start clean
+        if fresh:
+            self.head[:] = 0
+            self.count[:] = 0
+        self.slots = {n: i for i, n in enumerate(self.names) if n is not None}
+
+    def _adopt_size(self):
+        """Keep the slot count of an existing file that was grown past the one asked for."""
+        try:
+            with open(self.path, "rb") as f:
+                header = f.read(24)
+        except OSError:
+            return
+        if len(header) < 24 or header[:8] != self.MAGIC:
+            return
+        slots, capacity = (int(v) for v in np.frombuffer(header[8:24], dtype="<i8"))
+        if capacity == self.capacity and self.slots_count < slots <= self.MAX_SLOTS:
+            self.slots_count = slots
+
+    def _map_file(self, mode):
+        head_off, count_off, rec_off, size = self._layout()
+        self._map = np.memmap(self.path, dtype=np.uint8, mode=mode, shape=(size,))
+        self.head = self._map[head_off:count_off].view("<i8")
+        self.count = self._map[count_off:rec_off].view("<i8")
+        self.records = self._map[rec_off:size].view(RECORD).reshape(self.slots_count, self.capacity)
+
+    def _unmap(self):
+        self._map.flush()
+        # Every view has to go before the file can be replaced (Windows)
+        del self.head, self.count, self.records, self._map
+
+    def _grow(self, slots):
+        """Rewrite the file with `slots` slots, keeping every series."""
+        old = self.slots_count
+        head, count, records = self.head, self.count, self.records
+        self.slots_count = slots
+        head_off, count_off, rec_off, size = self._layout()
+        tmp = self.path + ".tmp"
+        grown = np.memmap(tmp, dtype=np.uint8, mode="w+", shape=(size,))
+        grown[:self.HEADER_SIZE] = self._header()
+        grown[head_off:count_off].view("<i8")[:old] = head
+        grown[count_off:rec_off].view("<i8")[:old] = count
+        grown[rec_off:size].view(RECORD).reshape(slots, self.capacity)[:old] = records
+        grown.flush()
+        del grown, head, count, records
+        self._unmap()
+        os.replace(tmp, self.path)
+        self._map_file("r+")
+        # names.json only lists the old slots; the new ones start empty either way
+        self.names += [None] * (slots - old)
+
+    # --- Slots ---
+    def _last_ts(self):
+        last = (self.head - 1) % self.capacity
+        ts = self.records["ts"][np.arange(self.slots_count), last]
+        return np.where(self.count > 0, ts, -np.inf)
+
+    def _assign(self, new_names, ts):
+        """
+        Give each new name a slot: a free one, then one idle for
+        RECYCLE_AFTER (stalest first), then a new one from growing the file.
+        Names left over at MAX_SLOTS are not recorded.
+        """
+        free = [i for i, n in enumerate(self.names) if n is None]
+        if len(free) < len(new_names):
+            last = self._last_ts()
+            idle = [int(i) for i in np.argsort(last)
+                    if self.names[i] is not None and last[i] < ts - self.RECYCLE_AFTER]
+            free += idle[:len(new_names) - len(free)]
+        if len(free) < len(new_names) and self.slots_count < self.MAX_SLOTS:
+            old = self.slots_count
+            self._grow(min(max(old * 2, old + len(new_names) - len(free)), self.MAX_SLOTS))
+            free += range(old, self.slots_count)
+
+        for name, slot in zip(new_names, free):
+            old = self.names[slot]
+            if old is not None:
+                del self.slots[old]
+            self.names[slot] = name
+            self.slots[name] = slot
+            self.head[slot] = 0
+            self.count[slot] = 0
+        atomic_write_json(self.names_path, self.names)
+
+    def slot_of(self, name):
+        return self.slots.get(name)
+
+    # --- Write / read ---
+    def write(self, names, ts, cpu, mem, disk, score):
+        """Append one record per name (names unique) for a tick at time `ts`."""
+        with self._lock:
+            self._write(names, ts, cpu, mem, disk, score)
+
+    def _write(self, names, ts, cpu, mem, disk, score):
+        new = [n for n in dict.fromkeys(names) if n not in self.slots]
+        if new:
+            self._assign(new, ts)
+
+        get = self.slots.get
+        idx = np.fromiter((get(n, -1) for n in names), dtype=np.int64, count=len(names))
+        keep = idx >= 0
+        slots = idx[keep]
+        if not len(slots):
+            return
+
+        head = self.head[slots]
+        rec = self.records
+        rec["ts"][slots, head] = ts
+        rec["cpu"][slots, head] = np.asarray(cpu)[keep]
+        rec["mem"][slots, head] = np.asarray(mem)[keep]
+        rec["disk"][slots, head] = np.asarray(disk)[keep]
+        rec["score"][slots, head] = np.asarray(score)[keep]
+        self.head[slots] = (head + 1) % self.capacity
+        self.count[slots] = np.minimum(self.count[slots] + 1, self.capacity)
+
+    def _read_parts(self, name):
+        """Up to two record views (oldest first) for `name`; hold the lock while using them."""
+        slot = self.slots.get(name)
+        if slot is None:
+            return []
+        n, head = int(self.count[slot]), int(self.head[slot])
+        ring = self.records[slot]
+        if n < self.capacity:
+            return [ring[head - n:head]]
+        return [ring[head:], ring[:head]] if head else [ring]
+
+    def read(self, name, seconds=None, now=None):
+        """
+        Records for `name` from the last `seconds` (all if None), oldest
+        first, as a copy that stays valid after the file is grown.
+        """
+        cutoff = None if seconds is None else (now or time.time()) - seconds
+        with self._lock:
+            parts = self._read_parts(name)
+            if cutoff is not None:
+                parts = [p[np.searchsorted(p["ts"], cutoff):] for p in parts]
+            parts = [p for p in parts if len(p)]
+            if not parts:
+                return np.empty(0, dtype=RECORD)
+            return np.array(parts[0]) if len(parts) == 1 else np.concatenate(parts)
+
+    def flush(self):
+        with self._lock:
+            self._map.flush()
+
+    def close(self):
+        with self._lock:
+            self._unmap()
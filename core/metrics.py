@@ -0,0 +1,253 @@
+"""
+Self-instrumentation: where each collector tick spends its time.
+
+Phase timers and histograms are fed by the collector (and the UI for
+rendering), scan errors by the scanner. Everything can be read back as
+a short status line, or scraped in Prometheus text format from an
+optional localhost endpoint:
+
+    python -m core --metrics-port 9464
+    curl localhost:9464/metrics
+    curl localhost:9464/profile?ticks=50   # cProfile the next 50 ticks
+"""
+import bisect, cProfile, io, os, pstats, sys, threading, time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from core import paths
+
+
+class Histogram:
+    """Cumulative-bucket histogram, Prometheus style."""
+    __slots__ = ("bounds", "counts", "sum", "count", "last")
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.last = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.last = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (coarse, but cheap)."""
+        if not self.count:
+            return 0.0
+        target, seen = q * self.count, 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    # seconds
+    TICK_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+    PER_PROCESS_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = {}     # phase -> Histogram
+        self.tick = Histogram(self.TICK_BUCKETS)
+        self.scan_per_process = Histogram(self.PER_PROCESS_BUCKETS)
+        self.counters = {}   # (name, label value) -> count
+        self.gauges = {}     # name -> value
+        self._profile = None # [Profile, ticks left, path] while capturing
+        self.last_profile = None
+
+    # --- Recording ---
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            h = self.phases.get(phase)
+            if h is None:
+                h = self.phases[phase] = Histogram(self.TICK_BUCKETS)
+            h.observe(seconds)
+
+    def set_counter(self, name, label, value):
+        """Set a cumulative counter owned elsewhere (e.g. the scanner's error counts)."""
+        with self._lock:
+            self.counters[(name, label)] = value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    @contextmanager
+    def timed_tick(self, processes=None):
+        """
+        Wrap one collector tick: records its duration and, while a capture
+        is pending, runs it under cProfile. `processes()` is called after
+        the tick for the scan-cost-per-process histogram.
+        """
+        prof = self._profile
+        if prof is not None:
+            prof[0].enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if prof is not None:
+                prof[0].disable()
+                self._profile_tick(prof)
+            with self._lock:
+                self.tick.observe(elapsed)
+                scan = self.phases.get("scan")
+                n = processes() if processes else 0
+                if scan is not None and n:
+                    self.scan_per_process.observe(scan.last / n)
+
+    # --- Profiling ---
+    def capture_profile(self, ticks, path=None):
+        """cProfile the next `ticks` collector ticks; stats go to `path` (.prof)."""
+        if path is None:
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(paths.logs_dir(), f"profile-{stamp}.prof")
+        self._profile = [cProfile.Profile(), max(int(ticks), 1), path]
+        return path
+
+    def _profile_tick(self, prof):
+        prof[1] -= 1
+        if prof[1] > 0:
+            return
+        self._profile = None
+        profile, _, path = prof
+        try:
+            profile.dump_stats(path)
+        except OSError as e:
+            print(f"Profile save failed: {e}", file=sys.stderr)
+            return
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(15)
+        print(f"Profile saved to {path}\n{out.getvalue()}", file=sys.stderr)
+        self.last_profile = path
+
+    @property
+    def profiling(self):
+        return self._profile is not None
+
+    # --- Reading ---
+    def status_text(self):
+        """One line for the status bar."""
+        with self._lock:
+            t, per = self.tick, self.scan_per_process
+            if not t.count:
+                return ""
+            parts = [f"tick {t.last * 1000:.1f} ms (p95 ≤{t.quantile(0.95) * 1000:g})"]
+            if per.count:
+                parts.append(f"scan {per.last * 1e6:.0f} µs/proc")
+            errors = sum(v for (name, _), v in self.counters.items() if name == "scan_errors_total")
+            if errors:
+                parts.append(f"{errors} read errors")
+            if self._profile is not None:
+                parts.append("profiling…")
+        return " | ".join(parts)
+
+    @staticmethod
+    def _histogram_lines(name, h, labels=""):
+        sep = "," if labels else ""
+        lines, seen = [], 0
+        for bound, n in zip(h.bounds, h.counts):
+            seen += n
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound:g}"}} {seen}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {h.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {h.sum:.9g}")
+        lines.append(f"{name}_count{suffix} {h.count}")
+        return lines
+
+    def prometheus(self):
+        """All metrics in Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                "# HELP sepro_tick_seconds Duration of a full collector tick.",
+                "# TYPE sepro_tick_seconds histogram",
+            ]
+            lines += self._histogram_lines("sepro_tick_seconds", self.tick)
+
+            lines += [
+                "# HELP sepro_phase_seconds Time spent in each phase of a tick.",
+                "# TYPE sepro_phase_seconds histogram",
+            ]
+            for phase, h in sorted(self.phases.items()):
+                lines += self._histogram_lines("sepro_phase_seconds", h, f'phase="{phase}"')
+
+            lines += [
+                "# HELP sepro_scan_seconds_per_process Scan time divided by processes sampled.",
+                "# TYPE sepro_scan_seconds_per_process histogram",
+            ]
+            lines += self._histogram_lines("sepro_scan_seconds_per_process", self.scan_per_process)
+
+            names = sorted({name for name, _ in self.counters})
+            for name in names:
+                lines.append(f"# TYPE sepro_{name} counter")
+                for (n, label), v in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(f'sepro_{name}{{kind="{label}"}} {v}')
+
+            for name, v in sorted(self.gauges.items()):
+                lines.append(f"# TYPE sepro_{name} gauge")
+                lines.append(f"sepro_{name} {v}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Serves /metrics (Prometheus text) and /profile?ticks=N on localhost
+    from a daemon thread.
+    """
+
+    def __init__(self, metrics, port, host="127.0.0.1"):
+        self.metrics = metrics
+        server_metrics = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/metrics":
+                    body = server_metrics.prometheus().encode()
+                    ctype = "text/plain; version=0.0.4; charset=utf-8"
+                elif url.path == "/profile":
+                    try:
+                        ticks = int(parse_qs(url.query).get("ticks", ["20"])[0])
+                    except ValueError:
+                        self.send_error(400, "ticks must be an integer")
+                        return
+                    body = (server_metrics.capture_profile(ticks) + "\n").encode()
+                    ctype = "text/plain; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # keep scrapes out of stderr
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="sepro-metrics", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
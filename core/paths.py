@@ -0,0 +1,49 @@
+import os
+
+# AppData Path Setup
+# Nothing is created at import time; directories appear on first use.
+APP_NAME = "SEPRO"
+
+_data_dir = None
+
+
+def default_data_dir():
+    """SEPRO_DATA_DIR, else %LOCALAPPDATA%\\SEPRO, else ~/.local/share/SEPRO."""
+    if os.getenv("SEPRO_DATA_DIR"):
+        return os.getenv("SEPRO_DATA_DIR")
+    if os.getenv("LOCALAPPDATA"):
+        return os.path.join(os.getenv("LOCALAPPDATA"), APP_NAME)
+    base = os.getenv("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, APP_NAME)
+
+
+def set_data_dir(path):
+    global _data_dir
+    _data_dir = path
+
+
+def data_dir(*parts):
+    """Directory under the data dir, created if missing."""
+    path = os.path.join(_data_dir or default_data_dir(), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def baseline_file():
+    return os.path.join(data_dir(), "baseline_store.json")
+
+
+def cold_baseline_file():
+    """dbm file (the backend may add an extension) for evicted profiles."""
+    return os.path.join(data_dir(), "baseline_cold")
+
+
+def snapshot_cache_file():
+    """Last table shown, painted at startup until live data arrives."""
+    return os.path.join(data_dir(), "last_snapshot.json")
+
+
+def logs_dir():
+    return data_dir("logs")
+
+# End Path Setup
@@ -1,29 +1,9 @@
-import json, os, time, math
-from collections import deque
+import time, math
+import numpy as np
 
-# AppData Path Setup
-APP_NAME = "SEPRO"
-APP_DIR = os.path.join(os.getenv('LOCALAPPDATA'), APP_NAME)
-
-if not os.path.exists(APP_DIR):
-    os.makedirs(APP_DIR)
-
-BASELINE_FILE = os.path.join(APP_DIR, "baseline_store.json")
-# End Path Setup 
-
-
-def load_baseline():
-    if not os.path.exists(BASELINE_FILE):
-        return {}
-    try:
-        with open(BASELINE_FILE, "r") as f:
-            return json.load(f)
-    except:
-        return {}
-
-def save_baseline(data):
-    with open(BASELINE_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+from core.baseline_store import BaselineStore, ColdStore
+from core.rules import RuleContext, RuleEngine
+from core import paths
 
 class PowerModel:
     CPU_WEIGHT = 0.7
@@ -42,24 +22,184 @@ class PowerModel:
             disk_norm * PowerModel.DISK_WEIGHT
         )
 
+    @staticmethod
+    def compute_score_batch(cpu_p, mem_mb, disk_mb_s):
+        """Vectorized compute_score over equal-length sequences; returns a float64 array."""
+        cpu_norm = np.minimum(np.asarray(cpu_p, dtype=np.float64) / 100, 1.0)
+        mem_norm = np.minimum(np.asarray(mem_mb, dtype=np.float64) / 4000, 1.0)
+        disk_norm = np.minimum(np.asarray(disk_mb_s, dtype=np.float64) / 200, 1.0)
+
+        return (
+            cpu_norm * PowerModel.CPU_WEIGHT +
+            mem_norm * PowerModel.MEM_WEIGHT +
+            disk_norm * PowerModel.DISK_WEIGHT
+        )
+
+
+class ProfileArrays:
+    """
+    Struct-of-arrays storage for every ProcessProfile.
+
+    Each process name owns one slot; its EWMA state lives in the flat
+    mean/var/std arrays and its recent scores in a (slots x WINDOW) ring.
+    Unfilled ring cells hold NaN, which compares False in every rule.
+    Released slots go on a free list and are reused before the arrays grow.
+    """
+    WINDOW = 5
+    ALPHA = 0.1
+    REF_INTERVAL = 2.0 # sampling interval ALPHA was tuned for, in seconds
+
+    def __init__(self, capacity=64):
+        self.slots = {}   # name -> slot
+        self.names = []   # slot -> name, None for a released slot
+        self.free = []    # released slots
+        self.capacity = 0
+        self._grow(capacity)
+
+    def __len__(self):
+        return len(self.slots)
+
+    @property
+    def used(self):
+        """Slots handed out so far (live or free); everything past this is untouched."""
+        return len(self.names)
+
+    def live(self):
+        """Slot numbers of every live profile."""
+        return np.fromiter(self.slots.values(), dtype=np.int64, count=len(self.slots))
+
+    # field -> (default, dtype, per-slot shape)
+    FIELDS = {
+        "mean": (0.05, np.float64, ()),
+        "var": (0.001, np.float64, ()),
+        "std": (math.sqrt(0.001), np.float64, ()),
+        "first_seen": (0.0, np.float64, ()),
+        "last_update": (0.0, np.float64, ()),
+        "samples": (np.nan, np.float64, (WINDOW,)),
+        "count": (0, np.int64, ()),
+        "head": (0, np.int64, ()),
+        "dirty": (False, np.bool_, ()),  # changed since the last flush
+    }
+
+    def _grow(self, capacity):
+        used = len(self.names)
+        for field, (default, dtype, shape) in self.FIELDS.items():
+            arr = np.full((capacity,) + shape, default, dtype=dtype)
+            if used:
+                arr[:used] = getattr(self, field)[:used]
+            setattr(self, field, arr)
+        self.capacity = capacity
+
+    def slot(self, name, now=None):
+        """Return the slot for `name`, allocating a fresh profile if needed."""
+        slot = self.slots.get(name)
+        if slot is not None:
+            return slot
+
+        if self.free:
+            slot = self.free.pop()
+            self.names[slot] = name
+        else:
+            slot = len(self.names)
+            if slot >= self.capacity:
+                self._grow(self.capacity * 2)
+            self.names.append(name)
+        now = time.time() if now is None else now
+        self.first_seen[slot] = now
+        self.last_update[slot] = now
+        self.dirty[slot] = True
+        self.slots[name] = slot
+        return slot
+
+    def release(self, slots):
+        """Forget the profiles in `slots`, resetting them for reuse."""
+        for field, (default, _, _) in self.FIELDS.items():
+            getattr(self, field)[slots] = default
+        for slot in slots.tolist():
+            del self.slots[self.names[slot]]
+            self.names[slot] = None
+            self.free.append(slot)
+
+    @classmethod
+    def alpha_for(cls, dt):
+        """
+        EWMA weight for a sample taken `dt` seconds after the previous one,
+        so that the decay per second matches ALPHA at REF_INTERVAL.
+        """
+        return 1 - (1 - cls.ALPHA) ** (np.asarray(dt, dtype=np.float64) / cls.REF_INTERVAL)
+
+    def push(self, slots, values, now, alpha=None):
+        """
+        EWMA update + ring append for many slots at once (slots must be unique).
+        `alpha` may be a per-slot array (see alpha_for); defaults to ALPHA.
+        """
+        alpha = self.ALPHA if alpha is None else alpha
+        old_mean = self.mean[slots]
+        diff = values - old_mean
+        var = self.var[slots]
+
+        self.mean[slots] = old_mean + alpha * diff
+        var = var + alpha * ((diff * diff) - var)
+        self.var[slots] = var
+        self.std[slots] = np.sqrt(np.maximum(var, 1e-6))
+
+        head = self.head[slots]
+        self.samples[slots, head] = values
+        self.head[slots] = (head + 1) % self.WINDOW
+        self.count[slots] = np.minimum(self.count[slots] + 1, self.WINDOW)
+        self.last_update[slots] = now
+        self.dirty[slots] = True
+
+    def recent(self, slot):
+        """Recent scores for one slot, oldest first."""
+        n = int(self.count[slot])
+        head = int(self.head[slot])
+        ring = self.samples[slot]
+        order = [(head - n + i) % self.WINDOW for i in range(n)]
+        return [float(ring[i]) for i in order]
+
+
 class ProcessProfile:
-    def __init__(self, name):
+    """A view of one process' baseline inside a ProfileArrays table."""
+    __slots__ = ("name", "_arrays", "_slot")
+
+    def __init__(self, name, arrays=None, now=None):
         self.name = name
-        self.mean = 0.05
-        self.var = 0.001
-        self.std = math.sqrt(self.var)
-        self.last_samples = deque(maxlen=5)
-        self.last_update = time.time()
-        self.first_seen = time.time() # This will be set by load()
+        self._arrays = arrays if arrays is not None else ProfileArrays(capacity=1)
+        self._slot = self._arrays.slot(name, now)
+
+    def _get(field):
+        return property(
+            lambda self: float(getattr(self._arrays, field)[self._slot]),
+            lambda self, v: getattr(self._arrays, field).__setitem__(self._slot, v),
+        )
+
+    mean = _get("mean")
+    var = _get("var")
+    std = _get("std")
+    first_seen = _get("first_seen")
+    last_update = _get("last_update")
+    del _get
 
-    def update(self, value):
-        alpha = 0.1
+    @property
+    def last_samples(self):
+        return self._arrays.recent(self._slot)
+
+    def update(self, value, alpha=None):
+        alpha = ProfileArrays.ALPHA if alpha is None else alpha
         old_mean = self.mean
+        diff = value - old_mean
 
-        self.mean = old_mean + alpha * (value - old_mean)
-        self.var = self.var + alpha * (((value - old_mean)**2) - self.var)
+        self.mean = old_mean + alpha * diff
+        self.var = self.var + alpha * ((diff * diff) - self.var)
         self.std = math.sqrt(max(self.var, 1e-6))
-        self.last_samples.append(value)
+
+        a, slot = self._arrays, self._slot
+        a.samples[slot, a.head[slot]] = value
+        a.head[slot] = (a.head[slot] + 1) % a.WINDOW
+        a.count[slot] = min(a.count[slot] + 1, a.WINDOW)
+        a.dirty[slot] = True
+        self.last_update = time.time()
 
 class AnomalyDetector:
 
@@ -70,58 +210,186 @@ class AnomalyDetector:
     MIN_RULES = 5
     MIN_OBS = 3
 
-    def __init__(self):
+    FLUSH_INTERVAL = 10 # seconds between journal flushes
+    COMPACT_EVERY = 5000 # journal records before folding into the snapshot
+
+    MAX_PROFILES = 20000 # least recently seen profiles beyond this are evicted
+    PROFILE_TTL = 30 * 24 * 3600 # evict processes not seen for 30 days
+    COLD_TTL = 180 * 24 * 3600 # and drop them from the cold tier after 180
+
+    def __init__(self, baseline_file=None, flush_interval=None, compact_every=None, rules=None, classifier=None,
+                 max_profiles=None, profile_ttl=None, cold_file=None, persist=True, defer_load=False):
+        """
+        `rules` replaces the built-in rule set (core.rules.default_rules);
+        `classifier(name)` gives the process class used to scope rules
+        added with register(). `cold_file` enables an on-disk tier that
+        keeps evicted profiles (True for the default location). With
+        `persist=False` the baseline starts empty and lives in memory only.
+        With `defer_load=True` the baseline is not read until load() is
+        called (e.g. from a background thread); `loaded` tells whether it was.
+        """
+        self.profiles = ProfileArrays()
         self.baseline = {}
-        self.load()
+        self.engine = RuleEngine(rules, classifier)
+        self.store = BaselineStore(baseline_file or paths.baseline_file()) if persist else None
+        if cold_file is True:
+            cold_file = paths.cold_baseline_file()
+        self.cold = ColdStore(cold_file) if cold_file else None
+        if flush_interval is not None:
+            self.FLUSH_INTERVAL = flush_interval
+        if compact_every is not None:
+            self.COMPACT_EVERY = compact_every
+        if max_profiles is not None:
+            self.MAX_PROFILES = max_profiles
+        if profile_ttl is not None:
+            self.PROFILE_TTL = profile_ttl
+        self.last_flush = time.monotonic()
+        self.loaded = self.store is None
+        if not self.loaded and not defer_load:
+            self.load()
+
+    def _profile(self, name, now=None, restore=True):
+        p = self.baseline.get(name)
+        if p is None:
+            p = self.baseline[name] = ProcessProfile(name, self.profiles, now)
+            if restore and self.cold is not None:
+                d = self.cold.pop(name)
+                if d is not None:
+                    self._apply(p, d, p.first_seen)
+        return p
+
+    @staticmethod
+    def _apply(p, d, current_time):
+        p.mean = d.get("mean", 0.05)
+        p.var = d.get("var", 0.001)
+        p.std = math.sqrt(p.var)
+        p.first_seen = d.get("first_seen", current_time)
+        p.last_update = d.get("last_seen", current_time)
 
     def load(self):
-        data = load_baseline()
+        data = self.store.load()
         current_time = time.time() # Get the current time
         
         for name, d in data.items():
-            p = ProcessProfile(name)
-            p.mean = d.get("mean", 0.05)
-            p.var = d.get("var", 0.001)
-            p.std = math.sqrt(p.var)
-            
-            p.first_seen = d.get("first_seen", current_time) 
-            
-            self.baseline[name] = p
-
-    def save(self):
-        data = {}
-        for name, p in self.baseline.items():
-            data[name] = {
-                "mean": p.mean, 
-                "var": p.var,
-                "first_seen": p.first_seen 
-            }
-        save_baseline(data)
-
-    def check(self, name, score):
-        if name not in self.baseline:
-            self.baseline[name] = ProcessProfile(name)
-
-        p = self.baseline[name]
-        
-        current_time = time.time()
-        if (current_time - p.first_seen) < self.NEW_PROCESS_GRACE_PERIOD:
-            p.update(score) # Update to learn, but don't check for anomalies
-            return False, 0 # Return "not suspicious"
+            self._apply(self._profile(name, current_time, restore=False), d, current_time)
+
+        self.profiles.dirty[:] = False
+        # A baseline written before the cap (or idle for a long time) is
+        # trimmed once here, so the next load only reads what is kept
+        if self.evict(current_time):
+            self.compact()
+        self.loaded = True
+
+    def _records(self, slots):
+        a = self.profiles
+        mean, var, first_seen = a.mean[slots].tolist(), a.var[slots].tolist(), a.first_seen[slots].tolist()
+        last_seen = a.last_update[slots].tolist()
+        return {
+            a.names[slot]: {"mean": m, "var": v, "first_seen": f, "last_seen": l}
+            for slot, m, v, f, l in zip(slots.tolist(), mean, var, first_seen, last_seen)
+        }
+
+    def evict(self, now=None):
+        """
+        Drop profiles not seen for PROFILE_TTL, then the least recently
+        seen ones beyond MAX_PROFILES. Evicted profiles go to the cold
+        tier (if any) and are tombstoned in the journal. Returns how many.
+        """
+        a = self.profiles
+        if not len(a):
+            return 0
+        now = time.time() if now is None else now
+        live = a.live()
+        recent = a.last_update[live] >= now - self.PROFILE_TTL
+        evicted = live[~recent]
+
+        kept = live[recent]
+        excess = len(kept) - self.MAX_PROFILES
+        if excess > 0:
+            oldest = np.argpartition(a.last_update[kept], excess - 1)[:excess]
+            evicted = np.concatenate([evicted, kept[oldest]])
+        if not len(evicted):
+            return 0
+
+        records = self._records(evicted)
+        if self.cold is not None:
+            self.cold.put(records)
+        if self.store is not None:
+            self.store.append({name: {"deleted": True} for name in records})
+        for name in records:
+            del self.baseline[name]
+        a.release(evicted)
+        self.engine.forget(records, evicted)
+        return len(evicted)
 
+    def save(self, force=False):
+        """
+        Journal the profiles changed since the last flush. Debounced to one
+        flush per FLUSH_INTERVAL unless `force` is set; compacts the journal
+        into the snapshot once it holds COMPACT_EVERY records. Does nothing
+        before the baseline is loaded (defer_load), so a half-built state
+        never reaches the files.
+        """
+        if self.store is None or not self.loaded:
+            return
+        now = time.monotonic()
+        if not force and (now - self.last_flush) < self.FLUSH_INTERVAL:
+            return
+        self.last_flush = now
 
-        # Continue with existing logic only if grace period is over
-        p.update(score)
+        self.evict()
 
-        if len(p.last_samples) < self.MIN_OBS:
-            return False, 0
+        a = self.profiles
+        dirty = np.flatnonzero(a.dirty[:a.used])
+        if len(dirty):
+            self.store.append(self._records(dirty))
+            a.dirty[dirty] = False
+
+        if self.store.journal_records >= self.COMPACT_EVERY:
+            self.compact()
+
+    def compact(self):
+        if self.store is None:
+            return
+        a = self.profiles
+        self.store.compact(self._records(a.live()))
+        a.dirty[:a.used] = False
+        if self.cold is not None:
+            self.cold.prune(time.time() - self.COLD_TTL)
+
+    def register(self, rule, classes=None):
+        """Add an extra rule (see core.rules), optionally only for some process classes."""
+        return self.engine.register(rule, classes)
+
+    def rule_stats(self):
+        return self.engine.rule_stats()
+
+    def check(self, name, score, dt=None, now=None):
+        """`dt`: seconds since this process was last sampled, for variable-rate sampling."""
+        suspicious, rules = self.check_batch([name], [score], None if dt is None else [dt], now)
+        return bool(suspicious[0]), int(rules[0])
+
+    def check_batch(self, names, scores, dt=None, now=None):
+        """
+        Check one tick. `names` must be unique (as from get_app_processes).
+        Returns (suspicious bool array, rules int array). `dt` is an
+        optional per-name array of seconds since each was last sampled;
+        `now` replaces the wall clock (simulated time when replaying).
+        """
+        a = self.profiles
+        current_time = time.time() if now is None else now
+        slots = np.fromiter(
+            (self._profile(n, current_time)._slot for n in names),
+            dtype=np.int64, count=len(names)
+        )
+        scores = np.asarray(scores, dtype=np.float64)
 
-        rules = 0
+        # New processes are updated to learn, but not checked for anomalies
+        learning = (current_time - a.first_seen[slots]) < self.NEW_PROCESS_GRACE_PERIOD
+        a.push(slots, scores, current_time, None if dt is None else a.alpha_for(dt))
 
-        if score > p.mean + self.THRESH_STD * p.std: rules += 1
-        if score > p.mean * self.THRESH_DRIFT: rules += 1
-        if sum(v > p.mean * 1.8 for v in p.last_samples) >= 3: rules += 1
-        if len(p.last_samples) >= 5 and score > p.last_samples[-5] * 1.6: rules += 1
-        if sum(v > p.mean * 1.4 for v in p.last_samples) >= 4: rules += 1
+        rules = self.engine.evaluate(RuleContext(self, names, slots, scores, current_time))
 
-        return (rules >= self.MIN_RULES), rules
\ No newline at end of file
+        active = ~learning & (a.count[slots] >= self.MIN_OBS)
+        rules = np.where(active, rules, 0)
+        return active & (rules >= self.MIN_RULES), rules
@@ -0,0 +1,64 @@
+from typing import NamedTuple
+
+import psutil
+
+
+class KillResult(NamedTuple):
+    name: str
+    found: int    # instances resolved from the scanner index
+    killed: int   # exited after terminate() or kill()
+    failed: int   # still running, or access denied
+    reused: int   # pid now belongs to a different process; left alone
+
+
+def _verified(keys):
+    """psutil.Process for each (pid, create_time) that is still the same process."""
+    procs, reused = [], 0
+    for pid, create_time in keys:
+        try:
+            proc = psutil.Process(pid)
+            if proc.create_time() != create_time:
+                reused += 1
+                continue
+            procs.append(proc)
+        except psutil.Error:
+            continue
+    return procs, reused
+
+
+def kill_keys(name, keys, timeout=3.0):
+    """
+    Terminate every (pid, create_time) in `keys` at once, wait up to
+    `timeout` for all of them together, then kill() whatever is left.
+    """
+    procs, reused = _verified(keys)
+
+    denied = 0
+    for proc in procs:
+        try:
+            proc.terminate()
+        except psutil.NoSuchProcess:
+            pass
+        except psutil.AccessDenied:
+            denied += 1
+
+    gone, alive = psutil.wait_procs(procs, timeout=timeout)
+    for proc in alive:
+        try:
+            proc.kill()
+        except psutil.Error:
+            pass
+    if alive:
+        more_gone, alive = psutil.wait_procs(alive, timeout=1)
+        gone += more_gone
+
+    return KillResult(name, len(keys), len(gone), max(len(alive), denied), reused)
+
+
+def kill_by_name(scanner, name, tree=False, timeout=3.0):
+    """Kill all instances of `name` known to the scanner, optionally with their descendants."""
+    keys = list(scanner.lookup(name))
+    if tree:
+        # Children first, so they are not re-parented before we reach them
+        keys = scanner.descendants(keys)[::-1] + keys
+    return kill_keys(name, keys, timeout)
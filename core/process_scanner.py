@@ -1,16 +1,159 @@
-import psutil
+import itertools, queue, threading, time
 from collections import defaultdict
-import time
+
+from core.delta import DeltaTracker
+from core.sources import SourceError, ProcessGone, AccessDenied
+
+
+class _Handle:
+    """Cached per-process state, valid for one (pid, create_time) lifetime."""
+    __slots__ = ("ref", "key", "name", "ppid", "skip", "last_cpu", "last_io", "last_time", "last", "busy")
+
+    def __init__(self, ref, key, name, ppid, skip, cpu_time, now):
+        self.ref = ref            # source-specific handle
+        self.key = key            # (pid, create_time)
+        self.name = name
+        self.ppid = ppid
+        self.skip = skip          # system / idle process, never sampled
+        # Counters of the last accepted sample (rates are deltas against these)
+        self.last_cpu = cpu_time  # CPU seconds
+        self.last_io = None       # read_bytes + write_bytes
+        self.last_time = now
+        self.last = None          # (cpu, mem, disk) from the last sample
+        self.busy = False         # a worker is reading it (possibly stuck from an earlier tick)
+
+
+class _ReadPool:
+    """
+    Daemon worker threads. Not ThreadPoolExecutor: its workers are joined
+    at interpreter exit, so one read stuck in the kernel would hang
+    shutdown.
+
+    A worker still inside a job when run() hits its deadline is written
+    off: a replacement is started, and the stuck thread exits whenever
+    its read returns. At most MAX_STUCK are written off at once; past
+    that, run() queues nothing while earlier jobs are still waiting for a
+    worker, so the queue cannot grow tick after tick.
+    """
+    MAX_STUCK = 16
+
+    def __init__(self, workers):
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._threads = set()
+        self._busy = set()   # threads inside a job
+        self._stuck = set()  # busy past a deadline and already replaced
+        self._queued = 0     # jobs not yet picked up by a worker
+        for _ in range(workers):
+            self._spawn()
+
+    def _spawn(self):
+        t = threading.Thread(target=self._work, name=f"sepro-scan-{next(self._ids)}", daemon=True)
+        self._threads.add(t)
+        t.start()
+
+    def _work(self):
+        me = threading.current_thread()
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            fn, args, done = job
+            with self._lock:
+                self._queued -= 1
+                self._busy.add(me)
+            try:
+                fn(*args)
+            finally:
+                with self._lock:
+                    self._busy.discard(me)
+                    retired = me in self._stuck
+                    if retired:
+                        self._stuck.discard(me)
+                        self._threads.discard(me)
+                done.release()
+            if retired:
+                return
+
+    def run(self, fn, jobs, deadline):
+        """
+        Run fn(*args) for each args in `jobs`; returns at `deadline` even if
+        some are still running. False if not all finished (or, with jobs of
+        an earlier call still waiting for a worker, none were queued).
+        """
+        with self._lock:
+            if self._queued:
+                return False
+            self._queued += len(jobs)
+        done = threading.Semaphore(0)
+        for args in jobs:
+            self._queue.put((fn, args, done))
+        for _ in jobs:
+            timeout = None if deadline == float("inf") else max(deadline - time.monotonic(), 0.0)
+            if not done.acquire(timeout=timeout):
+                self._replace_stuck()
+                return False
+        return True
+
+    def _replace_stuck(self):
+        with self._lock:
+            for t in list(self._busy - self._stuck):
+                if len(self._stuck) >= self.MAX_STUCK:
+                    break
+                self._stuck.add(t)
+                self._spawn()
+
+    @property
+    def stuck(self):
+        return len(self._stuck)
+
+    def close(self):
+        with self._lock:
+            n = len(self._threads - self._stuck)
+        for _ in range(n):
+            self._queue.put(None)
+
+
 # class ProcessScanner:
 class ProcessScanner:
-    def __init__(self):
-        # Warm-up CPU counters for all processes
-        for p in psutil.process_iter():
-            try:
-                p.cpu_percent(None)
-            except:
-                pass
-        # time.sleep(0.2)
+    # Per-process reads are split into WORKERS * SHARDS_PER_WORKER shards on
+    # a thread pool, so one slow process only holds up its own shard
+    WORKERS = 4
+    SHARDS_PER_WORKER = 4
+
+    # With due(), processes that are not due still get a CPU-counter-only read
+    # every pass; one whose CPU % since its last full sample is this many
+    # points above what that sample showed is read in full at once (and
+    # listed in `promoted`), so a spike in an idle process is not missed
+    PROMOTE_CPU = 10.0
+
+    # get_app_delta() reports a row as changed once a value moves by more than this
+    DELTA_EPSILON = {"cpu": 0.5, "mem": 1.0, "disk": 0.05}
+
+    def __init__(self, source=None, workers=None, epsilon=None, keyframe_every=None):
+        if source is None:
+            from core.sources import default_source
+            source = default_source()
+        if workers is not None:
+            self.WORKERS = workers
+        self.source = source
+        # "fresh" only says whether this tick read the row, not whether it changed
+        self.deltas = DeltaTracker(
+            self.DELTA_EPSILON if epsilon is None else epsilon, ignore=("fresh",), keyframe_every=keyframe_every
+        )
+        self.rows = []      # get_app_delta(): the full aggregated rows of the same tick
+        self.promoted = set() # names read ahead of due() in the last pass, see PROMOTE_CPU
+        self._pool = None   # _ReadPool, started on first use
+        self._cpu_lock = threading.Lock()
+        self._read_cpu = 0.0  # worker-thread CPU seconds not yet collected by take_read_cpu()
+        self._handles = {}  # pid -> _Handle
+        # Rebuilt every sample() and swapped in whole, so readers on other
+        # threads always see one consistent tick
+        self.index = {}     # name -> ((pid, create_time), ...) of live app processes
+        self.children = {}  # pid -> (child (pid, create_time), ...)
+        # Cumulative read failures, by kind ("timeout": no answer before the tick deadline)
+        self.errors = {"no_such_process": 0, "access_denied": 0, "timeout": 0, "other": 0}
 
     SYSTEM_PREFIX = [
         r"C:\Windows",
@@ -26,56 +169,276 @@ class ProcessScanner:
         "warp-svc.exe", "widgets.exe", "widgetservice.exe", "amdrsserv.exe", "mcp-server.exe"
     }
 
-    def is_system_process(self, proc):
-        try:
-            name = proc.info.get("name", "").lower()
-            exe = (proc.info.get("exe") or "").lower()
+    # Ignore idle/system/unknown named processes
+    IGNORED_NAMES = {"system idle process", "system", "idle", "unknown"}
+
+    _SYSTEM_PREFIX_LOWER = tuple(p.lower() for p in SYSTEM_PREFIX)
+
+    def classify(self, name, exe):
+        """True if a process with this name/exe is a system process."""
+        name = (name or "").lower()
+        exe = (exe or "").lower()
 
-            if name in self.SYSTEM_NAMES:
-                return True
-            if any(exe.startswith(p.lower()) for p in self.SYSTEM_PREFIX if exe):
-                return True
+        if name in self.SYSTEM_NAMES:
+            return True
+        if exe and exe.startswith(self._SYSTEM_PREFIX_LOWER):
+            return True
+        return False
 
+    def is_system_process(self, proc):
+        try:
+            return self.classify(proc.info.get("name", ""), proc.info.get("exe"))
         except Exception:
             return True
 
-        return False
+    def _open(self, pid):
+        """Build a handle for a pid we haven't seen, fetching static attributes once."""
+        ref, info = self.source.open(pid)
+        name = info.name or "Unknown"
+        skip = info.system or self.classify(name, info.exe) or name.lower() in self.IGNORED_NAMES
+        return _Handle(ref, (pid, info.create_time), name, info.ppid, skip, info.cpu_time, self.source.now())
 
-    def get_app_processes(self):
-        """Return unique app processes with aggregated stats"""
-        app_data = defaultdict(lambda: {"cpu": 0, "mem": 0, "disk": 0, "pids": []})
+    def _count_error(self, e):
+        kind = "no_such_process" if isinstance(e, ProcessGone) else "access_denied" if isinstance(e, AccessDenied) else "other"
+        self.errors[kind] += 1
+
+    def _drop(self, pid):
+        h = self._handles.pop(pid, None)
+        if h is not None:
+            self.source.close(h.ref)
 
-        for proc in psutil.process_iter(["pid","name","exe","cpu_percent","memory_info","io_counters"]):
+    def warm_up(self):
+        """
+        Open every process now, which primes the CPU counters, so that a
+        sample taken shortly after has real CPU % instead of zeros. Slow
+        with many processes; the collector runs it on its own thread.
+        """
+        self._refresh_handles()
+
+    def _refresh_handles(self):
+        """Sync the handle cache with the live pid list; returns the handles."""
+        live = set(self.source.pids())
+        handles = self._handles
+
+        for pid in [pid for pid in handles if pid not in live]:
+            self._drop(pid)
+
+        for pid in live:
+            if pid in handles:
+                continue
             try:
-                if self.is_system_process(proc):
-                    continue
-
-                name = proc.info.get("name") or "Unknown"
-                # ✅ Ignore idle/system/unknown named processes
-                if name.lower() in ["system idle process", "system", "idle", "unknown"]:
-                    continue
-                cpu = proc.info.get("cpu_percent", 0.0) or 0.0
-                mem = proc.info.get("memory_info").rss / (1024 * 1024) if proc.info.get("memory_info") else 0
-
-                io = proc.info.get("io_counters")
-                disk = ((io.read_bytes + io.write_bytes) / (1024 * 1024)) if io else 0
-
-                # aggregate by process name (sum)
-                app_data[name]["cpu"] += cpu
-                app_data[name]["mem"] += mem
-                app_data[name]["disk"] += disk
-                app_data[name]["pids"].append(proc.pid)
-
-            except:
+                handles[pid] = self._open(pid)
+            except SourceError as e:
+                self._count_error(e)
                 continue
 
+        return handles
+
+    def _read_shard(self, shard, out, deadline, pooled=False, read=None):
+        """
+        Read each handle with `read` (source.sample by default) until
+        `deadline`, appending (handle, result or error) to `out`. On a pool
+        worker (`pooled`), the thread's CPU time is added to what
+        take_read_cpu() returns.
+        """
+        started = time.thread_time() if pooled else None
+        sample = read or self.source.sample
+        try:
+            for h in shard:
+                if time.monotonic() >= deadline:
+                    return
+                h.busy = True
+                try:
+                    out.append((h, sample(h.ref)))
+                except Exception as e:
+                    out.append((h, e))
+                finally:
+                    h.busy = False
+        finally:
+            if pooled:
+                with self._cpu_lock:
+                    self._read_cpu += time.thread_time() - started
+
+    def take_read_cpu(self):
+        """
+        CPU seconds the read workers used since the last call. Reads on the
+        calling thread (WORKERS=1) are not included; they show up in its
+        own thread_time().
+        """
+        with self._cpu_lock:
+            spent, self._read_cpu = self._read_cpu, 0.0
+        return spent
+
+    def _read(self, todo, deadline, read=None):
+        """{handle: result or error} for the handles that answered before `deadline`."""
+        if self.WORKERS <= 1 or len(todo) < 2:
+            out = []
+            self._read_shard(todo, out, deadline, False, read)
+            return dict(out)
+        if self._pool is None:
+            self._pool = _ReadPool(self.WORKERS)
+        n = min(len(todo), self.WORKERS * self.SHARDS_PER_WORKER)
+        outs = [[] for _ in range(n)]
+        self._pool.run(self._read_shard, [(todo[i::n], outs[i], deadline, True, read) for i in range(n)], deadline)
+        # Shards still running keep appending to their old lists; whatever
+        # lands after this point is dropped
+        return {h: s for out in outs for h, s in list(out)}
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def sample(self, due=None, timeout=None):
+        """
+        Read the dynamic counters of every app process.
+        Returns a list of (name, pid, cpu %, mem MB, disk MB/s, fresh, stale).
+
+        `due(name)` may restrict which processes are actually read this
+        time; the others repeat their last values with fresh=False, unless
+        a CPU-only read shows them PROMOTE_CPU above their last sample, in
+        which case all instances of the name are read now (see `promoted`).
+
+        With a `timeout` (seconds), the pass returns once it is up:
+        processes that have not answered by then (or are still stuck in a
+        read from an earlier tick) repeat their last values with
+        fresh=False, stale=True, and count as "timeout" errors.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else float("inf")
+        handles = self._refresh_handles()
+        source = self.source
+        now = source.now()
+        samples = []
+        index = {}
+        children = {}
+
+        todo = []
+        waiting = []
+        for pid, h in list(handles.items()):
+            children.setdefault(h.ppid, []).append(h.key)
+            if h.skip:
+                continue
+            if due is not None and h.last is not None and not due(h.name):
+                waiting.append(h)
+                continue
+            todo.append(h)
+
+        promoted = set()
+        if waiting:
+            cpu_times = self._read([h for h in waiting if not h.busy], deadline, source.cpu_time)
+            for h in waiting:
+                t = cpu_times.get(h)
+                if t is None or isinstance(t, Exception):
+                    continue # no answer: wait for the next due sample
+                dt = now - h.last_time
+                if t < h.last_cpu or (dt > 0 and (t - h.last_cpu) / dt * 100 > h.last[0] + self.PROMOTE_CPU):
+                    promoted.add(h.name)
+            for h in waiting:
+                if h.name in promoted:
+                    todo.append(h)
+                else:
+                    samples.append((h.name, h.key[0]) + h.last + (False, False))
+                    index.setdefault(h.name, []).append(h.key)
+        self.promoted = promoted
+
+        # Anything still busy from an earlier tick is not queued again
+        results = self._read([h for h in todo if not h.busy], deadline)
+
+        for h in todo:
+            pid = h.key[0]
+            s = results.get(h)
+            if s is None:
+                self.errors["timeout"] += 1
+                if h.last is not None:
+                    samples.append((h.name, pid) + h.last + (False, True))
+                    index.setdefault(h.name, []).append(h.key)
+                continue
+            if isinstance(s, ProcessGone):
+                self._count_error(s)
+                self._drop(pid)
+                continue
+            if isinstance(s, SourceError):
+                self._count_error(s)
+                continue
+            if isinstance(s, Exception):
+                raise s
+
+            # CPU % and disk MB/s from the counter deltas since this pid's
+            # previous accepted sample (reads that timed out never get here)
+            if (s.io_bytes is not None and h.last_io is not None and s.io_bytes < h.last_io) or s.cpu_time < h.last_cpu:
+                # Counters went backwards: the pid was recycled by a new
+                # process, so drop the handle and reopen it next tick
+                self._drop(pid)
+                continue
+            dt = now - h.last_time
+            cpu = disk = 0.0
+            if dt > 0:
+                cpu = (s.cpu_time - h.last_cpu) / dt * 100
+                if s.io_bytes is not None and h.last_io is not None:
+                    disk = (s.io_bytes - h.last_io) / (1024 * 1024) / dt
+            h.last_cpu, h.last_io, h.last_time = s.cpu_time, s.io_bytes, now
+
+            h.last = (cpu, s.rss / (1024 * 1024), disk)
+            samples.append((h.name, pid) + h.last + (True, False))
+            index.setdefault(h.name, []).append(h.key)
+
+        self.index = {name: tuple(keys) for name, keys in index.items()}
+        self.children = {pid: tuple(keys) for pid, keys in children.items()}
+        return samples
+
+    def lookup(self, name):
+        """(pid, create_time) of every live instance of `name` as of the last scan."""
+        return self.index.get(name, ())
+
+    def descendants(self, keys):
+        """All processes below `keys` in the process tree (last scan), depth first."""
+        children = self.children
+        found, stack, seen = [], [pid for pid, _ in keys], set()
+        while stack:
+            for key in children.get(stack.pop(), ()):
+                if key[0] not in seen:
+                    seen.add(key[0])
+                    found.append(key)
+                    stack.append(key[0])
+        return found
+
+    def aggregate(self, samples):
+        """Sum per-pid samples into one row per process name."""
+        app_data = defaultdict(lambda: {"cpu": 0, "mem": 0, "disk": 0, "pids": [], "fresh": False, "stale": False})
+
+        for name, pid, cpu, mem, disk, fresh, stale in samples:
+            # aggregate by process name (sum)
+            data = app_data[name]
+            data["cpu"] += cpu
+            data["mem"] += mem
+            data["disk"] += disk
+            data["pids"].append(pid)
+            data["fresh"] |= fresh
+            data["stale"] |= stale
+
         return [
             {
                 "name": name,
                 "cpu": round(data["cpu"],2),
                 "mem": round(data["mem"],2),
                 "disk": round(data["disk"],2),
-                "pids": data["pids"]
+                "pids": data["pids"],
+                "fresh": data["fresh"] and not data["stale"],
+                "stale": data["stale"]
             }
             for name, data in app_data.items()
         ]
+
+    def get_app_processes(self, due=None, timeout=None):
+        """Return unique app processes with aggregated stats"""
+        return self.aggregate(self.sample(due, timeout))
+
+    def get_app_delta(self, due=None, timeout=None):
+        """
+        get_app_processes() as a core.delta.Delta against the previous
+        call: apps that appeared, changed beyond DELTA_EPSILON or went
+        away, with a keyframe every deltas.KEYFRAME_EVERY calls. The full
+        list is left in `rows` for consumers that need every row.
+        """
+        self.rows = self.get_app_processes(due, timeout)
+        return self.deltas.update({p["name"]: p for p in self.rows})
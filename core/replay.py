@@ -0,0 +1,333 @@
+"""
+Record and replay process traces.
+
+A trace holds every freshly sampled row of every tick (name, cpu, mem,
+disk, optionally a ground-truth anomaly label) in compressed columnar
+chunks. Replaying feeds it through PowerModel and AnomalyDetector as
+fast as the CPU allows, on the trace's own clock, so grace periods and
+the EWMA behave as they did live. A sweep replays one trace under many
+threshold settings in parallel:
+
+    python -m core --record live.trace                          # record while monitoring
+    python -m core.replay record synth.trace --processes 500 --ticks 3000
+    python -m core.replay run synth.trace --thresh-std 2.5
+    python -m core.replay sweep synth.trace --thresh-std 1.5,2,2.5 --thresh-drift 1.4,1.6 --min-rules 3,4,5
+"""
+import argparse, itertools, json, multiprocessing, os, struct, time, zlib
+from typing import NamedTuple
+import numpy as np
+
+MAGIC = b"SEPROTR1"
+_LEN = struct.Struct("<I")
+
+# Columns, in file order: (name, dtype, per tick or per row)
+COLUMNS = (
+    ("ts", "<f8", "tick"),
+    ("count", "<i4", "tick"),
+    ("name", "<i4", "row"),
+    ("cpu", "<f4", "row"),
+    ("mem", "<f4", "row"),
+    ("disk", "<f4", "row"),
+    ("label", "u1", "row"),
+)
+
+
+def _shuffle(arr):
+    """Group the bytes of each value by significance; zlib does much better on that."""
+    size = arr.dtype.itemsize
+    return arr.view(np.uint8).reshape(-1, size).T.tobytes() if size > 1 else arr.tobytes()
+
+
+def _unshuffle(buf, dtype, n):
+    dtype = np.dtype(dtype)
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    if dtype.itemsize > 1:
+        raw = raw.reshape(dtype.itemsize, n).T.copy()
+    return raw.view(dtype).reshape(n)
+
+
+class TraceWriter:
+    CHUNK_TICKS = 300
+
+    def __init__(self, path, meta=None, chunk_ticks=None):
+        if chunk_ticks is not None:
+            self.CHUNK_TICKS = chunk_ticks
+        self.path = path
+        self._f = open(path, "wb")
+        header = json.dumps(dict(meta or {}, created=time.time())).encode()
+        self._f.write(MAGIC + _LEN.pack(len(header)) + header)
+        self._ids = {}      # name -> id
+        self._new = []      # names first seen in the current chunk
+        self._ticks = []    # (ts, count)
+        self._rows = {c: [] for c, _, kind in COLUMNS if kind == "row"}
+        self.ticks = 0
+
+    def write(self, ts, names, cpu, mem, disk, labels=None):
+        ids = self._ids
+        name_ids = []
+        for n in names:
+            i = ids.get(n)
+            if i is None:
+                i = ids[n] = len(ids)
+                self._new.append(n)
+            name_ids.append(i)
+        count = len(name_ids)
+        rows = self._rows
+        rows["name"].append(np.asarray(name_ids, dtype=np.int32))
+        rows["cpu"].append(np.asarray(cpu, dtype=np.float32))
+        rows["mem"].append(np.asarray(mem, dtype=np.float32))
+        rows["disk"].append(np.asarray(disk, dtype=np.float32))
+        rows["label"].append(np.zeros(count, dtype=np.uint8) if labels is None else np.asarray(labels, dtype=np.uint8))
+        self._ticks.append((ts, count))
+        self.ticks += 1
+        if len(self._ticks) >= self.CHUNK_TICKS:
+            self.flush()
+
+    def flush(self):
+        if not self._ticks:
+            return
+        ts, count = zip(*self._ticks)
+        cols = {"ts": np.array(ts, dtype="<f8"), "count": np.array(count, dtype="<i4")}
+        for c, parts in self._rows.items():
+            cols[c] = np.concatenate(parts) if parts else np.zeros(0)
+        header = json.dumps({"ticks": len(ts), "rows": int(sum(count)), "names": self._new}).encode()
+        body = b"".join(_shuffle(cols[c].astype(dtype, copy=False)) for c, dtype, _ in COLUMNS)
+        data = zlib.compress(_LEN.pack(len(header)) + header + body, 6)
+        self._f.write(_LEN.pack(len(data)) + data)
+        self._f.flush()
+        self._new = []
+        self._ticks = []
+        self._rows = {c: [] for c in self._rows}
+
+    def close(self):
+        if self._f.closed:
+            return
+        self.flush()
+        self._f.close()
+
+
+class Tick(NamedTuple):
+    ts: float
+    names: list
+    cpu: np.ndarray
+    mem: np.ndarray
+    disk: np.ndarray
+    labels: np.ndarray
+
+
+class TraceReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a SEPRO trace")
+            (n,) = _LEN.unpack(f.read(_LEN.size))
+            self.meta = json.loads(f.read(n))
+            self._offset = f.tell()
+
+    def chunks(self):
+        """(header, columns) per chunk; a torn last chunk (crash while recording) is ignored."""
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            while True:
+                raw = f.read(_LEN.size)
+                if len(raw) < _LEN.size:
+                    return
+                (n,) = _LEN.unpack(raw)
+                data = f.read(n)
+                try:
+                    data = zlib.decompress(data)
+                except zlib.error:
+                    return
+                (hn,) = _LEN.unpack_from(data)
+                header = json.loads(data[_LEN.size:_LEN.size + hn])
+                pos = _LEN.size + hn
+                cols = {}
+                for c, dtype, kind in COLUMNS:
+                    count = header["ticks"] if kind == "tick" else header["rows"]
+                    size = np.dtype(dtype).itemsize * count
+                    cols[c] = _unshuffle(data[pos:pos + size], dtype, count)
+                    pos += size
+                yield header, cols
+
+    def ticks(self):
+        names = []
+        for header, cols in self.chunks():
+            names.extend(header["names"])
+            start = 0
+            for ts, count in zip(cols["ts"].tolist(), cols["count"].tolist()):
+                end = start + count
+                yield Tick(
+                    ts, [names[i] for i in cols["name"][start:end].tolist()],
+                    cols["cpu"][start:end], cols["mem"][start:end], cols["disk"][start:end],
+                    cols["label"][start:end],
+                )
+                start = end
+
+
+def record_synthetic(path, processes=500, ticks=3000, churn=0.01, anomaly_rate=0.001, seed=0):
+    """Write a labelled trace from SyntheticSource (label = process spiking that tick)."""
+    from core.process_scanner import ProcessScanner
+    from core.sources import SyntheticSource
+
+    source = SyntheticSource(processes=processes, churn=churn, anomaly_rate=anomaly_rate, seed=seed)
+    scanner = ProcessScanner(source)
+    writer = TraceWriter(path, {"source": "synthetic", "interval": source.interval, "adaptive": False,
+                                "processes": processes, "anomaly_rate": anomaly_rate, "seed": seed})
+    for _ in range(ticks):
+        rows = scanner.get_app_processes()
+        anomalous = source.anomalous
+        writer.write(
+            source.now(), [r["name"] for r in rows],
+            [r["cpu"] for r in rows], [r["mem"] for r in rows], [r["disk"] for r in rows],
+            [r["name"] in anomalous for r in rows],
+        )
+    writer.close()
+    return writer.ticks
+
+
+class ReplayResult(NamedTuple):
+    config: dict
+    ticks: int
+    rows: int
+    flagged: int
+    true_positives: int
+    positives: int     # labelled anomalous rows in the trace
+    seconds: float
+
+    @property
+    def precision(self):
+        return self.true_positives / self.flagged if self.flagged else None
+
+    @property
+    def recall(self):
+        return self.true_positives / self.positives if self.positives else None
+
+
+def replay(path, config=None):
+    """
+    Run a trace through a fresh in-memory AnomalyDetector. `config` sets
+    detector attributes (THRESH_STD, THRESH_DRIFT, MIN_RULES, ...).
+    """
+    import core.power_model as pm
+    from core.collector import Collector
+
+    config = dict(config or {})
+    reader = TraceReader(path)
+    detector = pm.AnomalyDetector(persist=False)
+    for attr, value in config.items():
+        if not hasattr(pm.AnomalyDetector, attr):
+            raise ValueError(f"Unknown detector setting {attr!r}")
+        setattr(detector, attr, value)
+
+    # The adaptive sampler feeds elapsed time per name; fixed-rate ticks use the default EWMA weight
+    adaptive = reader.meta.get("adaptive", False)
+    last_seen = {}
+    ref = pm.ProfileArrays.REF_INTERVAL
+
+    started = time.perf_counter()
+    start_ts = None
+    ticks = rows = flagged = tp = positives = 0
+    for t in reader.ticks():
+        if start_ts is None:
+            start_ts = t.ts
+        scores = pm.PowerModel.compute_score_batch(t.cpu, t.mem, t.disk)
+        dt = None
+        if adaptive:
+            dt = np.fromiter((t.ts - last_seen[n] if n in last_seen else ref for n in t.names),
+                             dtype=np.float64, count=len(t.names))
+            last_seen.update(zip(t.names, itertools.repeat(t.ts)))
+        suspicious, _ = detector.check_batch(t.names, scores, dt, now=t.ts)
+        if t.ts - start_ts < Collector.APP_START_GRACE_PERIOD:
+            suspicious[:] = False
+
+        labels = t.labels.astype(bool)
+        ticks += 1
+        rows += len(t.names)
+        flagged += int(suspicious.sum())
+        tp += int((suspicious & labels).sum())
+        positives += int(labels.sum())
+
+    return ReplayResult(config, ticks, rows, flagged, tp, positives, time.perf_counter() - started)
+
+
+def _replay_one(args):
+    return replay(*args)
+
+
+def sweep(path, grid, jobs=None):
+    """
+    Replay `path` once per combination of `grid` ({attr: [values]}) on
+    `jobs` worker processes; results in grid order.
+    """
+    keys = list(grid)
+    configs = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    jobs = min(jobs or os.cpu_count() or 1, len(configs))
+    if jobs <= 1:
+        return [replay(path, c) for c in configs]
+    with multiprocessing.Pool(jobs) as pool:
+        return pool.map(_replay_one, [(path, c) for c in configs])
+
+
+def _floats(text):
+    return [float(v) for v in text.split(",")]
+
+
+def _ints(text):
+    return [int(v) for v in text.split(",")]
+
+
+def _fmt(v):
+    return "-" if v is None else f"{v:.3f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.replay", description="Record / replay detector traces")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    p = sub.add_parser("record", help="write a labelled synthetic trace")
+    p.add_argument("trace")
+    p.add_argument("--processes", type=int, default=500)
+    p.add_argument("--ticks", type=int, default=3000)
+    p.add_argument("--churn", type=float, default=0.01)
+    p.add_argument("--anomaly-rate", type=float, default=0.001)
+    p.add_argument("--seed", type=int, default=0)
+
+    for mode, help_text in (("run", "replay once"), ("sweep", "replay every threshold combination in parallel")):
+        p = sub.add_parser(mode, help=help_text)
+        p.add_argument("trace")
+        p.add_argument("--thresh-std", type=_floats, default=[pm_default("THRESH_STD")])
+        p.add_argument("--thresh-drift", type=_floats, default=[pm_default("THRESH_DRIFT")])
+        p.add_argument("--min-rules", type=_ints, default=[pm_default("MIN_RULES")])
+        if mode == "sweep":
+            p.add_argument("--jobs", type=int, default=None, help="worker processes (default: all cores)")
+
+    args = parser.parse_args(argv)
+    if args.mode == "record":
+        started = time.perf_counter()
+        n = record_synthetic(args.trace, args.processes, args.ticks, args.churn, args.anomaly_rate, args.seed)
+        print(f"Wrote {n} ticks to {args.trace} ({os.path.getsize(args.trace) / 1024:.0f} KB) in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    grid = {"THRESH_STD": args.thresh_std, "THRESH_DRIFT": args.thresh_drift, "MIN_RULES": args.min_rules}
+    started = time.perf_counter()
+    results = sweep(args.trace, grid, getattr(args, "jobs", 1) if args.mode == "sweep" else 1)
+    wall = time.perf_counter() - started
+
+    print(f"{'std':>5} {'drift':>6} {'rules':>5} {'flagged':>8} {'true+':>7} {'precision':>9} {'recall':>7} {'rows/s':>10}")
+    for r in sorted(results, key=lambda r: (r.precision or 0, r.recall or 0), reverse=True):
+        c = r.config
+        print(f"{c['THRESH_STD']:>5g} {c['THRESH_DRIFT']:>6g} {c['MIN_RULES']:>5} {r.flagged:>8} {r.true_positives:>7}"
+              f" {_fmt(r.precision):>9} {_fmt(r.recall):>7} {r.rows / r.seconds:>10,.0f}")
+    if results:
+        print(f"{len(results)} configuration(s), {results[0].ticks} ticks each, {results[0].positives} labelled rows, {wall:.1f}s")
+    return 0
+
+
+def pm_default(attr):
+    import core.power_model as pm
+    return getattr(pm.AnomalyDetector, attr)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
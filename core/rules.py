@@ -0,0 +1,339 @@
+"""
+Anomaly rules for AnomalyDetector.
+
+Every rule looks at a whole tick at once through a RuleContext (arrays
+aligned with the processes being checked) and returns a bool array of
+the rows it fires on. The detector adds up the rules that fired per
+process and flags it once MIN_RULES agree.
+
+The five built-in rules only read the profile state ProfileArrays keeps
+up to date on every push (EWMA mean/variance and the WINDOW-sample
+ring). Extra detectors keep their own per-slot state, updated in O(1)
+per sample, and can be limited to some process classes:
+
+    detector.register(CusumRule(), classes=("app",))
+    detector.rule_stats()
+"""
+import math, time
+import numpy as np
+
+
+class RuleContext:
+    """Inputs shared by every rule for one tick; arrays are aligned with `names`."""
+
+    def __init__(self, detector, names, slots, scores, now):
+        a = detector.profiles
+        self.detector = detector
+        self.names = names
+        self.slots = slots
+        self.scores = scores
+        self.now = now
+        self.mean = a.mean[slots]
+        self.std = a.std[slots]
+        self.count = a.count[slots]
+        self.ring = a.samples[slots]
+        self._head = a.head[slots]
+        self._cache = {}
+
+    def _cached(self, key, fn):
+        v = self._cache.get(key)
+        if v is None:
+            v = self._cache[key] = fn()
+        return v
+
+    @property
+    def oldest(self):
+        # After the push, head points at the oldest sample of a full ring
+        return self._cached("oldest", lambda: self.ring[np.arange(len(self.slots)), self._head])
+
+    @property
+    def window_min(self):
+        return self._cached("min", lambda: np.fmin.reduce(self.ring, axis=1))
+
+    @property
+    def window_max(self):
+        return self._cached("max", lambda: np.fmax.reduce(self.ring, axis=1))
+
+    def above(self, factor):
+        """Ring cells above mean * factor, per row (NaN cells never count)."""
+        return self._cached(("above", factor), lambda: (self.ring > (self.mean * factor)[:, None]).sum(axis=1))
+
+    def take(self, rows):
+        """A context restricted to `rows` (for rules limited to some classes)."""
+        sub = RuleContext.__new__(RuleContext)
+        sub.detector, sub.now, sub._cache = self.detector, self.now, {}
+        sub.names = [self.names[i] for i in rows.tolist()]
+        for field in ("slots", "scores", "mean", "std", "count", "ring", "_head"):
+            setattr(sub, field, getattr(self, field)[rows])
+        return sub
+
+
+class Rule:
+    """
+    Base rule. `evaluate(ctx)` returns a bool array over ctx rows;
+    `observe(ctx)` runs after every evaluation to update any state.
+    """
+    name = "rule"
+
+    def evaluate(self, ctx):
+        raise NotImplementedError
+
+    def observe(self, ctx):
+        pass
+
+
+# --- Built-in rules (thresholds default to the detector's) ---
+class StdDevRule(Rule):
+    """Score more than k standard deviations above the mean."""
+    name = "std"
+
+    def __init__(self, k=None):
+        self.k = k
+
+    def evaluate(self, ctx):
+        k = ctx.detector.THRESH_STD if self.k is None else self.k
+        return ctx.scores > ctx.mean + k * ctx.std
+
+
+class DriftRule(Rule):
+    """Score more than `factor` times the mean."""
+    name = "drift"
+
+    def __init__(self, factor=None):
+        self.factor = factor
+
+    def evaluate(self, ctx):
+        factor = ctx.detector.THRESH_DRIFT if self.factor is None else self.factor
+        return ctx.scores > ctx.mean * factor
+
+
+class SustainedRule(Rule):
+    """At least `min_count` of the recent samples above mean * factor."""
+
+    def __init__(self, name, factor, min_count):
+        self.name = name
+        self.factor = factor
+        self.min_count = min_count
+
+    def evaluate(self, ctx):
+        return ctx.above(self.factor) >= self.min_count
+
+
+class StepRule(Rule):
+    """Score `factor` times the oldest sample of a full window."""
+    name = "step"
+
+    def __init__(self, factor=1.6):
+        self.factor = factor
+
+    def evaluate(self, ctx):
+        return (ctx.count >= ctx.detector.profiles.WINDOW) & (ctx.scores > ctx.oldest * self.factor)
+
+
+def default_rules():
+    return [
+        StdDevRule(),
+        DriftRule(),
+        SustainedRule("sustained_high", 1.8, 3),
+        StepRule(1.6),
+        SustainedRule("sustained", 1.4, 4),
+    ]
+
+
+# --- Extra detectors with their own per-slot state ---
+class SlotStateRule(Rule):
+    """
+    Rule with per-slot state arrays that follow the detector's
+    ProfileArrays slots. STATE maps field -> (default, per-slot shape).
+    """
+    STATE = {}
+
+    def __init__(self):
+        self._state = {}
+
+    def state(self, ctx):
+        capacity = ctx.detector.profiles.capacity
+        for field, (default, shape) in self.STATE.items():
+            arr = self._state.get(field)
+            if arr is None or len(arr) < capacity:
+                grown = np.full((capacity,) + shape, default, dtype=np.float64)
+                if arr is not None:
+                    grown[:len(arr)] = arr
+                self._state[field] = grown
+        return self._state
+
+    def reset(self, slots):
+        """Forget the state of recycled slots."""
+        for field, (default, _) in self.STATE.items():
+            arr = self._state.get(field)
+            if arr is not None:
+                arr[slots[slots < len(arr)]] = default
+
+
+class CusumRule(SlotStateRule):
+    """
+    One-sided CUSUM on the standardized score: catches small shifts that
+    persist, which the threshold rules miss. Restarts after each alarm.
+    """
+    name = "cusum"
+    STATE = {"s": (0.0, ())}
+
+    def __init__(self, k=0.5, h=5.0):
+        super().__init__()
+        self.k = k
+        self.h = h
+
+    def evaluate(self, ctx):
+        s = self.state(ctx)["s"]
+        z = (ctx.scores - ctx.mean) / ctx.std
+        cur = np.maximum(0.0, s[ctx.slots] + z - self.k)
+        fired = cur > self.h
+        s[ctx.slots] = np.where(fired, 0.0, cur)
+        return fired
+
+
+class SeasonalRule(SlotStateRule):
+    """
+    Hour-of-day baseline: fires when the score is well above what this
+    process usually does at this hour (local time).
+    """
+    name = "seasonal"
+    STATE = {"mean": (0.0, (24,)), "n": (0.0, (24,))}
+
+    def __init__(self, factor=2.0, margin=0.05, min_obs=30, alpha=0.05):
+        super().__init__()
+        self.factor = factor
+        self.margin = margin
+        self.min_obs = min_obs
+        self.alpha = alpha
+
+    def evaluate(self, ctx):
+        st = self.state(ctx)
+        hour = time.localtime(ctx.now).tm_hour
+        mean, n = st["mean"][ctx.slots, hour], st["n"][ctx.slots, hour]
+        return (n >= self.min_obs) & (ctx.scores > mean * self.factor + self.margin)
+
+    def observe(self, ctx):
+        st = self.state(ctx)
+        hour = time.localtime(ctx.now).tm_hour
+        mean, n = st["mean"][ctx.slots, hour], st["n"][ctx.slots, hour]
+        st["mean"][ctx.slots, hour] = np.where(n > 0, mean + self.alpha * (ctx.scores - mean), ctx.scores)
+        st["n"][ctx.slots, hour] = n + 1
+
+
+class RobustMadRule(SlotStateRule):
+    """
+    Robust z-score against a streaming median / MAD (sign-step quantile
+    tracking, O(1) per sample), so a few spikes don't drag the baseline
+    up the way they do the EWMA. Steps are a fraction of the current MAD
+    (the MAD itself moves by that factor), so the estimates settle at any
+    score scale instead of jittering by a fixed amount.
+    """
+    name = "mad"
+    STATE = {"median": (math.nan, ()), "mad": (0.01, ()), "n": (0.0, ())}
+    MIN_MAD = 1e-4
+
+    def __init__(self, threshold=3.5, step=0.05, min_obs=20):
+        super().__init__()
+        self.threshold = threshold
+        self.step = step
+        self.min_obs = min_obs
+
+    def evaluate(self, ctx):
+        st = self.state(ctx)
+        med, mad, n = st["median"][ctx.slots], st["mad"][ctx.slots], st["n"][ctx.slots]
+        z = (ctx.scores - med) / (1.4826 * mad)
+        return (n >= self.min_obs) & (z > self.threshold)
+
+    def observe(self, ctx):
+        st = self.state(ctx)
+        x, slots = ctx.scores, ctx.slots
+        med = st["median"][slots]
+        mad = st["mad"][slots]
+        med = np.where(np.isnan(med), x, med)
+        med = med + self.step * mad * np.sign(x - med)
+        mad = np.maximum(mad * (1 + self.step * np.sign(np.abs(x - med) - mad)), self.MIN_MAD)
+        st["median"][slots] = med
+        st["mad"][slots] = mad
+        st["n"][slots] += 1
+
+
+class RuleEngine:
+    """
+    Runs the registered rules over a RuleContext and keeps per-rule
+    evaluation counts, hits and time spent.
+    """
+
+    def __init__(self, rules=None, classifier=None):
+        self.classifier = classifier or (lambda name: "app")
+        self._classes = {}  # name -> class, cached
+        self.rules = []     # [(rule, classes or None)]
+        self.stats = {}
+        for rule in default_rules() if rules is None else rules:
+            self.register(rule)
+
+    def register(self, rule, classes=None):
+        """Add a rule; `classes` limits it to those process classes."""
+        if any(r.name == rule.name for r, _ in self.rules):
+            raise ValueError(f"Rule {rule.name!r} already registered")
+        self.rules.append((rule, frozenset(classes) if classes else None))
+        self.stats[rule.name] = [0, 0, 0.0]  # evaluations, hits, seconds
+        return rule
+
+    def unregister(self, name):
+        self.rules = [(r, c) for r, c in self.rules if r.name != name]
+        self.stats.pop(name, None)
+
+    def class_of(self, name):
+        c = self._classes.get(name)
+        if c is None:
+            c = self._classes[name] = self.classifier(name)
+        return c
+
+    def forget(self, names, slots=None):
+        """Drop cached classes (and per-slot state) for removed processes."""
+        for n in names:
+            self._classes.pop(n, None)
+        if slots is not None and len(slots):
+            for rule, _ in self.rules:
+                if isinstance(rule, SlotStateRule):
+                    rule.reset(np.asarray(slots))
+
+    def evaluate(self, ctx):
+        """Number of rules fired per ctx row."""
+        total = np.zeros(len(ctx.slots), dtype=np.int64)
+        classes = None
+        for rule, allowed in self.rules:
+            start = time.perf_counter()
+            if allowed is None:
+                sub, rows = ctx, None
+            else:
+                if classes is None:
+                    classes = [self.class_of(n) for n in ctx.names]
+                rows = np.array([i for i, c in enumerate(classes) if c in allowed], dtype=np.int64)
+                sub = ctx.take(rows)
+
+            fired = rule.evaluate(sub)
+            rule.observe(sub)
+            if rows is None:
+                total += fired
+            else:
+                total[rows] += fired
+
+            stats = self.stats[rule.name]
+            stats[0] += len(sub.slots)
+            stats[1] += int(np.count_nonzero(fired))
+            stats[2] += time.perf_counter() - start
+        return total
+
+    def rule_stats(self):
+        """{rule name: {evaluations, hits, seconds, us_per_eval}}, costliest first."""
+        out = {}
+        for name, (evals, hits, secs) in sorted(self.stats.items(), key=lambda kv: -kv[1][2]):
+            out[name] = {
+                "evaluations": evals,
+                "hits": hits,
+                "seconds": round(secs, 6),
+                "us_per_eval": round(secs * 1e6 / evals, 3) if evals else 0.0,
+            }
+        return out
@@ -0,0 +1,119 @@
+import time
+import numpy as np
+
+
+class SamplingScheduler:
+    """
+    Adaptive, tiered sampling for the collector.
+
+    The collector ticks every BASE_INTERVAL. Each tick the pid list is
+    refreshed in one pass (new and exited processes are noticed at once),
+    but a process' counters are only read when its tier says it is due:
+
+        hot     score spiking above its baseline, or a heavy consumer
+        normal  everything else
+        idle    low, flat score with a full sample window
+
+    Tiers are recomputed from the detector's ProcessProfile state whenever
+    a process is sampled. Between its samples, the scanner still reads the
+    CPU counter of every process (stat only on Linux), and one whose CPU
+    jumps is sampled at once and moved to the hot tier (see
+    ProcessScanner.PROMOTE_CPU), so a spike shows up within one tick even
+    in the idle tier. If the collector's own CPU time exceeds
+    CPU_BUDGET (seconds per wall second) the non-hot intervals are
+    stretched, and relaxed again once it is back under budget.
+    """
+    BASE_INTERVAL = 0.5
+    TIERS = {"hot": 0.5, "normal": 2.0, "idle": 15.0} # seconds between samples
+    HOT_SCORE = 0.3
+    IDLE_SCORE = 0.02
+    IDLE_STD = 0.01
+    CPU_BUDGET = 0.05 # 5% of one core
+    MAX_STRETCH = 4.0
+
+    def __init__(self, detector, cpu_budget=None, tiers=None, clock=time.time):
+        self.detector = detector
+        if cpu_budget is not None:
+            self.CPU_BUDGET = cpu_budget
+        if tiers is not None:
+            self.TIERS = dict(self.TIERS, **tiers)
+        self.clock = clock
+        self.stretch = 1.0
+        self.next_due = {}      # name -> time it should next be sampled
+        self.last_sampled = {}  # name -> time it was last sampled
+        self.tiers = {}         # name -> tier name
+        self._cpu_used = 0.0
+        self._wall = 0.0
+
+    def due_check(self, now=None):
+        """Predicate for ProcessScanner.sample(due=...) at time `now`."""
+        now = self.clock() if now is None else now
+        next_due = self.next_due
+        return lambda name: next_due.get(name, 0.0) <= now
+
+    def elapsed(self, names, now):
+        """Seconds since each name was last sampled (REF_INTERVAL if never)."""
+        ref = self.detector.profiles.REF_INTERVAL
+        last = self.last_sampled
+        return np.fromiter(
+            (now - last[n] if n in last else ref for n in names),
+            dtype=np.float64, count=len(names)
+        )
+
+    def observe(self, names, now, promoted=()):
+        """
+        Reclassify the names sampled at `now` and schedule their next sample.
+        Names in `promoted` (see ProcessScanner.promoted) go to the hot tier.
+        """
+        if not len(names):
+            return
+        a = self.detector.profiles
+        # A running process' profile can have been evicted (MAX_PROFILES) since
+        # it was checked; it is recreated on its next check, until then it is "normal"
+        get = a.slots.get
+        idx = np.fromiter((get(n, -1) for n in names), dtype=np.int64, count=len(names))
+        known = idx >= 0
+        slots = idx[known]
+        mean, std, count = a.mean[slots], a.std[slots], a.count[slots]
+        latest = a.samples[slots, (a.head[slots] - 1) % a.WINDOW]
+
+        hot = np.zeros(len(names), dtype=bool)
+        idle = np.zeros(len(names), dtype=bool)
+        hot[known] = (latest > mean + 2 * std) | (mean >= self.HOT_SCORE)
+        if promoted:
+            hot |= np.fromiter((n in promoted for n in names), dtype=bool, count=len(names))
+        idle[known] = ~hot[known] & (count >= a.WINDOW) & (mean < self.IDLE_SCORE) & (std < self.IDLE_STD)
+
+        t = self.TIERS
+        interval = np.where(hot, t["hot"], np.where(idle, t["idle"] * self.stretch, t["normal"] * self.stretch))
+        tiers = np.where(hot, "hot", np.where(idle, "idle", "normal"))
+
+        for name, dt, tier in zip(names, (now + interval).tolist(), tiers.tolist()):
+            self.next_due[name] = dt
+            self.last_sampled[name] = now
+            self.tiers[name] = tier
+
+    def account(self, cpu_seconds, wall_seconds):
+        """Feed the collector's CPU cost for a tick; adjusts the stretch factor."""
+        self._cpu_used += cpu_seconds
+        self._wall += wall_seconds
+        if self._wall < 1.0:
+            return
+        usage = self._cpu_used / self._wall
+        if usage > self.CPU_BUDGET:
+            self.stretch = min(self.stretch * 1.5, self.MAX_STRETCH)
+        elif usage < self.CPU_BUDGET * 0.5:
+            self.stretch = max(self.stretch / 1.5, 1.0)
+        self._cpu_used = self._wall = 0.0
+
+    def retain(self, names):
+        """Forget processes that are no longer running."""
+        for d in (self.next_due, self.last_sampled, self.tiers):
+            for n in [n for n in d if n not in names]:
+                del d[n]
+
+    def tier_counts(self):
+        counts = {tier: 0 for tier in self.TIERS}
+        for tier in self.tiers.values():
+            counts[tier] += 1
+        return counts
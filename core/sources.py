@@ -0,0 +1,396 @@
+import os, random, sys, threading, time
+from typing import NamedTuple
+import numpy as np
+
+
+class SourceError(Exception):
+    """A process could not be read (e.g. access denied)."""
+
+
+class ProcessGone(SourceError):
+    """The process exited (or its pid was recycled) since it was opened."""
+
+
+class AccessDenied(SourceError):
+    """Not allowed to read the process."""
+
+
+class ProcessInfo(NamedTuple):
+    """Static attributes, read once per process lifetime."""
+    pid: int
+    create_time: float
+    name: str
+    exe: str
+    ppid: int = 0
+    system: bool = False  # the source knows this is a system process (e.g. a kernel thread)
+    cpu_time: float = 0.0 # cumulative CPU seconds when opened, the baseline of the first sample
+
+
+LINUX = sys.platform.startswith("linux")
+KTHREADD_PID = 2
+SYSTEM_CGROUPS = ("/system.slice/", "/init.scope")
+
+
+def linux_system_process(pid, ppid, root="/proc"):
+    """
+    Linux system process: PID 1, kthreadd and its kernel threads, or
+    anything in a systemd system slice.
+    """
+    if pid in (1, KTHREADD_PID) or ppid == KTHREADD_PID:
+        return True
+    try:
+        with open(f"{root}/{pid}/cgroup", "rb") as f:
+            cgroup = f.read().decode("utf-8", "replace")
+    except OSError:
+        return False
+    # cgroup v2 line is "0::/path"; v1 has one line per controller
+    return any(line.split(":", 2)[-1].startswith(SYSTEM_CGROUPS) for line in cgroup.splitlines())
+
+
+class ProcessSample(NamedTuple):
+    """
+    Dynamic counters, read every tick. Only raw cumulative counters: rates
+    are worked out by the caller once it accepts a sample, so a read it
+    gave up on (see ProcessScanner's deadline) changes nothing.
+    """
+    cpu_time: float     # cumulative user + system CPU seconds
+    rss: int            # bytes
+    io_bytes: object    # cumulative read + write bytes, None if unavailable
+
+
+class ProcessSource:
+    """
+    Where ProcessScanner gets raw per-process data from.
+
+    open() returns an opaque handle plus the static ProcessInfo; sample()
+    reads the dynamic counters for a handle and must not change it. Both raise ProcessGone when
+    the process is no longer there and SourceError for anything else.
+    """
+
+    def now(self):
+        """Clock used for rate computations."""
+        return time.monotonic()
+
+    def pids(self):
+        raise NotImplementedError
+
+    def open(self, pid):
+        raise NotImplementedError
+
+    def sample(self, handle):
+        raise NotImplementedError
+
+    def cpu_time(self, handle):
+        """Cumulative CPU seconds only; sources override it with something cheaper than sample()."""
+        return self.sample(handle).cpu_time
+
+    def close(self, handle):
+        pass
+
+
+class PsutilSource(ProcessSource):
+    """Live data through psutil."""
+
+    def __init__(self):
+        import psutil
+        self.psutil = psutil
+
+    def pids(self):
+        return self.psutil.pids()
+
+    def open(self, pid):
+        psutil = self.psutil
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                create_time = proc.create_time()
+                name = proc.name()
+                ppid = proc.ppid()
+                try:
+                    exe = proc.exe()
+                except (psutil.AccessDenied, psutil.ZombieProcess):
+                    exe = ""
+                times = proc.cpu_times()
+        except psutil.NoSuchProcess as e:
+            raise ProcessGone(pid) from e
+        except psutil.AccessDenied as e:
+            raise AccessDenied(pid) from e
+        except psutil.Error as e:
+            raise SourceError(pid) from e
+        system = LINUX and linux_system_process(pid, ppid)
+        return proc, ProcessInfo(pid, create_time, name, exe, ppid, system, times.user + times.system)
+
+    def sample(self, proc):
+        psutil = self.psutil
+        try:
+            # cpu_percent / memory_info / io_counters don't check for pid reuse
+            # and would read whatever process has the pid now; is_running()
+            # compares create_time, like ProcfsSource does with starttime
+            if not proc.is_running():
+                raise ProcessGone(proc.pid)
+            with proc.oneshot():
+                times = proc.cpu_times()
+                rss = proc.memory_info().rss
+                try:
+                    io = proc.io_counters()
+                except (psutil.AccessDenied, AttributeError):
+                    io = None
+        except psutil.NoSuchProcess as e:
+            raise ProcessGone(proc.pid) from e
+        except psutil.AccessDenied as e:
+            raise AccessDenied(proc.pid) from e
+        except psutil.Error as e:
+            raise SourceError(proc.pid) from e
+        return ProcessSample(times.user + times.system, rss, None if io is None else io.read_bytes + io.write_bytes)
+
+    def cpu_time(self, proc):
+        try:
+            times = proc.cpu_times()
+        except self.psutil.NoSuchProcess as e:
+            raise ProcessGone(proc.pid) from e
+        except self.psutil.Error as e:
+            raise SourceError(proc.pid) from e
+        return times.user + times.system
+
+
+class _ProcfsHandle:
+    __slots__ = ("pid", "stat", "statm", "io", "starttime")
+
+    def __init__(self, pid, root, starttime):
+        base = f"{root}/{pid}/"
+        self.pid = pid
+        self.stat = base + "stat"
+        self.statm = base + "statm"
+        self.io = base + "io"
+        self.starttime = starttime  # jiffies after boot; changes if the pid is reused
+
+
+class ProcfsSource(ProcessSource):
+    """
+    Linux data straight from /proc: stat, statm and io per process, read
+    with one os.read each into a reused per-thread buffer and split only
+    as far as needed. Same values as PsutilSource (cpu as percent of one core,
+    create_time from boot time + start ticks, so process_control's
+    psutil-based identity check still matches).
+
+    Kernel threads, PID 1 and anything running in a systemd system slice
+    are reported as system processes (see linux_system_process).
+    """
+    PF_KTHREAD = 0x00200000
+
+    def __init__(self, root="/proc"):
+        self.root = root
+        self.clk_tck = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.boot_time = self._boot_time()
+        self._local = threading.local() # .buf, one read buffer per scanner thread
+
+    def _boot_time(self):
+        with open(f"{self.root}/stat", "rb") as f:
+            for line in f:
+                if line.startswith(b"btime"):
+                    return float(line.split()[1])
+        raise SourceError("no btime in /proc/stat")
+
+    def _read(self, path, pid):
+        """Whole (small) file as bytes, through this thread's buffer."""
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            buf = self._local.buf = bytearray(4096)
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except (FileNotFoundError, ProcessLookupError) as e:
+            raise ProcessGone(pid) from e
+        except PermissionError as e:
+            raise AccessDenied(pid) from e
+        except OSError as e:
+            raise SourceError(pid) from e
+        try:
+            n = os.readv(fd, [buf])
+        except ProcessLookupError as e:
+            raise ProcessGone(pid) from e
+        except OSError as e:
+            raise SourceError(pid) from e
+        finally:
+            os.close(fd)
+        return bytes(buf[:n])
+
+    @staticmethod
+    def _parse_stat(data):
+        """(comm, fields after the comm) from /proc/<pid>/stat; comm may contain spaces and parens."""
+        end = data.rindex(b")")
+        comm = data[data.index(b"(") + 1:end].decode("utf-8", "replace")
+        return comm, data[end + 2:].split()
+
+    def pids(self):
+        return [int(e.name) for e in os.scandir(self.root) if e.name.isdigit()]
+
+    def open(self, pid):
+        comm, f = self._parse_stat(self._read(f"{self.root}/{pid}/stat", pid))
+        ppid, flags = int(f[1]), int(f[6])
+        ticks, starttime = int(f[11]) + int(f[12]), int(f[19])
+
+        try:
+            exe = os.readlink(f"{self.root}/{pid}/exe")
+        except OSError:
+            exe = "" # kernel thread, or not ours to look at
+
+        name = comm
+        if len(comm) >= 15:
+            # comm is truncated to 15 chars; prefer the full name like psutil does
+            for candidate in (exe, self._argv0(pid)):
+                base = os.path.basename(candidate)
+                if base.startswith(comm):
+                    name = base
+                    break
+
+        system = bool(flags & self.PF_KTHREAD) or linux_system_process(pid, ppid, self.root)
+        info = ProcessInfo(pid, starttime / self.clk_tck + self.boot_time, name, exe, ppid, system, ticks / self.clk_tck)
+        return _ProcfsHandle(pid, self.root, starttime), info
+
+    def _argv0(self, pid):
+        try:
+            with open(f"{self.root}/{pid}/cmdline", "rb") as f:
+                return f.read(4096).split(b"\0", 1)[0].decode("utf-8", "replace")
+        except OSError:
+            return ""
+
+    def sample(self, h):
+        pid = h.pid
+        _, f = self._parse_stat(self._read(h.stat, pid))
+        if int(f[19]) != h.starttime:
+            raise ProcessGone(pid) # pid reused
+        cpu_time = (int(f[11]) + int(f[12])) / self.clk_tck
+
+        rss = int(self._read(h.statm, pid).split(None, 2)[1]) * self.page_size
+
+        io_bytes = None
+        try:
+            io = self._read(h.io, pid)
+        except ProcessGone:
+            raise
+        except SourceError:
+            pass # /proc/<pid>/io of another user's process
+        else:
+            fields = dict(line.split(b": ") for line in io.splitlines())
+            io_bytes = int(fields[b"read_bytes"]) + int(fields[b"write_bytes"])
+        return ProcessSample(cpu_time, rss, io_bytes)
+
+    def cpu_time(self, h):
+        """stat only: one read instead of sample()'s three."""
+        _, f = self._parse_stat(self._read(h.stat, h.pid))
+        if int(f[19]) != h.starttime:
+            raise ProcessGone(h.pid)
+        return (int(f[11]) + int(f[12])) / self.clk_tck
+
+
+def default_source(kind="auto"):
+    """A live source: "procfs" on Linux for "auto", otherwise psutil."""
+    if kind == "auto":
+        kind = "procfs" if LINUX and os.path.exists("/proc/self/stat") else "psutil"
+    if kind == "procfs":
+        return ProcfsSource()
+    if kind == "psutil":
+        return PsutilSource()
+    raise ValueError(f"Unknown process source {kind!r}")
+
+
+class SyntheticSource(ProcessSource):
+    """
+    Deterministic fake process table for benchmarks and tests.
+
+    Each pids() call advances the simulation by `interval` seconds of
+    simulated time: `churn` of the processes exit and are replaced by new
+    ones, and with probability `anomaly_rate` per process a load spike of
+    `anomaly_ticks` ticks is injected. `anomalous` holds the names that are
+    spiking in the current tick (ground truth for detector evaluation).
+    """
+    APP_NAMES = 400 # distinct executable names to draw from
+
+    def __init__(self, processes=1000, churn=0.01, anomaly_rate=0.001, anomaly_ticks=5,
+                 interval=2.0, seed=0, start_time=1_700_000_000.0):
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+        self.interval = interval
+        self.churn = churn
+        self.anomaly_rate = anomaly_rate
+        self.anomaly_ticks = anomaly_ticks
+        self.clock = start_time
+        self.tick = 0
+        self.anomalous = set()
+
+        self._next_pid = 100
+        self._procs = {}  # pid -> [name, create_time, slot]
+        n = processes
+        self._base_cpu = np.zeros(n)
+        self._base_rss = np.zeros(n)
+        self._io_rate = np.zeros(n)
+        self._spike = np.zeros(n, dtype=np.int64)  # ticks of anomaly left
+        self._io_total = np.zeros(n)
+        self._cpu_total = np.zeros(n)  # cumulative CPU seconds
+        self._cpu = np.zeros(n)
+        self._rss = np.zeros(n)
+        for slot in range(n):
+            self._spawn(slot)
+
+    def now(self):
+        return self.clock
+
+    def _spawn(self, slot):
+        pid = self._next_pid
+        self._next_pid += 1
+        # A few names host many instances (browsers, helpers), most have one
+        k = min(int(self.rng.paretovariate(1.2)) - 1, self.APP_NAMES - 1)
+        name = f"app{k:03d}.exe" if self.rng.random() < 0.7 else f"tool{pid % 5000:04d}.exe"
+        self._procs[pid] = [name, self.clock, slot]
+        self._base_cpu[slot] = self.rng.expovariate(1 / 2.0)
+        self._base_rss[slot] = self.rng.lognormvariate(4.5, 1.0) * 1024 * 1024
+        self._io_rate[slot] = self.rng.expovariate(1 / 50_000.0)
+        self._spike[slot] = 0
+        self._io_total[slot] = 0.0
+        self._cpu_total[slot] = 0.0
+
+    def _advance(self):
+        self.tick += 1
+        self.clock += self.interval
+
+        if self.churn:
+            pids = list(self._procs)
+            for pid in self.rng.sample(pids, int(len(pids) * self.churn)):
+                self._spawn(self._procs.pop(pid)[2])
+
+        n = len(self._base_cpu)
+        starts = self.np_rng.random(n) < self.anomaly_rate
+        self._spike[starts & (self._spike == 0)] = self.anomaly_ticks
+        spiking = self._spike > 0
+        factor = np.where(spiking, 8.0, 1.0)
+
+        noise = self.np_rng.normal(1.0, 0.15, n).clip(0.1)
+        self._cpu = self._base_cpu * noise * factor
+        self._rss = self._base_rss * np.where(spiking, 2.0, 1.0)
+        self._io_total += self._io_rate * self.interval * noise * factor
+        self._cpu_total += self._cpu / 100 * self.interval
+        self._spike[spiking] -= 1
+
+        self.anomalous = set()
+        if spiking.any():
+            spiking_slots = set(np.flatnonzero(spiking).tolist())
+            self.anomalous = {p[0] for p in self._procs.values() if p[2] in spiking_slots}
+
+    def pids(self):
+        self._advance()
+        return list(self._procs)
+
+    def open(self, pid):
+        entry = self._procs.get(pid)
+        if entry is None:
+            raise ProcessGone(pid)
+        name, create_time, slot = entry
+        return (pid, slot), ProcessInfo(pid, create_time, name, f"/opt/synthetic/{name}", 1, cpu_time=float(self._cpu_total[slot]))
+
+    def sample(self, handle):
+        pid, slot = handle
+        entry = self._procs.get(pid)
+        if entry is None or entry[2] != slot:
+            raise ProcessGone(pid)
+        return ProcessSample(float(self._cpu_total[slot]), int(self._rss[slot]), int(self._io_total[slot]))
@@ -0,0 +1,120 @@
+import heapq, threading
+
+
+class TopK:
+    """
+    Top-k over a {key: value} map that changes all the time.
+
+    A max-heap with lazy deletion: update() pushes the new value and
+    leaves the old entry in place; top() skips entries that no longer
+    match the current value. The heap is rebuilt once stale entries
+    outnumber live ones, so it stays O(live keys).
+    """
+
+    def __init__(self):
+        self._value = {}  # key -> current value
+        self._heap = []   # (-value, key), possibly stale
+
+    def __len__(self):
+        return len(self._value)
+
+    def get(self, key, default=None):
+        return self._value.get(key, default)
+
+    def keys(self):
+        return self._value.keys()
+
+    def update(self, key, value):
+        if self._value.get(key) == value:
+            return
+        self._value[key] = value
+        heapq.heappush(self._heap, (-value, key))
+        if len(self._heap) > 2 * len(self._value) + 64:
+            self._rebuild()
+
+    def remove(self, key):
+        self._value.pop(key, None)
+
+    def clear(self):
+        self._value.clear()
+        self._heap.clear()
+
+    def _rebuild(self):
+        self._heap = [(-v, k) for k, v in self._value.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, k, valid=None):
+        """
+        The k largest (key, value), largest first. Keys failing `valid`
+        are dropped for good.
+        """
+        heap, value = self._heap, self._value
+        out, seen = [], set()
+        while heap and len(out) < k:
+            neg, key = heapq.heappop(heap)
+            if key in seen or value.get(key) != -neg:
+                continue # superseded
+            if valid is not None and not valid(key):
+                del value[key]
+                continue
+            seen.add(key)
+            out.append((key, -neg))
+        for key, v in out:
+            heapq.heappush(heap, (-v, key))
+        return out
+
+
+class ConsumerIndex:
+    """
+    Live rankings of process names, kept up to date by the collector:
+
+        instant    latest Power Score of running apps
+        mean       long-term EWMA mean from the baseline (all known apps)
+        energy     energy used today (score-seconds, see core.energy)
+        anomalies  anomalies flagged today
+
+    Safe to query from any thread; each query costs O(k log n).
+    `filters` maps a ranking to a predicate that names must still pass
+    when queried (e.g. still present in the baseline).
+    """
+    RANKINGS = ("instant", "mean", "energy", "anomalies")
+    K = 5
+
+    def __init__(self, k=None, filters=None):
+        if k is not None:
+            self.K = k
+        self.filters = filters or {}
+        self._lock = threading.Lock()
+        self._rankings = {r: TopK() for r in self.RANKINGS}
+
+    def update(self, ranking, names, values):
+        with self._lock:
+            r = self._rankings[ranking]
+            for name, value in zip(names, values):
+                r.update(name, value)
+
+    def increment(self, ranking, names, by=1):
+        with self._lock:
+            r = self._rankings[ranking]
+            for name in names:
+                r.update(name, r.get(name, 0) + by)
+
+    def retain(self, ranking, names):
+        """Drop every name not in `names` from `ranking`."""
+        with self._lock:
+            r = self._rankings[ranking]
+            for name in [n for n in r.keys() if n not in names]:
+                r.remove(name)
+
+    def reset(self, ranking):
+        with self._lock:
+            self._rankings[ranking].clear()
+
+    def top(self, ranking="mean", k=None):
+        """[(name, value)] for the k highest in `ranking`."""
+        with self._lock:
+            return self._rankings[ranking].top(self.K if k is None else k, self.filters.get(ranking))
+
+    def snapshot(self, k=None):
+        """{ranking: [(name, value)]} for every ranking."""
+        return {r: self.top(r, k) for r in self.RANKINGS}
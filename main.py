@@ -6,6 +6,9 @@
 # if __name__ == "__main__":
 #     run_app()
 
+import time
+started = time.perf_counter() # startup time is measured from here, see MainWindow.STARTUP_TARGET
+
 from ui.main_window import MainWindow
 from PyQt6.QtWidgets import QApplication
 import sys
@@ -13,7 +16,7 @@ import sys
 if __name__ == "__main__":
     app = QApplication(sys.argv)
 
-    window = MainWindow()
+    window = MainWindow(started)
     window.show()
 
     sys.exit(app.exec())
@@ -0,0 +1,56 @@
+"""Shared test helpers."""
+import time
+
+import pytest
+
+from core.sources import ProcessGone, ProcessInfo, ProcessSample, ProcessSource
+
+
+class FakeSource(ProcessSource):
+    """
+    Hand-driven process table: tests set counters and move the clock.
+    `delay` makes sample() of a pid sleep (a read stuck in the kernel).
+    """
+
+    def __init__(self):
+        self.clock = 0.0
+        self.procs = {}  # pid -> {"name", "create_time", "cpu", "rss", "io"}
+        self.delay = {}  # pid -> seconds sample() blocks for
+        self.reads = []  # (kind, pid) in call order
+
+    def add(self, pid, name, cpu=0.0, rss=50 * 1024 * 1024, io=0, create_time=None):
+        self.procs[pid] = {"name": name, "create_time": self.clock if create_time is None else create_time,
+                           "cpu": cpu, "rss": rss, "io": io}
+
+    def now(self):
+        return self.clock
+
+    def pids(self):
+        return list(self.procs)
+
+    def open(self, pid):
+        p = self.procs.get(pid)
+        if p is None:
+            raise ProcessGone(pid)
+        return pid, ProcessInfo(pid, p["create_time"], p["name"], f"/usr/bin/{p['name']}", 1, cpu_time=p["cpu"])
+
+    def _get(self, pid, kind):
+        self.reads.append((kind, pid))
+        if pid in self.delay:
+            time.sleep(self.delay[pid])
+        p = self.procs.get(pid)
+        if p is None:
+            raise ProcessGone(pid)
+        return p
+
+    def sample(self, pid):
+        p = self._get(pid, "sample")
+        return ProcessSample(p["cpu"], p["rss"], p["io"])
+
+    def cpu_time(self, pid):
+        return self._get(pid, "cpu_time")["cpu"]
+
+
+@pytest.fixture
+def source():
+    return FakeSource()
@@ -0,0 +1,28 @@
+from core.anomaly_log import AnomalyLogWriter
+
+
+def test_counts_since_splits_a_file_that_straddles_it(tmp_path):
+    log = AnomalyLogWriter(str(tmp_path))
+    midnight = 1_700_000_000.0
+    # One file (rotation is by age from its creation), spanning midnight
+    log._load_index()
+    log._write_batch([
+        {"ts": midnight - 7200, "name": "b", "rules": 3, "score": 0.5},
+        {"ts": midnight - 60, "name": "a", "rules": 3, "score": 0.5},
+        {"ts": midnight + 60, "name": "b", "rules": 3, "score": 0.5},
+        {"ts": midnight + 3600, "name": "a", "rules": 3, "score": 0.5},
+    ])
+    assert len(log._index["files"]) == 1
+    assert log.counts(since=midnight) == {"a": 1, "b": 1}
+    assert log.counts() == {"a": 2, "b": 2}
+    assert log.counts(since=midnight + 7200) == {}
+
+
+def test_query_uses_index_time_spans(tmp_path):
+    log = AnomalyLogWriter(str(tmp_path), max_age=100)
+    log._load_index()
+    log._write_batch([{"ts": 1000.0, "name": "a", "rules": 3, "score": 0.5}])
+    log._write_batch([{"ts": 1200.0, "name": "a", "rules": 4, "score": 0.6}])
+    assert len(log._index["files"]) == 2
+    assert [r["ts"] for r in log.query(name="a", since=1100)] == [1200.0]
+    assert log.query(name="b") == []
@@ -0,0 +1,60 @@
+"""BaselineStore must survive a crash at any point of compact()."""
+import builtins
+from unittest import mock
+
+import pytest
+
+from core.baseline_store import BaselineStore
+
+
+def crash_before_truncate(store):
+    """Make compact() die after the snapshot rename, before the journal is emptied."""
+    real_open = builtins.open
+
+    def fake_open(path, mode="r", *args, **kwargs):
+        if path == store.journal_path and mode == "w":
+            raise KeyboardInterrupt("crash")
+        return real_open(path, mode, *args, **kwargs)
+
+    return mock.patch("builtins.open", fake_open)
+
+
+def test_crash_mid_compaction_keeps_snapshot(tmp_path):
+    store = BaselineStore(str(tmp_path / "baseline_store.json"))
+    store.load()
+    store.append({"chrome": {"mean": 0.1}, "old": {"mean": 0.2}})
+    store.append({"old": {"deleted": True}})
+
+    # compact() gets the in-memory profiles, which are ahead of the journal
+    with crash_before_truncate(store), pytest.raises(KeyboardInterrupt):
+        store.compact({"chrome": {"mean": 0.5}, "old": {"mean": 0.3}})
+
+    data = BaselineStore(str(tmp_path / "baseline_store.json")).load()
+    assert data == {"chrome": {"mean": 0.5}, "old": {"mean": 0.3}}
+
+
+def test_journal_after_compaction_is_replayed(tmp_path):
+    path = str(tmp_path / "baseline_store.json")
+    store = BaselineStore(path)
+    store.load()
+    store.append({"chrome": {"mean": 0.1}})
+    store.compact({"chrome": {"mean": 0.1}})
+    store.append({"chrome": {"mean": 0.7}})
+
+    # A store that compacts without loading first keeps counting generations
+    BaselineStore(path).compact({"chrome": {"mean": 0.7}})
+    fresh = BaselineStore(path)
+    fresh.append({"chrome": {"mean": 0.9}})
+    assert BaselineStore(path).load() == {"chrome": {"mean": 0.9}}
+
+
+def test_append_after_compaction_by_another_store(tmp_path):
+    path = str(tmp_path / "baseline_store.json")
+    live = BaselineStore(path)
+    live.load()
+    live.append({"chrome": {"mean": 0.1}})
+
+    BaselineStore(path).compact({"chrome": {"mean": 0.2}})
+    # The live store must not keep stamping records with its old generation
+    live.append({"chrome": {"mean": 0.3}})
+    assert BaselineStore(path).load() == {"chrome": {"mean": 0.3}}
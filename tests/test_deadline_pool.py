@@ -0,0 +1,76 @@
+"""Deadline-bounded reads: stuck workers are written off and replaced, late rows go stale."""
+import threading, time
+
+from core.process_scanner import ProcessScanner, _ReadPool
+
+
+def wait_for(predicate, timeout=2.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_pool_replaces_a_stuck_worker():
+    pool = _ReadPool(2)
+    release = threading.Event()
+    done = []
+    try:
+        ok = pool.run(lambda: release.wait(5), [()], time.monotonic() + 0.1)
+        assert not ok and pool.stuck == 1
+
+        # The replacement keeps the pool at full strength meanwhile
+        assert pool.run(done.append, [(1,), (2,)], time.monotonic() + 1.0)
+        assert sorted(done) == [1, 2]
+
+        release.set()
+        assert wait_for(lambda: pool.stuck == 0) # the stuck thread retires once its read returns
+    finally:
+        release.set()
+        pool.close()
+
+
+def test_pool_caps_written_off_workers():
+    pool = _ReadPool(1)
+    pool.MAX_STUCK = 1
+    release = threading.Event()
+    try:
+        pool.run(lambda: release.wait(5), [()], time.monotonic() + 0.05)
+        pool.run(lambda: release.wait(5), [()], time.monotonic() + 0.05)
+        assert pool.stuck == 1
+        # A job is still waiting for a worker, so nothing more is queued
+        assert not pool.run(lambda: None, [()], time.monotonic() + 0.05)
+    finally:
+        release.set()
+        pool.close()
+
+
+def test_slow_process_goes_stale_and_is_not_queued_twice(source):
+    for pid in range(10, 16):
+        source.add(pid, f"app{pid}")
+    scanner = ProcessScanner(source, workers=2)
+    scanner.SHARDS_PER_WORKER = 3 # one process per shard
+    try:
+        scanner.sample(timeout=1.0)
+        source.delay[12] = 0.6
+
+        source.clock = 2.0
+        rows = {r[1]: r for r in scanner.sample(timeout=0.2)}
+        assert rows[12][5:] == (False, True) # last values, stale
+        assert all(rows[pid][5:] == (True, False) for pid in (10, 11, 13, 14, 15))
+        assert scanner.errors["timeout"] == 1
+
+        source.clock = 4.0
+        before = source.reads.count(("sample", 12))
+        rows = {r[1]: r for r in scanner.sample(timeout=0.2)}
+        assert rows[12][5:] == (False, True)
+        assert source.reads.count(("sample", 12)) == before # still stuck: not queued again
+
+        del source.delay[12]
+        time.sleep(0.5)
+        source.clock = 6.0
+        assert {r[1]: r for r in scanner.sample(timeout=1.0)}[12][5:] == (True, False)
+    finally:
+        scanner.close()
@@ -0,0 +1,68 @@
+"""DeltaTracker epsilon/keyframes, and apply()/merge() of the deltas it produces."""
+import random
+
+from core.delta import DeltaTracker, apply, merge
+
+
+def test_epsilon_suppresses_jitter_but_not_drift():
+    tracker = DeltaTracker({"cpu": 0.5}, keyframe_every=100)
+    tracker.update({"a": {"cpu": 10.0, "name": "a"}})
+    assert not tracker.update({"a": {"cpu": 10.3, "name": "a"}}).changed
+    # 10.3 -> 10.6 is another small step, but 0.6 away from what consumers hold
+    assert tracker.update({"a": {"cpu": 10.6, "name": "a"}}).changed == {"a": {"cpu": 10.6, "name": "a"}}
+    # Fields without an epsilon must match exactly
+    assert tracker.update({"a": {"cpu": 10.6, "name": "b"}}).changed
+
+
+def test_keyframes():
+    tracker = DeltaTracker(keyframe_every=3)
+    rows = {"a": (1,), "b": (2,)}
+    assert [tracker.update(rows).key for _ in range(6)] == [True, False, True, False, False, True]
+    tracker.reset()
+    key = tracker.update(rows)
+    assert key.key and key.upserts() == rows
+
+
+def evolve(rng, rows):
+    rows = dict(rows)
+    for name in list(rows):
+        r = rng.random()
+        if r < 0.15:
+            del rows[name]
+        elif r < 0.5:
+            rows[name] = (round(rows[name][0] + rng.uniform(-2, 2), 2),)
+    for _ in range(rng.randrange(3)):
+        rows[f"p{rng.randrange(40)}"] = (rng.uniform(0, 50),)
+    return rows
+
+
+def test_apply_and_merge_track_the_emitted_rows():
+    rng = random.Random(0)
+    tracker = DeltaTracker({0: 0.5}, keyframe_every=7)
+    rows = {f"p{i}": (float(i),) for i in range(20)}
+    consumer, seq = {}, None
+    base, base_seq, pending = {}, None, None # a slow consumer that merges what it skipped
+    for tick in range(300):
+        rows = evolve(rng, rows)
+        delta = tracker.update(rows)
+        assert apply(consumer, delta, seq)
+        seq = delta.seq
+        assert consumer == tracker.rows
+
+        pending = delta if pending is None else merge(pending, delta)
+        if tick % 5 == 4:
+            assert apply(base, pending, base_seq)
+            assert base == tracker.rows
+            base_seq, pending = pending.seq, None
+
+
+def test_apply_refuses_a_gap():
+    tracker = DeltaTracker(keyframe_every=100)
+    rows = {"a": (1,)}
+    first = tracker.update(rows)
+    tracker.update({"a": (2,)})
+    third = tracker.update({"a": (3,)})
+    state = {}
+    assert apply(state, first)
+    assert not apply(state, third, first.seq)
+    assert state == {"a": (1,)}
@@ -0,0 +1,59 @@
+"""EnergyLedger persistence: journal replay, compaction, deferred load."""
+import json
+
+from core.energy import EnergyLedger
+
+NOW = 1_700_000_000.0
+
+
+def ledger(tmp_path, **kwargs):
+    return EnergyLedger(str(tmp_path / "energy.json"), save_interval=0, **kwargs)
+
+
+def test_journal_round_trip(tmp_path):
+    a = ledger(tmp_path)
+    a.add(["x", "y"], [0.5, 1.0], 2.0, NOW)
+    a.save()
+    a.add(["x"], [0.5], 2.0, NOW + 120)
+    a.save(force=True)
+    assert not (tmp_path / "energy.json").exists() # nothing compacted yet
+
+    b = ledger(tmp_path)
+    assert b.totals("day", now=NOW + 120) == {"x": 2.0, "y": 2.0}
+    assert b.bucket("minute", NOW) == {"x": 1.0, "y": 2.0}
+    assert b.bucket("minute", NOW + 120) == {"x": 1.0}
+
+
+def test_compaction_empties_journal(tmp_path):
+    a = ledger(tmp_path, compact_every=2)
+    for i in range(3):
+        a.add(["x"], [1.0], 1.0, NOW + 60 * i)
+        a.save(force=True)
+    assert json.loads((tmp_path / "energy.json").read_text())["seq"] == 2
+    assert len((tmp_path / "energy.journal").read_text().splitlines()) == 1
+    assert ledger(tmp_path).totals("hour", 2, now=NOW + 120) == {"x": 3.0}
+
+
+def test_crash_before_truncate_does_not_double_count(tmp_path):
+    a = ledger(tmp_path, compact_every=2)
+    for i in range(2):
+        a.add(["x"], [1.0], 1.0, NOW + 60 * i)
+        a.save(force=True)
+    # The journal as it was right before compaction emptied it
+    (tmp_path / "energy.journal").write_text(
+        json.dumps({"seq": 1, "add": {repr(NOW - NOW % 60): {"x": 1.0}}}) + "\n"
+        + json.dumps({"seq": 2, "add": {repr(NOW + 60 - NOW % 60): {"x": 1.0}}}) + "\n"
+    )
+    assert ledger(tmp_path).totals("hour", 2, now=NOW + 60) == {"x": 2.0}
+
+
+def test_deferred_ledger_does_not_save_before_load(tmp_path):
+    a = ledger(tmp_path)
+    a.add(["x"], [1.0], 1.0, NOW)
+    a.save(force=True)
+
+    b = ledger(tmp_path, defer_load=True)
+    b.save(force=True)
+    assert not b.loaded
+    b.load()
+    assert b.totals("day", now=NOW) == {"x": 1.0}
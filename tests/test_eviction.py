@@ -0,0 +1,55 @@
+"""Bounded baseline: TTL / LRU eviction into the cold tier and restore on return."""
+import time
+
+import core.power_model as pm
+
+NOW = time.time() # save() evicts by the wall clock
+
+
+def detector(tmp_path, **kwargs):
+    return pm.AnomalyDetector(
+        str(tmp_path / "baseline_store.json"), cold_file=str(tmp_path / "cold"), **kwargs
+    )
+
+
+def feed(d, name, score, start, ticks=10):
+    for i in range(ticks):
+        d.check_batch([name], [score], now=start + i)
+
+
+def test_lru_then_ttl_eviction(tmp_path):
+    d = detector(tmp_path, max_profiles=2, profile_ttl=100)
+    feed(d, "a", 0.2, NOW)
+    feed(d, "b", 0.3, NOW + 20)
+    feed(d, "c", 0.4, NOW + 40)
+
+    assert d.evict(NOW + 50) == 1 # over the cap: the least recently seen goes
+    assert set(d.baseline) == {"b", "c"}
+    assert d.evict(NOW + 135) == 1 # b not seen for over 100 s
+    assert set(d.baseline) == {"c"}
+    assert len(d.cold) == 2
+    assert len(d.profiles) == 1
+
+
+def test_evicted_profile_comes_back_from_the_cold_tier(tmp_path):
+    d = detector(tmp_path, max_profiles=1)
+    feed(d, "a", 0.2, NOW, ticks=40)
+    learned = d.baseline["a"].mean
+    feed(d, "b", 0.05, NOW + 50)
+    d.evict(NOW + 60)
+    assert "a" not in d.baseline
+
+    d.check_batch(["a"], [learned], now=NOW + 70)
+    assert abs(d.baseline["a"].mean - learned) < 1e-9 # not the 0.05 a new profile starts at
+    assert len(d.cold) == 0 # taken out of the cold tier, not copied
+
+
+def test_evictions_are_persisted(tmp_path):
+    d = detector(tmp_path, max_profiles=1)
+    feed(d, "a", 0.2, NOW)
+    feed(d, "b", 0.3, NOW + 20)
+    d.evict(NOW + 30)
+    d.save(force=True)
+
+    again = detector(tmp_path, max_profiles=1)
+    assert set(again.baseline) == {"b"}
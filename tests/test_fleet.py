@@ -0,0 +1,65 @@
+"""Fleet wire format and aggregator threading."""
+import asyncio, threading
+
+from core import fleet
+from core.fleet import Aggregator, DeltaDecoder, DeltaEncoder
+
+
+def ticks():
+    yield [("a", 1.0, 10.0, 0.0), ("b", 2.0, 20.0, 0.0)]
+    yield [("a", 1.0, 10.0, 0.0), ("b", 5.0, 20.0, 0.0)]        # b changed
+    yield [("b", 5.0, 20.0, 0.0), ("c", 0.5, 5.0, 1.0)]         # a gone, c new
+    yield [("b", 5.0, 20.0, 0.0), ("c", 0.5, 5.0, 1.0)]         # nothing changed
+
+
+def test_round_trip():
+    encoder, decoder = DeltaEncoder(keyframe_every=100), DeltaDecoder()
+    for rows in ticks():
+        msg = encoder.encode(rows, 0.0)
+        assert decoder.apply(msg)
+        assert decoder.rows == {r[0]: r[1:] for r in rows}
+    assert "up" not in msg and "rm" not in msg # an unchanged tick is empty
+
+
+def test_gap_waits_for_keyframe():
+    encoder, decoder = DeltaEncoder(keyframe_every=100), DeltaDecoder()
+    rows = list(ticks())
+    assert decoder.apply(encoder.encode(rows[0], 0.0))
+    encoder.encode(rows[1], 0.0)                      # lost on the wire
+    assert not decoder.apply(encoder.encode(rows[2], 0.0))
+    encoder.reset()
+    assert decoder.apply(encoder.encode(rows[3], 0.0))
+    assert decoder.rows == {r[0]: r[1:] for r in rows[3]}
+
+
+def test_detection_runs_off_the_event_loop(tmp_path, monkeypatch):
+    threads = []
+    real = fleet.pm.AnomalyDetector
+
+    def detector(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(fleet.pm, "AnomalyDetector", detector)
+
+    async def run():
+        agg = Aggregator(str(tmp_path))
+        server = await agg.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(fleet._dumps({"hello": "h1", "interval": 1, "v": fleet.PROTOCOL}))
+        writer.write(fleet._dumps(DeltaEncoder().encode([("a", 1.0, 10.0, 0.0)], 0.0)))
+        await writer.drain()
+        for _ in range(100):
+            if agg.processed:
+                break
+            await asyncio.sleep(0.02)
+        writer.close()
+        server.close()
+        agg.close()
+        return agg, threading.current_thread()
+
+    agg, loop_thread = asyncio.run(run())
+    assert agg.processed == 1
+    assert threads and loop_thread not in threads
+    assert (tmp_path / "fleet" / "h1").is_dir()
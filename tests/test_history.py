@@ -0,0 +1,55 @@
+"""HistoryStore reads must stay valid while the collector thread grows the file."""
+import threading
+
+import numpy as np
+
+from core.history import HistoryStore
+
+
+def test_read_survives_grow(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.dat"), slots=2, capacity=8)
+    store.write(["a", "b"], 1.0, [1, 2], [10, 20], [0, 0], [0, 0])
+    before = store.read("a")
+
+    store.write(["c", "d", "e"], 2.0, [3, 4, 5], [0, 0, 0], [0, 0, 0], [0, 0, 0])
+    assert store.slots_count >= 5
+    assert list(before["cpu"]) == [1.0]
+    assert list(store.read("a")["cpu"]) == [1.0]
+    assert list(store.read("e")["cpu"]) == [5.0]
+    store.close()
+
+
+def test_wrapped_ring_reads_oldest_first(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.dat"), slots=1, capacity=4)
+    for t in range(6):
+        store.write(["a"], float(t), [t], [0], [0], [0])
+    assert list(store.read("a")["ts"]) == [2.0, 3.0, 4.0, 5.0]
+    assert list(store.read("a", seconds=1.5, now=5.0)["ts"]) == [4.0, 5.0]
+    store.close()
+
+
+def test_concurrent_read_while_growing(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.dat"), slots=2, capacity=16)
+    errors = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            try:
+                store.read("p0")["cpu"].sum()
+            except Exception as e: # any failure here is the race
+                errors.append(e)
+                return
+
+    t = threading.Thread(target=reader)
+    t.start()
+    try:
+        for tick in range(200):
+            names = [f"p{i}" for i in range(min(tick + 1, 600))]
+            store.write(names, float(tick), np.ones(len(names)), np.zeros(len(names)),
+                        np.zeros(len(names)), np.zeros(len(names)))
+    finally:
+        done.set()
+        t.join()
+    assert not errors
+    store.close()
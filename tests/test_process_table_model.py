@@ -0,0 +1,80 @@
+"""ProcessTableModel emits only the inserts, removes and cell changes a new tick needs."""
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("PyQt6")
+
+from core.collector import ProcessRow
+from core.delta import DeltaTracker
+from ui.process_table_model import ProcessTableModel
+
+
+def row(name, cpu=1.0, mem=10.0, suspicious=False):
+    return ProcessRow(name, cpu, mem, 0.0, 0.1, (), suspicious, 0)
+
+
+class Recorder:
+    def __init__(self, model):
+        self.events = []
+        model.rowsInserted.connect(lambda _, first, last: self.events.append(("insert", first, last)))
+        model.rowsRemoved.connect(lambda _, first, last: self.events.append(("remove", first, last)))
+        model.dataChanged.connect(
+            lambda tl, br, roles=(): self.events.append(("changed", tl.row(), tl.column(), br.column()))
+        )
+
+    def take(self):
+        events, self.events = self.events, []
+        return events
+
+
+def names(model):
+    return [model.name_at(r) for r in range(model.rowCount())]
+
+
+def test_set_rows_diffs():
+    model = ProcessTableModel()
+    rec = Recorder(model)
+    model.set_rows([row("a"), row("b"), row("c")])
+    assert rec.take() == [("insert", 0, 2)]
+
+    model.set_rows([row("a"), row("b"), row("c")])
+    assert rec.take() == []
+
+    model.set_rows([row("a"), row("b", mem=20.0), row("c")])
+    assert rec.take() == [("changed", 1, 2, 2)] # only the Memory cell
+
+    model.set_rows([row("a", suspicious=True), row("c"), row("d")])
+    assert rec.take() == [("remove", 1, 1), ("changed", 0, 0, 4), ("insert", 2, 2)]
+    assert names(model) == ["a", "c", "d"]
+    assert model.row_of("d") == 2 and model.process("b") is None
+
+
+def test_apply_delta_matches_set_rows():
+    tracker = DeltaTracker(keyframe_every=100)
+    model = ProcessTableModel()
+    ticks = [
+        [row("a"), row("b"), row("c")],
+        [row("a", cpu=5.0), row("b"), row("c")],
+        [row("a", cpu=5.0), row("c"), row("d")],
+        [row("a", cpu=5.0), row("c"), row("d"), row("b")],
+    ]
+    first = tracker.update({p.name: p for p in ticks[0]})
+    model.set_rows(ticks[0], first.seq)
+    rec = Recorder(model)
+    for rows in ticks[1:]:
+        assert model.apply_delta(tracker.update({p.name: p for p in rows}))
+        assert sorted(names(model)) == sorted(p.name for p in rows)
+        assert all(model.process(p.name) == p for p in rows)
+    assert ("changed", 0, 1, 1) in rec.take()
+
+
+def test_apply_delta_refuses_a_gap():
+    tracker = DeltaTracker(keyframe_every=100)
+    model = ProcessTableModel()
+    model.set_rows([row("a")], tracker.update({"a": row("a")}).seq)
+    tracker.update({"a": row("a", cpu=2.0)})             # never reaches the model
+    delta = tracker.update({"a": row("a", cpu=3.0)})
+    assert not model.apply_delta(delta)
+    assert model.process("a").cpu == 1.0
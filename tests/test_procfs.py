@@ -0,0 +1,82 @@
+"""ProcfsSource against a fake /proc tree."""
+import os
+
+import pytest
+
+from core.process_scanner import ProcessScanner
+from core.sources import ProcessGone, ProcfsSource
+
+BTIME = 1_700_000_000
+TCK = os.sysconf("SC_CLK_TCK")
+PAGE = os.sysconf("SC_PAGE_SIZE")
+
+
+class FakeProc:
+    def __init__(self, root):
+        self.root = root
+        (root / "stat").write_text(f"cpu  1 2 3 4\nbtime {BTIME}\n")
+
+    def write(self, pid, comm, utime=0, stime=0, starttime=100, ppid=1, flags=0, pages=10,
+              io=(0, 0), cgroup="0::/user.slice/session-1.scope", argv0=None):
+        d = self.root / str(pid)
+        d.mkdir(exist_ok=True)
+        fields = ["S", ppid, pid, pid, 0, -1, flags, 0, 0, 0, 0, utime, stime, 0, 0, 20, 0, 1, 0, starttime]
+        (d / "stat").write_text(f"{pid} ({comm}) " + " ".join(map(str, fields)) + " 0 0\n")
+        (d / "statm").write_text(f"100 {pages} 5 1 0 50 0\n")
+        (d / "io").write_text(f"rchar: 1\nwchar: 2\nread_bytes: {io[0]}\nwrite_bytes: {io[1]}\n")
+        (d / "cgroup").write_text(cgroup + "\n")
+        (d / "cmdline").write_bytes(((argv0 or comm) + "\0--flag\0").encode())
+
+
+@pytest.fixture
+def proc(tmp_path):
+    return FakeProc(tmp_path)
+
+
+def test_open_and_sample(proc):
+    proc.write(42, "we(ird) name", utime=3 * TCK, stime=TCK, starttime=5 * TCK, pages=10, io=(4096, 1024))
+    src = ProcfsSource(str(proc.root))
+    assert src.pids() == [42]
+    h, info = src.open(42)
+    assert info.name == "we(ird) name"
+    assert info.create_time == BTIME + 5
+    assert info.cpu_time == 4.0 and not info.system
+
+    s = src.sample(h)
+    assert (s.cpu_time, s.rss, s.io_bytes) == (4.0, 10 * PAGE, 5120)
+    assert src.cpu_time(h) == 4.0
+
+
+def test_truncated_comm_takes_the_full_name_from_argv0(proc):
+    proc.write(7, "averyverylongna", argv0="/opt/bin/averyverylongname-helper")
+    _, info = ProcfsSource(str(proc.root)).open(7)
+    assert info.name == "averyverylongname-helper"
+
+
+def test_system_processes(proc):
+    proc.write(50, "kworker/0:1", ppid=2, flags=ProcfsSource.PF_KTHREAD)
+    proc.write(51, "sshd", cgroup="0::/system.slice/ssh.service")
+    proc.write(52, "bash")
+    src = ProcfsSource(str(proc.root))
+    assert [src.open(pid)[1].system for pid in (50, 51, 52)] == [True, True, False]
+
+
+def test_reused_pid_is_gone(proc):
+    proc.write(42, "old", starttime=100)
+    src = ProcfsSource(str(proc.root))
+    h, _ = src.open(42)
+    proc.write(42, "new", starttime=900)
+    with pytest.raises(ProcessGone):
+        src.sample(h)
+    with pytest.raises(ProcessGone):
+        src.cpu_time(h)
+
+
+def test_scanner_reopens_a_reused_pid(proc):
+    proc.write(42, "old", utime=100)
+    scanner = ProcessScanner(ProcfsSource(str(proc.root)), workers=1)
+    assert [r[0] for r in scanner.sample()] == ["old"]
+
+    proc.write(42, "new", utime=5, starttime=900)
+    assert scanner.sample() == []         # handle dropped, never a rate across two processes
+    assert [r[0] for r in scanner.sample()] == ["new"]
@@ -0,0 +1,71 @@
+"""RuleEngine bookkeeping and the stateful detectors (CUSUM, seasonal, MAD)."""
+import random, time
+
+import numpy as np
+import pytest
+
+import core.power_model as pm
+from core.rules import CusumRule, DriftRule, RobustMadRule, SeasonalRule
+
+# Local midnight, so a tick every 2 s stays inside one hour for a while
+NOW = time.mktime((2024, 3, 5, 0, 0, 0, 0, 0, -1))
+
+
+def detector(*rules, classifier=None):
+    return pm.AnomalyDetector(persist=False, rules=list(rules), classifier=classifier)
+
+
+def run(d, series, names=("p",), start=NOW, step=2.0):
+    """Feed one score per tick per name; returns the per-tick rule counts, shape (ticks, names)."""
+    out = []
+    for i, scores in enumerate(series):
+        _, fired = d.check_batch(list(names), np.atleast_1d(scores), now=start + step * i)
+        out.append(fired)
+    return np.array(out)
+
+
+def noisy(n, level=0.05, spread=0.005, seed=0):
+    rng = random.Random(seed)
+    return [level + rng.uniform(-spread, spread) for _ in range(n)]
+
+
+def test_engine_rejects_duplicates_and_scopes_by_class():
+    d = detector(DriftRule(), classifier=lambda name: "svc" if name.startswith("svc") else "app")
+    with pytest.raises(ValueError):
+        d.register(DriftRule())
+    d.register(CusumRule(), classes=("svc",))
+
+    run(d, [[0.05, 0.05, 0.05]] * 4, names=("svc-a", "app-b", "app-c"))
+    stats = d.rule_stats()
+    assert stats["drift"]["evaluations"] == 12
+    assert stats["cusum"]["evaluations"] == 4 # only svc-a
+
+
+def test_cusum_catches_a_small_persistent_shift():
+    d = detector(CusumRule())
+    quiet = run(d, noisy(100))
+    assert not quiet.any()
+
+    # A shift too small for the threshold rules, held for a while
+    shifted = run(d, noisy(40, level=0.065), start=NOW + 200)
+    assert shifted[:, 0].any()
+    first = int(np.flatnonzero(shifted[:, 0])[0])
+    assert not shifted[first + 1, 0] # restarts after an alarm
+
+
+def test_seasonal_compares_with_the_same_hour():
+    rule = SeasonalRule(min_obs=30)
+    d = detector(rule)
+    assert not run(d, noisy(30)).any()          # learning 00:00
+    assert run(d, [0.5], start=NOW + 60).all()  # far above what 00:00 usually does
+    assert not run(d, [0.5], start=NOW + 3600).any() # nothing learned for 01:00 yet
+
+
+def test_mad_ignores_isolated_spikes_in_its_baseline():
+    d = detector(RobustMadRule(min_obs=20))
+    series = noisy(60)
+    series[30] = series[45] = 0.9 # two spikes while learning
+    fired = run(d, series)
+    assert fired[:20].sum() == 0         # too few observations
+    assert fired[30, 0] and fired[45, 0] # spikes stand out
+    assert fired[46:].sum() == 0         # and did not drag the baseline up
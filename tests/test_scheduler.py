@@ -0,0 +1,66 @@
+"""Tiered sampling: tier choice, budget stretch and CPU-spike promotion."""
+import core.power_model as pm
+from core.process_scanner import ProcessScanner
+from core.scheduler import SamplingScheduler
+
+NOW = 1_700_000_000.0
+
+
+def trained(scores, ticks=40):
+    """Detector that has seen `scores` ({name: score}) for `ticks` ticks."""
+    detector = pm.AnomalyDetector(persist=False)
+    names = list(scores)
+    for i in range(ticks):
+        detector.check_batch(names, [scores[n] for n in names], now=NOW + 2 * i)
+    return detector
+
+
+def test_tiers_from_profiles():
+    detector = trained({"heavy": 0.5, "flat": 0.01, "busy": 0.1})
+    sched = SamplingScheduler(detector)
+    sched.observe(["heavy", "flat", "busy"], NOW)
+    assert sched.tiers == {"heavy": "hot", "flat": "idle", "busy": "normal"}
+    assert sched.next_due == {"heavy": NOW + 0.5, "flat": NOW + 15.0, "busy": NOW + 2.0}
+
+    due = sched.due_check(NOW + 2.0)
+    assert [n for n in ("heavy", "flat", "busy", "new") if due(n)] == ["heavy", "busy", "new"]
+
+
+def test_promoted_names_go_hot():
+    sched = SamplingScheduler(trained({"flat": 0.01}))
+    sched.observe(["flat"], NOW, promoted={"flat"})
+    assert sched.tiers["flat"] == "hot" and sched.next_due["flat"] == NOW + 0.5
+
+
+def test_budget_stretches_and_relaxes():
+    sched = SamplingScheduler(trained({"flat": 0.01, "busy": 0.1, "heavy": 0.5}), cpu_budget=0.05)
+    sched.account(0.1, 1.0) # 10% of a core, twice the budget
+    assert sched.stretch == 1.5
+    sched.observe(["flat", "busy", "heavy"], NOW)
+    assert sched.next_due == {"flat": NOW + 22.5, "busy": NOW + 3.0, "heavy": NOW + 0.5}
+
+    for _ in range(10):
+        sched.account(0.1, 1.0)
+    assert sched.stretch == sched.MAX_STRETCH
+    for _ in range(10):
+        sched.account(0.0, 1.0)
+    assert sched.stretch == 1.0
+
+
+def test_cpu_jump_promotes_a_process_that_is_not_due(source):
+    source.add(10, "idle.exe")
+    source.add(11, "quiet.exe")
+    scanner = ProcessScanner(source, workers=1)
+    source.clock = 2.0
+    scanner.sample()
+
+    source.clock = 4.0
+    source.procs[10]["cpu"] += 1.5 # 75% of a core over the last 2 s
+    source.procs[11]["cpu"] += 0.02
+    source.reads.clear()
+    rows = {r[0]: r for r in scanner.sample(due=lambda name: False)}
+
+    assert scanner.promoted == {"idle.exe"}
+    assert rows["idle.exe"][2] == 75.0 and rows["idle.exe"][5]     # read in full, fresh
+    assert rows["quiet.exe"][2] == 0.0 and not rows["quiet.exe"][5] # repeats its last sample
+    assert ("sample", 11) not in source.reads and ("cpu_time", 11) in source.reads
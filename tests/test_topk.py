@@ -0,0 +1,47 @@
+"""TopK with lazy deletion must always agree with sorting the live values."""
+import random
+
+from core.topk import ConsumerIndex, TopK
+
+
+def expected(values, k):
+    return sorted(values.items(), key=lambda kv: (-kv[1], kv[0]))[:k]
+
+
+def test_matches_a_full_sort_under_churn():
+    rng = random.Random(0)
+    top, values = TopK(), {}
+    for step in range(5000):
+        key = f"p{rng.randrange(200)}"
+        if rng.random() < 0.1:
+            top.remove(key)
+            values.pop(key, None)
+        else:
+            values[key] = rng.randrange(1000)
+            top.update(key, values[key])
+        if step % 50 == 0:
+            assert top.top(10) == expected(values, 10)
+    # Stale entries are rebuilt away, so the heap stays O(live keys)
+    assert len(top._heap) <= 2 * len(values) + 64 + 10
+
+
+def test_invalid_keys_are_dropped_for_good():
+    top = TopK()
+    for key, v in (("a", 3), ("b", 2), ("c", 1)):
+        top.update(key, v)
+    assert top.top(2, valid=lambda key: key != "a") == [("b", 2), ("c", 1)]
+    assert top.top(3) == [("b", 2), ("c", 1)]
+    assert len(top) == 2
+
+
+def test_consumer_index_rankings():
+    index = ConsumerIndex(k=2, filters={"mean": lambda name: name != "gone"})
+    index.update("mean", ["a", "gone", "b"], [0.1, 0.9, 0.2])
+    assert index.top("mean") == [("b", 0.2), ("a", 0.1)]
+
+    index.increment("anomalies", ["a", "b", "a"])
+    assert index.top("anomalies") == [("a", 2), ("b", 1)]
+    index.retain("anomalies", {"b"})
+    assert index.top("anomalies") == [("b", 1)]
+    index.reset("anomalies")
+    assert index.snapshot()["anomalies"] == []
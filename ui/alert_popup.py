@@ -1,22 +1,21 @@
 from PyQt6.QtWidgets import QMessageBox
+from PyQt6.QtCore import Qt, pyqtSignal
 
 class AlertPopup(QMessageBox):
     """
-    A custom dialog that blocks and asks the user for
-    an action on a detected anomaly.
+    A non-modal dialog that asks the user for an action on
+    one or more detected anomalies. Never blocks the app.
     """
+    kill_requested = pyqtSignal(list) # names of the processes to terminate
+
     def __init__(self, parent, process_name):
         super().__init__(parent)
-        self.process_name = process_name
+        self.process_names = []
         
         # --- Configure the Alert ---
         self.setIcon(QMessageBox.Icon.Warning)
         self.setWindowTitle("⚠️ Anomaly Detected")
-        self.setText(f"Suspicious activity detected in '{process_name}'.")
-        self.setInformativeText(
-            "This process is showing abnormal behavior based on its learned behavior.\n\n"
-            "Do you want to terminate this process?"
-        )
+        self.setWindowModality(Qt.WindowModality.NonModal)
         
         
         # Add Buttons 
@@ -26,17 +25,40 @@ class AlertPopup(QMessageBox):
         
         # Make "Ignore" the default (e.g., if user hits Enter)
         self.setDefaultButton(self.ignore_button)
+        self.buttonClicked.connect(self._on_clicked)
+
+        self.add_process(process_name)
+
+    def add_process(self, process_name):
+        """Fold another flagged process into this popup."""
+        if process_name in self.process_names:
+            return
+        self.process_names.append(process_name)
+
+        if len(self.process_names) == 1:
+            self.setText(f"Suspicious activity detected in '{process_name}'.")
+            self.setInformativeText(
+                "This process is showing abnormal behavior based on its learned behavior.\n\n"
+                "Do you want to terminate this process?"
+            )
+            self.kill_button.setText("Kill Process")
+        else:
+            self.setText(f"Suspicious activity detected in {len(self.process_names)} processes.")
+            self.setInformativeText(
+                "\n".join(f"• {name}" for name in self.process_names) +
+                "\n\nDo you want to terminate these processes?"
+            )
+            self.kill_button.setText("Kill All")
 
     def show_alert(self):
         """
-        Shows the modal alert and returns True if 'Kill' was clicked,
-        False otherwise.
+        Shows the alert without blocking; kill_requested is emitted
+        if 'Kill' is clicked.
         """
-        # exec() blocks the app until the user clicks a button
-        self.exec()
-        
+        self.show()
+        self.raise_()
+
+    def _on_clicked(self, button):
         # Check which button was clicked
-        if self.clickedButton() == self.kill_button:
-            return True
-        else:
-            return False
\ No newline at end of file
+        if button == self.kill_button:
+            self.kill_requested.emit(list(self.process_names))
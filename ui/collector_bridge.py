@@ -0,0 +1,44 @@
+import threading
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from core.delta import merge
+
+
+class SnapshotBridge(QObject):
+    """
+    Carries collector snapshots from the worker thread to the GUI thread.
+
+    Only the newest snapshot is kept: if the GUI has not picked up the
+    previous one yet, it is replaced (its alerts, row delta and fresh names
+    are merged in) and no extra signal is queued.
+    """
+    snapshot_ready = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._latest = None
+        self.coalesced = 0
+
+    def publish(self, snapshot):
+        """Called from the collector thread."""
+        with self._lock:
+            pending = self._latest
+            if pending is not None:
+                self.coalesced += 1
+                carried = tuple(n for n in pending.alerts if n not in snapshot.alerts)
+                snapshot = snapshot._replace(alerts=carried + snapshot.alerts)
+                if pending.delta is not None and snapshot.delta is not None:
+                    snapshot = snapshot._replace(delta=merge(pending.delta, snapshot.delta))
+                snapshot = snapshot._replace(fresh=pending.fresh | snapshot.fresh)
+            self._latest = snapshot
+
+        if pending is None:
+            self.snapshot_ready.emit()
+
+    def take(self):
+        """Called from the GUI thread; returns the newest snapshot or None."""
+        with self._lock:
+            snapshot, self._latest = self._latest, None
+        return snapshot
@@ -1,18 +1,81 @@
 from PyQt6.QtWidgets import QWidget, QVBoxLayout
-import pyqtgraph as pg
-from collections import deque
+from PyQt6.QtCore import QTimer
+import numpy as np
+
+
+class RingSeries:
+    """
+    Preallocated ring buffer whose newest `n` values are always one
+    contiguous slice: every value is written twice, at i and i + n.
+    view() returns that slice, so plotting never copies.
+    """
+    def __init__(self, n):
+        self.n = n
+        self.buf = np.zeros(2 * n, dtype=np.float64)
+        self.start = 0
+        self.len = 0
+
+    def append(self, value):
+        pos = (self.start + self.len) % self.n
+        self.buf[pos] = value
+        self.buf[pos + self.n] = value
+        if self.len < self.n:
+            self.len += 1
+        else:
+            self.start = (self.start + 1) % self.n
+
+    def load(self, values):
+        values = np.asarray(values, dtype=np.float64)[-self.n:]
+        k = len(values)
+        self.buf[:k] = values
+        self.buf[self.n:self.n + k] = values
+        self.start = 0
+        self.len = k
+
+    def clear(self):
+        self.start = 0
+        self.len = 0
+
+    def view(self):
+        return self.buf[self.start:self.start + self.len]
+
 
 class ProcessGraph(QWidget):
-    def __init__(self, max_points=300):
+    """
+    CPU % / score trend of the tracked process, plus overlays.
+
+    pyqtgraph is the slowest import of the whole app, so the plot is only
+    built after the widget's first paint. Data that arrives before that
+    is buffered and drawn then.
+    """
+    RENDER_INTERVAL = 250 # ms; updates arriving faster are coalesced
+    OVERLAY_COLORS = ['#FF6EC7', '#7CFF6B', '#FFA94D', '#B197FC', '#63E6BE']
+
+    def __init__(self, max_points=3600):
         super().__init__()
 
-        self.cpu_history = deque(maxlen=max_points)
-        self.score_history = deque(maxlen=max_points)
+        self.max_points = max_points
+        self._x = np.arange(max_points, dtype=np.float64)
+        self.cpu_history = RingSeries(max_points)
+        self.score_history = RingSeries(max_points)
+        self.overlays = {} # name -> [cpu RingSeries, curve or None until the plot exists]
+        self._dirty = set()
 
-        layout = QVBoxLayout(self)
+        self._render_timer = QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.timeout.connect(self._render)
 
+        self._layout = QVBoxLayout(self)
         self.base_title = "Power Trend (CPU% vs Score)"
-        self.plot = pg.PlotWidget(title=self.base_title)
+        self._title = self.base_title
+        self.plot = None
+
+    def _build(self):
+        if self.plot is not None:
+            return
+        import pyqtgraph as pg
+
+        self.plot = pg.PlotWidget(title=self._title)
         self.plot.showGrid(x=True, y=True, alpha=0.4)
 
         # CPU Curve (Left Axis)
@@ -20,6 +83,7 @@ class ProcessGraph(QWidget):
             pen=pg.mkPen('#00E5FF', width=2),
             name="CPU %"
         )
+        self._bound_cost(self.cpu_curve)
 
         # Enable right axis
         self.plot.showAxis('right')
@@ -31,32 +95,121 @@ class ProcessGraph(QWidget):
         self.score_axis.setXLink(self.plot)
 
         # Score Curve (Right Axis)
-        self.score_curve = pg.PlotCurveItem(
+        self.score_curve = pg.PlotDataItem(
             pen=pg.mkPen('#FFE600', width=2, style=pg.QtCore.Qt.PenStyle.DashLine)
         )
+        self._bound_cost(self.score_curve)
         self.score_axis.addItem(self.score_curve)
 
         self.plot.setLabel('left', 'CPU %')
         self.plot.setLabel('right', 'Score ×100')
         self.plot.setLabel('bottom', 'Time (samples)')
 
-        layout.addWidget(self.plot)
+        self._layout.addWidget(self.plot)
 
         # Sync sizes without deprecated VB access
         self.plot.getViewBox().sigResized.connect(self._sync_axes)
 
+        for i, (name, entry) in enumerate(self.overlays.items()):
+            entry[1] = self._overlay_curve(name, i)
+        self._schedule("cpu", "score", *self.overlays)
+
+    def _overlay_curve(self, name, i):
+        import pyqtgraph as pg
+        color = self.OVERLAY_COLORS[i % len(self.OVERLAY_COLORS)]
+        curve = self.plot.plot(pen=pg.mkPen(color, width=1), name=name)
+        self._bound_cost(curve)
+        return curve
+
+    @staticmethod
+    def _bound_cost(curve):
+        # Draw only the visible x-range, reduced to min/max per pixel column
+        curve.setClipToView(True)
+        curve.setDownsampling(auto=True, method='peak')
+
     def _sync_axes(self):
         self.score_axis.setGeometry(self.plot.getViewBox().sceneBoundingRect())
         self.score_axis.linkedViewChanged(self.plot.getViewBox(), self.score_axis.XAxis)
 
+    # --- Rendering ---
+    def _schedule(self, *keys):
+        self._dirty.update(keys)
+        if not self._render_timer.isActive():
+            self._render_timer.start(self.RENDER_INTERVAL)
+
+    def _renderable(self):
+        return self.plot is not None and self.isVisible() and not self.window().isMinimized()
+
+    def _render(self):
+        # Hidden or minimized: keep the buffers current, repaint when shown
+        if not self._dirty or not self._renderable():
+            return
+
+        for key in self._dirty:
+            if key == "cpu":
+                self._set(self.cpu_curve, self.cpu_history)
+            elif key == "score":
+                self._set(self.score_curve, self.score_history)
+            elif key in self.overlays:
+                series, curve = self.overlays[key]
+                self._set(curve, series)
+        self._dirty.clear()
+
+    def _set(self, curve, series):
+        y = series.view()
+        curve.setData(self._x[:len(y)], y, skipFiniteCheck=True)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._dirty:
+            self._schedule()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.plot is None:
+            QTimer.singleShot(0, self._build)
+
+    # --- Public API ---
     def update(self, cpu, score):
         self.cpu_history.append(cpu)
         self.score_history.append(score * 100)
+        self._schedule("cpu", "score")
+
+    def load_history(self, cpu, score):
+        """Replace the plotted series with recorded history (oldest first)."""
+        self.cpu_history.load(cpu)
+        self.score_history.load(np.asarray(score, dtype=np.float64) * 100)
+        self._schedule("cpu", "score")
+
+    def add_overlay(self, name, cpu_history=()):
+        """Overlay another process' CPU % on the same axes."""
+        if name in self.overlays:
+            return
+        curve = self._overlay_curve(name, len(self.overlays)) if self.plot is not None else None
+        series = RingSeries(self.max_points)
+        series.load(cpu_history)
+        self.overlays[name] = [series, curve]
+        self._schedule(name)
+
+    def update_overlay(self, name, cpu):
+        if name in self.overlays:
+            self.overlays[name][0].append(cpu)
+            self._schedule(name)
+
+    def remove_overlay(self, name):
+        entry = self.overlays.pop(name, None)
+        if entry:
+            if entry[1] is not None:
+                self.plot.removeItem(entry[1])
+            self._dirty.discard(name)
 
-        self.cpu_curve.setData(list(self.cpu_history))
-        self.score_curve.setData(list(self.score_history))
     def set_tracking_process(self, process_name):
         """Resets the title when tracking a new process."""
-        self.plot.setTitle(f"{self.base_title} - Tracking: {process_name}")
+        self._set_title(f"{self.base_title} - Tracking: {process_name}")
     def freeze(self):
-        self.plot.setTitle("Process Closed — Graph Frozen")
+        self._set_title("Process Closed — Graph Frozen")
+
+    def _set_title(self, title):
+        self._title = title
+        if self.plot is not None:
+            self.plot.setTitle(title)
@@ -1,49 +1,45 @@
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QTableWidget, QPushButton, QFrame, QCheckBox, 
-    QTextEdit, QMessageBox
+    QTableView, QPushButton, QCheckBox, 
+    QTextEdit, QMessageBox, QLineEdit, QApplication, QMenu
 )
-from PyQt6.QtCore import Qt
-from PyQt6.QtWidgets import QTableWidgetItem
-from PyQt6.QtGui import QColor
-
-from PyQt6.QtCore import QTimer
-from core.process_scanner import ProcessScanner
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QKeySequence, QShortcut
+
+from core.collector import Collector, load_snapshot_cache
+from core.history import HistoryStore
+from core.scheduler import SamplingScheduler
+from core import paths, process_control
+from core.metrics import MetricsServer
 import core.power_model as pm
 
 from ui.graph_widget import ProcessGraph
 from ui.alert_popup import AlertPopup
 from ui.toast import Toast
+from ui.collector_bridge import SnapshotBridge
+from ui.process_table_model import ProcessTableModel, ProcessFilterProxy, KillButtonDelegate
 
-import psutil, datetime, os
-import time
-
-# AppData Path Setup 
-APP_NAME = "SEPRO"
-APP_DIR = os.path.join(os.getenv('LOCALAPPDATA'), APP_NAME)
-LOGS_DIR = os.path.join(APP_DIR, "logs")
-
-if not os.path.exists(LOGS_DIR):
-    os.makedirs(LOGS_DIR)
-ANOMALY_LOG_FILE = os.path.join(LOGS_DIR, "anomalies.log")
-# End Path Setup 
+from concurrent.futures import ThreadPoolExecutor
+import datetime, os, sys, time
 
 class MainWindow(QMainWindow):
+    kill_finished = pyqtSignal(object) # KillResult, emitted from the kill worker
     
-    COOLDOWN_PERIOD = 3 * 60  # 3-min alert snooze
-    APP_START_GRACE_PERIOD = 30 # startup grace period in seconds
+    # Seconds from process start (`started`) to the first painted window
+    STARTUP_TARGET = 0.5
 
-    def __init__(self):
+    def __init__(self, started=None):
         super().__init__()
+        self.started = time.perf_counter() if started is None else started
+        self.startup = {} # "paint" / "live" -> seconds since `started`
 
         self.setWindowTitle("SEPRO - Smart Energy Process Radar")
         self.setMinimumSize(1200, 700)
 
-        self.scanner = ProcessScanner()
-        self.detector = pm.AnomalyDetector()
         self.current_process = None
-        self.snooze_timestamps = {}
-        self.app_start_time = time.time()
+        self.alert_popup = None
+        self.kill_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sepro-kill")
+        self.kill_finished.connect(self.report_kill)
 
         container = QWidget()
         layout = QVBoxLayout(container)
@@ -55,16 +51,36 @@ class MainWindow(QMainWindow):
         content_layout = QHBoxLayout()
 
         # --- Table has 6 columns ---
-        self.table = QTableWidget(0, 6)
-        self.table.setHorizontalHeaderLabels(
-            ["Process", "CPU %", "Memory MB", "Disk MB/s", "Power Score", "Action"]
-        )
-        self.table.cellClicked.connect(self.select_process)
+        table_panel = QVBoxLayout()
+        self.filter_box = QLineEdit()
+        self.filter_box.setPlaceholderText("Filter processes…")
+        table_panel.addWidget(self.filter_box)
+
+        self.model = ProcessTableModel(self)
+        self.proxy = ProcessFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+        self.filter_box.textChanged.connect(self.proxy.setFilterFixedString)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setMouseTracking(True) # hover state for the Kill button
+        self.table.verticalHeader().setVisible(False)
+        self.table.clicked.connect(self.select_process)
+        self.table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.table.customContextMenuRequested.connect(self.show_table_menu)
+
+        self.kill_delegate = KillButtonDelegate(self.table)
+        self.kill_delegate.kill_requested.connect(self.kill_process)
+        self.table.setItemDelegateForColumn(ProcessTableModel.ACTION_COLUMN, self.kill_delegate)
         
         # --- Resize the last column ---
         self.table.setColumnWidth(5, 70) # 70 pixels for the "Kill" button
+
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(4, Qt.SortOrder.DescendingOrder)
+        table_panel.addWidget(self.table)
         
-        content_layout.addWidget(self.table, stretch=3)
+        content_layout.addLayout(table_panel, stretch=3)
 
         # Right Panel
         right_panel = QVBoxLayout()
@@ -88,6 +104,7 @@ class MainWindow(QMainWindow):
         # Bottom Bar
         bottom_bar = QHBoxLayout()
         self.freeze_checkbox = QCheckBox("❄️ Freeze Table (Stop Sorting)")
+        self.freeze_checkbox.toggled.connect(self.set_frozen)
         bottom_bar.addWidget(self.freeze_checkbox)
 
         self.top_consumers_button = QPushButton("Show Top Power Consumers")
@@ -101,217 +118,248 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(container)
 
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_process_table)
-        self.timer.start(2000)
+        # Sampling runs on the collector thread; we only render what it sends
+        self.bridge = SnapshotBridge(self)
+        self.bridge.snapshot_ready.connect(self.update_process_table)
+        self.history = HistoryStore()
+        # The baseline is read on the collector thread; until the first live
+        # tick the table shows the last session's rows (greyed out as stale)
+        detector = pm.AnomalyDetector(defer_load=True)
+        self.collector = Collector(
+            self.bridge.publish,
+            interval=SamplingScheduler.BASE_INTERVAL,
+            detector=detector,
+            history=self.history,
+            scheduler=SamplingScheduler(detector),
+            snapshot_cache=paths.snapshot_cache_file(),
+        )
+        cached = load_snapshot_cache(self.collector.snapshot_cache)
+        if cached is not None:
+            ts, rows = cached
+            self.model.set_rows(rows)
+            saved = datetime.datetime.fromtimestamp(ts).strftime("%I:%M %p")
+            self.status.setText(f"Status: Starting… (showing last session, {saved})")
+        else:
+            self.status.setText("Status: Starting…")
+        # The collector starts once the window has painted (see paintEvent)
+
+        # Optional Prometheus endpoint (SEPRO_METRICS_PORT) and on-demand profiling
+        self.metrics_server = None
+        if os.getenv("SEPRO_METRICS_PORT"):
+            try:
+                self.metrics_server = MetricsServer(self.collector.metrics, int(os.getenv("SEPRO_METRICS_PORT")))
+            except (OSError, ValueError) as e:
+                print(f"Metrics endpoint not started: {e}")
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, activated=self.capture_profile)
+
+    PROFILE_TICKS = 20
+
+    def capture_profile(self):
+        path = self.collector.metrics.capture_profile(self.PROFILE_TICKS)
+        Toast(self, f"Profiling the next {self.PROFILE_TICKS} ticks → {os.path.basename(path)}")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if "paint" not in self.startup:
+            self._startup_mark("paint")
+            QTimer.singleShot(0, self.collector.start)
+
+    def _startup_mark(self, stage):
+        if stage in self.startup:
+            return
+        seconds = self.startup[stage] = time.perf_counter() - self.started
+        self.collector.metrics.set_gauge(f"startup_{stage}_seconds", round(seconds, 4))
+        if stage == "live":
+            paint = self.startup.get("paint", seconds)
+            verdict = "ok" if paint <= self.STARTUP_TARGET else "over target"
+            print(
+                f"Startup: first paint {paint:.3f}s (target {self.STARTUP_TARGET}s, {verdict}),"
+                f" live data {seconds:.3f}s", file=sys.stderr
+            )
+
+    def closeEvent(self, event):
+        self.collector.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+        self.kill_pool.shutdown(wait=False)
+        super().closeEvent(event)
+
+    TOP_K = 5
+    TOP_SECTIONS = (
+        ("mean", "Long-term average 'Power Score'", "Average Score: {:.3f}"),
+        ("energy", "Energy used today", "{:.1f} score·s"),
+        ("instant", "Right now", "Score: {:.3f}"),
+        ("anomalies", "Anomalies today", "{:.0f} flagged"),
+    )
+
     def show_top_consumers(self):
         """
-        Reads the baseline_store.json file, finds the top 5 processes
-        based on their long-term AVERAGE (mean) power score, and displays them.
+        Shows the top processes of each ranking the collector keeps live
+        (long-term mean, energy today, current score, anomalies today).
         """
-        try:
-            # Load the baseline data from baseline_store.json
-            baseline_data = pm.load_baseline()
-
-            if not baseline_data:
-                QMessageBox.information(self, "No Data", "No baseline data has been learned yet. Use the app for a few minutes.")
-                return
-
-            # Create a list of (name, mean_score) tuples
-            all_processes = []
-            for name, data in baseline_data.items():
-                # We are interested in the 'mean' (average score)
-                mean_score = data.get("mean", 0)
-                all_processes.append((name, mean_score))
-
-            # Sort the list by score (the 2nd item in the tuple) in descending order
-            sorted_consumers = sorted(all_processes, key=lambda item: item[1], reverse=True)
-
-            # Get the top 5
-            top_5 = sorted_consumers[:5]
-
-            if not top_5:
-                QMessageBox.information(self, "No Data", "No processes have been recorded.")
-                return
-
-            message_body = "Based on long-term average 'Power Score':\n"
-            details = []
-            for i, (name, score) in enumerate(top_5):
-                details.append(f"{i+1}. {name} (Average Score: {score:.3f})")
-
-            message_body += "\n".join(details)
+        top = self.collector.top
+        sections = []
+        for ranking, heading, fmt in self.TOP_SECTIONS:
+            entries = top.top(ranking, self.TOP_K)
+            if not entries:
+                continue
+            details = [f"{i+1}. {name} ({fmt.format(value)})" for i, (name, value) in enumerate(entries)]
+            sections.append(f"{heading}:\n" + "\n".join(details))
 
-            # Use a dynamic title
-            title = f"Top {len(top_5)} All-Time Consumers"
-            QMessageBox.information(self, title, message_body)
+        if not sections:
+            QMessageBox.information(self, "No Data", "No baseline data has been learned yet. Use the app for a few minutes.")
+            return
 
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Could not parse baseline file: {e}")
+        QMessageBox.information(self, f"Top {self.TOP_K} Power Consumers", "\n\n".join(sections))
 
     def clear_anomaly_log(self):
         self.log_display.setText("Anomaly Log (This Session):\n")
 
+    def set_frozen(self, frozen):
+        # Frozen rows keep their place; live rows re-sort as scores change
+        self.proxy.setDynamicSortFilter(not frozen)
+        if not frozen:
+            self.proxy.invalidate()
+
     def update_process_table(self):
-        is_frozen = self.freeze_checkbox.isChecked()
+        snapshot = self.bridge.take()
+        if snapshot is None:
+            return
 
-        if is_frozen:
-            processes = self.scanner.get_app_processes()
-            self.table.setSortingEnabled(False)
-        else:
-            processes = sorted(
-                self.scanner.get_app_processes(),
-                # --- This is the corrected lambda function ---
-                key=lambda p: p["score"] if "score" in p else pm.PowerModel.compute_score(p.get("cpu", 0), p.get("mem", 0), p.get("disk", 0)),
-                reverse=True
-            )
-            self.table.setSortingEnabled(True)
-            self.table.sortByColumn(4, Qt.SortOrder.DescendingOrder)
+        render_start = time.perf_counter()
+        if snapshot.delta is None or not self.model.apply_delta(snapshot.delta):
+            self.model.set_rows(snapshot.rows, snapshot.seq)
+        self._startup_mark("live")
 
-        self.table.setRowCount(len(processes))
+        # One graph point per real sample, like the history it continues:
+        # rows the adaptive scheduler skipped this tick only repeat old values
         process_alive = False
-        
-        current_names = {p['name'] for p in processes}
-        self.snooze_timestamps = {
-            name: timestamp for name, timestamp
-            in self.snooze_timestamps.items()
-            if name in current_names
-        }
-        
-        current_time = time.time() 
-        in_startup_grace_period = (current_time - self.app_start_time) < self.APP_START_GRACE_PERIOD
-
-        for row, p in enumerate(processes):
-            name, cpu, mem, disk = p["name"], p["cpu"], p["mem"], p["disk"]
-            score = pm.PowerModel.compute_score(cpu, mem, disk)
-            p["score"] = score
-
-            if in_startup_grace_period:
-                self.detector.check(name, score) # Learn, but don't flag
-                is_suspicious = False
-            else:
-                is_suspicious, rules = self.detector.check(name, score)
-
-            if is_suspicious:
-                self.log_anomaly(name, rules, score)
-                
-                last_alert_time = self.snooze_timestamps.get(name, 0)
-                if (current_time - last_alert_time) > self.COOLDOWN_PERIOD:
-                    
-                    self.snooze_timestamps[name] = current_time
-                    
-                    if self.isMinimized():
-                        self.activateWindow()
-                    
-                    alert = AlertPopup(self, name)
-                    
-                    if alert.show_alert():
-                        self.kill_process(name)
-                    
-                    timestamp = datetime.datetime.now().strftime("%I:%M:%S %p")
-                    self.log_display.append(
-                        f"⚠️ {timestamp}: '{name}' flagged"
-                    )
-                
-            if self.current_process == name:
+        if self.current_process:
+            p = self.model.process(self.current_process)
+            if p is not None:
                 process_alive = True
-                self.graph.update(cpu, score)
-
-            values = [name, cpu, mem, disk, round(score, 3)]
-            for col, val in enumerate(values):
-                item = QTableWidgetItem(str(val))
-                if is_suspicious:
-                    item.setForeground(Qt.GlobalColor.red)
-                self.table.setItem(row, col, item)
-            
-            # --- This section re-creates the button every time ---
-            kill_button = QPushButton("Kill")
-            kill_button.setStyleSheet("background-color: #550000; color: white; padding: 4px;")
-            kill_button.clicked.connect(lambda checked, n=name: self.kill_process(n))
-            self.table.setCellWidget(row, 5, kill_button)
-            # --- END ---
+                if p.name in snapshot.fresh:
+                    self.graph.update(p.cpu, p.score)
+
+        for name in self.graph.overlays:
+            p = self.model.process(name)
+            if p is not None and name in snapshot.fresh:
+                self.graph.update_overlay(name, p.cpu)
 
         if self.current_process and not process_alive:
             self.graph.freeze()
+        metrics = self.collector.metrics
+        metrics.observe("render", time.perf_counter() - render_start)
 
-        self.detector.save()
-        
-        if in_startup_grace_period:
-            remaining = (self.app_start_time + self.APP_START_GRACE_PERIOD) - current_time
+        if snapshot.learning:
             self.status.setStyleSheet("color: #FFAA00; padding: 4px;") # Yellow
-            self.status.setText(f"Status: Learning... (Grace period: {remaining:.0f}s left)")
+            self.status.setText(f"Status: Learning... (Grace period: {snapshot.grace_remaining:.0f}s left)")
         else:
             self.status.setStyleSheet("color: #4FD3FF; padding: 4px;") # Cyan
-            self.status.setText(f"Status: Monitoring… {len(processes)} processes")
-        
-        if self.current_process:
-            self.highlight_selected_row(self.current_process)
+            status = (
+                f"Status: Monitoring… {len(snapshot.rows)} processes ({snapshot.sampled} sampled)"
+                f" | {metrics.status_text()}"
+            )
+            if snapshot.stale:
+                status += f" | {snapshot.stale} not responding"
+            if snapshot.skipped_ticks:
+                status += f" | {snapshot.skipped_ticks} ticks skipped"
+            self.status.setText(status)
+
+        # Alerts last, so the table is already up to date behind the popup
+        self.show_alerts(self.collector.alerts.drain())
+
+    def show_alerts(self, alerts):
+        """Non-modal: new alerts join the open popup instead of stacking dialogs."""
+        if not alerts:
+            return
 
-    def highlight_selected_row(self, proc_name):
-        highlight_color = QColor(40, 80, 120) 
-        
-        for row in range(self.table.rowCount()):
-            item = self.table.item(row, 0)
-            if not item:
-                continue
-            
-            is_selected_row = (item.text() == proc_name)
-            
-            for col in range(self.table.columnCount() - 1): # -1 to skip button col
-                cell = self.table.item(row, col)
-                if not cell:
-                    continue
-                
-                if is_selected_row:
-                    cell.setBackground(highlight_color)
-                else:
-                    cell.setBackground(QColor(Qt.GlobalColor.transparent))
-
-    def select_process(self, row, col):
-        if col == 5: # Column 5 is the "Action" column
+        for a in alerts:
+            timestamp = datetime.datetime.fromtimestamp(a.last_ts).strftime("%I:%M:%S %p")
+            extra = f" ({a.hits + a.suppressed} detections)" if a.hits + a.suppressed > 1 else ""
+            self.log_display.append(
+                f"⚠️ {timestamp}: '{a.name}' flagged{extra}"
+            )
+
+        if self.isMinimized():
+            self.activateWindow()
+
+        if self.alert_popup is None or not self.alert_popup.isVisible():
+            self.alert_popup = AlertPopup(self, alerts[0].name)
+            self.alert_popup.kill_requested.connect(self.kill_processes)
+        for a in alerts:
+            self.alert_popup.add_process(a.name)
+        self.alert_popup.show_alert()
+
+    def kill_processes(self, names):
+        for name in names:
+            self.kill_process(name)
+
+    def select_process(self, index):
+        if index.column() == ProcessTableModel.ACTION_COLUMN:
             return
         
         try:
-            proc = self.table.item(row, 0).text()
+            source = self.proxy.mapToSource(index)
+            proc = self.model.name_at(source.row())
+
+            # Ctrl+click overlays the process' CPU on the current graph
+            if QApplication.keyboardModifiers() & Qt.KeyboardModifier.ControlModifier:
+                if proc in self.graph.overlays:
+                    self.graph.remove_overlay(proc)
+                elif proc != self.current_process:
+                    self.graph.add_overlay(proc, self.history.read(proc)["cpu"])
+                return
+
             self.current_process = proc
-            self.graph.cpu_history.clear()
-            self.graph.score_history.clear()
+            # Show what we already recorded for this process straight away
+            recent = self.history.read(proc)
+            self.graph.load_history(recent["cpu"], recent["score"])
             self.graph.set_tracking_process(proc)
-            self.highlight_selected_row(proc)
-            
-            Toast(self, f"Tracking {proc}")
+            self.model.set_selected(proc)
+
+            instances = len(self.collector.scanner.lookup(proc))
+            Toast(self, f"Tracking {proc}" + (f" ({instances} instances)" if instances > 1 else ""))
         except Exception as e:
             print(f"Error in select_process: {e}")
 
-    def kill_process(self, process_name):
-        killed_count = 0
-        error_count = 0
-        process_found = False
-        
-        for proc in psutil.process_iter(['name']):
-            if proc.info['name'] == process_name:
-                process_found = True 
-                try:
-                    proc.kill()
-                    killed_count += 1
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    error_count += 1
-                except:
-                    error_count += 1
+    def show_table_menu(self, pos):
+        index = self.table.indexAt(pos)
+        if not index.isValid():
+            return
+        name = self.model.name_at(self.proxy.mapToSource(index).row())
 
+        menu = QMenu(self)
+        menu.addAction("Kill", lambda: self.kill_process(name))
+        menu.addAction("Kill Process Tree", lambda: self.kill_process(name, tree=True))
+        menu.exec(self.table.viewport().mapToGlobal(pos))
+
+    def kill_process(self, process_name, tree=False):
+        # Resolved through the scanner's name index; terminate/wait runs off the GUI thread
+        future = self.kill_pool.submit(
+            process_control.kill_by_name, self.collector.scanner, process_name, tree
+        )
+        future.add_done_callback(lambda f: self.kill_finished.emit(self._kill_result(f, process_name)))
+
+    @staticmethod
+    def _kill_result(future, process_name):
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Error killing {process_name}: {e}")
+            return process_control.KillResult(process_name, 0, 0, 1, 0)
+
+    def report_kill(self, result):
         # toast call
+        process_name = result.name
         try:
-            if killed_count > 0:
-                Toast(self, f"Killed {killed_count} instance(s) of {process_name}")
-            elif error_count > 0:
+            if result.killed > 0:
+                Toast(self, f"Killed {result.killed} instance(s) of {process_name}")
+            elif result.failed > 0:
                 Toast(self, f"Could not kill {process_name}. May require Admin rights.")
-            elif not process_found:
+            else:
                  Toast(self, f"Process '{process_name}' not found. (May have already closed)")
         except Exception as e:
             print(f"Toast notification failed: {e}")
-            if killed_count > 0:
-                print(f"Killed {killed_count} instance(s) of {process_name}")
-
-
-    def log_anomaly(self, name, rules, score):
-        with open(ANOMALY_LOG_FILE, "a") as f:
-            f.write(f"{datetime.datetime.now()} | {name} | rules={rules} | score={score}\n")
\ No newline at end of file
+            if result.killed > 0:
+                print(f"Killed {result.killed} instance(s) of {process_name}")
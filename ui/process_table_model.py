@@ -0,0 +1,188 @@
+from PyQt6.QtCore import (
+    Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QEvent, pyqtSignal
+)
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle
+
+
+class ProcessTableModel(QAbstractTableModel):
+    """
+    Table model keyed by process name.
+
+    set_rows() diffs the new rows against what is shown and emits only
+    row inserts/removes and dataChanged for the cells that changed.
+    apply_delta() does the same from a core.delta.Delta without looking
+    at the rows that did not change.
+    """
+    HEADERS = ["Process", "CPU %", "Memory MB", "Disk MB/s", "Power Score", "Action"]
+    ACTION_COLUMN = 5
+    SORT_ROLE = Qt.ItemDataRole.UserRole
+
+    HIGHLIGHT_COLOR = QColor(40, 80, 120)
+    STALE_COLOR = QColor(128, 128, 128)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []    # ProcessRow
+        self._index = {}   # name -> row
+        self.selected = None
+        self.seq = None    # snapshot seq the rows are at, for apply_delta
+
+    # --- Qt model API ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        p = self._rows[index.row()]
+        col = index.column()
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == self.ACTION_COLUMN:
+                return "Kill"
+            return str(self._value(p, col))
+        if role == self.SORT_ROLE:
+            return self._value(p, col) if col != self.ACTION_COLUMN else None
+        if role == Qt.ItemDataRole.ForegroundRole and p.suspicious and col != self.ACTION_COLUMN:
+            return QColor(Qt.GlobalColor.red)
+        if role == Qt.ItemDataRole.ForegroundRole and p.stale and col != self.ACTION_COLUMN:
+            return self.STALE_COLOR
+        if role == Qt.ItemDataRole.ToolTipRole and p.stale:
+            return "Not responding this tick; showing last known values"
+        if role == Qt.ItemDataRole.BackgroundRole and p.name == self.selected and col != self.ACTION_COLUMN:
+            return self.HIGHLIGHT_COLOR
+        return None
+
+    @staticmethod
+    def _value(p, col):
+        return (p.name, p.cpu, p.mem, p.disk, round(p.score, 3))[col]
+
+    # --- Updates ---
+    def name_at(self, row):
+        return self._rows[row].name
+
+    def row_of(self, name):
+        return self._index.get(name)
+
+    def process(self, name):
+        row = self._index.get(name)
+        return self._rows[row] if row is not None else None
+
+    def set_rows(self, rows, seq=None):
+        incoming = {p.name: p for p in rows}
+        self._remove([n for n in self._index if n not in incoming])
+        for i, old in enumerate(self._rows):
+            self._replace(i, old, incoming[old.name])
+        self._append([p for p in rows if p.name not in self._index])
+        self.seq = seq
+
+    def apply_delta(self, delta):
+        """
+        Apply a snapshot's row delta. Returns False (nothing applied) if it
+        does not follow on from `seq`; the caller falls back to set_rows().
+        """
+        if delta.key or self.seq is None or delta.since != self.seq:
+            return False
+        self._remove([n for n in delta.disappeared if n in self._index])
+        added = []
+        for rows in (delta.appeared, delta.changed):
+            for name, new in rows.items():
+                i = self._index.get(name)
+                if i is None:
+                    added.append(new)
+                else:
+                    self._replace(i, self._rows[i], new)
+        self._append(added)
+        self.seq = delta.seq
+        return True
+
+    def _remove(self, names):
+        # Back to front so earlier row numbers stay valid
+        gone = sorted((self._index[n] for n in names), reverse=True)
+        for r in gone:
+            self.beginRemoveRows(QModelIndex(), r, r)
+            del self._rows[r]
+            self.endRemoveRows()
+        if gone:
+            self._index = {p.name: i for i, p in enumerate(self._rows)}
+
+    def _replace(self, i, old, new):
+        if new == old:
+            return
+        self._rows[i] = new
+        last_col = self.ACTION_COLUMN - 1
+        if new.suspicious != old.suspicious or new.stale != old.stale:
+            first, last = 0, last_col
+        else:
+            changed = [c for c in range(1, last_col + 1) if self._value(old, c) != self._value(new, c)]
+            if not changed:
+                return
+            first, last = changed[0], changed[-1]
+        self.dataChanged.emit(self.index(i, first), self.index(i, last))
+
+    def _append(self, added):
+        if added:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(added) - 1)
+            for offset, p in enumerate(added):
+                self._rows.append(p)
+                self._index[p.name] = start + offset
+            self.endInsertRows()
+
+    def set_selected(self, name):
+        previous, self.selected = self.selected, name
+        for n in (previous, name):
+            row = self._index.get(n)
+            if row is not None:
+                self.dataChanged.emit(
+                    self.index(row, 0), self.index(row, self.ACTION_COLUMN - 1),
+                    [Qt.ItemDataRole.BackgroundRole]
+                )
+
+
+class ProcessFilterProxy(QSortFilterProxyModel):
+    """Sorts on raw values and filters on the process name."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSortRole(ProcessTableModel.SORT_ROLE)
+        self.setFilterKeyColumn(0)
+        self.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.setDynamicSortFilter(True)
+
+
+class KillButtonDelegate(QStyledItemDelegate):
+    """Paints a "Kill" button in the Action column; no widget per row."""
+    kill_requested = pyqtSignal(str)
+
+    BUTTON_COLOR = QColor("#550000")
+    HOVER_COLOR = QColor("#7A0000")
+
+    def paint(self, painter, option, index):
+        painter.save()
+        rect = option.rect.adjusted(2, 2, -2, -2)
+        hovered = bool(option.state & QStyle.StateFlag.State_MouseOver)
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(self.HOVER_COLOR if hovered else self.BUTTON_COLOR)
+        painter.drawRoundedRect(rect, 3, 3)
+        painter.setPen(QColor(Qt.GlobalColor.white))
+        painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, "Kill")
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton
+                and option.rect.contains(event.position().toPoint())):
+            self.kill_requested.emit(index.siblingAtColumn(0).data(ProcessTableModel.SORT_ROLE))
+            return True
+        return super().editorEvent(event, model, option, index)